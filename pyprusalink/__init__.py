@@ -2,24 +2,60 @@
 
 from __future__ import annotations
 
-from typing import cast
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Executor
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from typing import IO, Any, cast
 
-from httpx import AsyncClient
+from httpx import AsyncClient, HTTPStatusError, Response, TransportError
 from pyprusalink.client import ApiClient
-from pyprusalink.file_metadata import parse_file_metadata
+from pyprusalink.disk_cache import DiskCache, cache_key
+from pyprusalink.file_metadata import (
+    _BGCODE_MAGIC,
+    FILE_METADATA_HEAD_BYTES,
+    FILE_METADATA_TAIL_BYTES,
+    parse_file_metadata_async,
+)
+from pyprusalink.layer_index import LayerIndex, LayerIndexBuilder
+from pyprusalink.limiter import Priority, RequestLimiter
+from pyprusalink.metadata_cache import (
+    FINGERPRINT_BYTES,
+    MetadataCache,
+    metadata_fingerprint,
+)
+from pyprusalink.resilience import CircuitBreaker, RetryPolicy
+from pyprusalink.resolver import HostResolver
 from pyprusalink.types import (
+    Camera,
+    CameraSnapshot,
+    DownloadResult,
+    FileInfo,
     FileTooLarge,
     JobInfo,
+    NotFound,
+    PrinterCapabilities,
     PrinterInfo,
     PrinterStatus,
     PrintFileMetadata,
     Storage,
     Transfer,
+    UploadResult,
     VersionInfo,
 )
-from pyprusalink.types_legacy import LegacyPrinterStatus
+from pyprusalink.types_legacy import LegacyJob, LegacyPrinterStatus
 
 MAX_FILE_METADATA_BYTES = 16 * 1024 * 1024
+MAX_FILE_BYTES = 16 * 1024 * 1024
+_HASH_CHUNK_SIZE = 1024 * 1024
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+_CONTENT_RANGE_PATTERN = re.compile(r"bytes (?:(\d+)-\d+|\*)/(?:(\d+)|\*)")
 
 
 class PrusaLink:
@@ -30,51 +66,161 @@ class PrusaLink:
     """
 
     def __init__(
-        self, async_client: AsyncClient, host: str, username: str, password: str
+        self,
+        async_client: AsyncClient,
+        host: str,
+        username: str,
+        password: str,
+        *,
+        retry: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        limiter: RequestLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+        parse_executor: Executor | None = None,
+        disk_cache: DiskCache | None = None,
+        resolver: HostResolver | None = None,
     ) -> None:
-        """Initialize the PrusaLink class."""
+        """Initialize the PrusaLink class.
+
+        Print file metadata is parsed in `parse_executor`, or the event
+        loop's default thread pool if None.
+        """
         self.client = ApiClient(
-            async_client=async_client, host=host, username=username, password=password
+            async_client=async_client,
+            host=host,
+            username=username,
+            password=password,
+            retry=retry,
+            circuit_breaker=circuit_breaker,
+            limiter=limiter,
+            resolver=resolver,
         )
+        self.metadata_cache = metadata_cache
+        self.parse_executor = parse_executor
+        self.disk_cache = disk_cache
+        self._listing_cache: dict[str, FileInfo] = {}
+        self._capabilities: PrinterCapabilities | None = None
+        self._capabilities_generation = 0
+        self._capabilities_lock = asyncio.Lock()
 
     async def cancel_job(self, job_id: int) -> None:
         """Cancel the current job."""
-        async with self.client.request("DELETE", f"/api/v1/job/{job_id}"):
+        async with self.client.request(
+            "DELETE", f"/api/v1/job/{job_id}", priority=Priority.CONTROL
+        ):
             pass
 
     async def pause_job(self, job_id: int) -> None:
         """Pause a job."""
-        async with self.client.request("PUT", f"/api/v1/job/{job_id}/pause"):
+        async with self.client.request(
+            "PUT", f"/api/v1/job/{job_id}/pause", priority=Priority.CONTROL
+        ):
             pass
 
     async def resume_job(self, job_id: int) -> None:
         """Resume a paused job."""
-        async with self.client.request("PUT", f"/api/v1/job/{job_id}/resume"):
+        async with self.client.request(
+            "PUT", f"/api/v1/job/{job_id}/resume", priority=Priority.CONTROL
+        ):
             pass
 
     async def continue_job(self, job_id: int) -> None:
         """Continue a job after a timelapse capture."""
-        async with self.client.request("PUT", f"/api/v1/job/{job_id}/continue"):
+        async with self.client.request(
+            "PUT", f"/api/v1/job/{job_id}/continue", priority=Priority.CONTROL
+        ):
             pass
 
     async def get_version(self) -> VersionInfo:
-        """Get the version."""
-        async with self.client.request("GET", "/api/version") as response:
-            return cast(VersionInfo, response.json())
+        """Get the version.
+
+        The response also refreshes the cached capabilities, so a firmware
+        update noticed by a version poll is picked up by `get_capabilities`.
+        """
+        version, _ = await self._probe_version()
+        return version
+
+    async def _probe_version(
+        self, priority: Priority = Priority.NORMAL
+    ) -> tuple[VersionInfo, PrinterCapabilities]:
+        """Get the version and cache the capabilities derived from it."""
+        generation = self.client.connection_generation
+        async with self.client.request(
+            "GET", "/api/version", priority=priority
+        ) as response:
+            version = cast(VersionInfo, response.json())
+
+        capabilities = _parse_capabilities(version)
+        self._capabilities = capabilities
+        self._capabilities_generation = generation
+        return version, capabilities
+
+    async def get_capabilities(
+        self, refresh: bool = False, priority: Priority = Priority.NORMAL
+    ) -> PrinterCapabilities:
+        """Get the printer capabilities, probing `/api/version` only once.
+
+        The result is cached until connecting to the printer fails (it
+        usually rebooted, possibly into a new firmware), `get_version`
+        reports a different version or `refresh` is set. Concurrent callers share a single probe, sent at
+        `priority`.
+        `upload_file` and `broadcast_job_command` use it to pick between the
+        v1 and legacy endpoints; the plain getters always call the endpoint
+        they are named after.
+        """
+        async with self._capabilities_lock:
+            capabilities = self._capabilities
+            if (
+                refresh
+                or capabilities is None
+                or self._capabilities_generation != self.client.connection_generation
+            ):
+                _, capabilities = await self._probe_version(priority)
+
+            return capabilities
+
+    def invalidate_capabilities(self) -> None:
+        """Drop the cached capabilities so the next call probes again."""
+        self._capabilities = None
 
     async def get_legacy_printer(self) -> LegacyPrinterStatus:
         """Get the legacy printer endpoint."""
         async with self.client.request("GET", "/api/printer") as response:
             return cast(LegacyPrinterStatus, response.json())
 
+    async def get_legacy_job(self, priority: Priority = Priority.NORMAL) -> LegacyJob:
+        """Get the legacy job endpoint, served by firmware without /api/v1."""
+        async with self.client.request(
+            "GET", "/api/job", priority=priority
+        ) as response:
+            return cast(LegacyJob, response.json())
+
+    async def send_legacy_job_command(
+        self, command: str, action: str | None = None
+    ) -> None:
+        """Send a legacy job command, e.g. `cancel`, or `pause` with an action."""
+        json_data = {"command": command}
+        if action is not None:
+            json_data["action"] = action
+        async with self.client.request(
+            "POST", "/api/job", json_data=json_data, priority=Priority.CONTROL
+        ):
+            pass
+
     async def get_info(self) -> PrinterInfo:
         """Get the printer."""
         async with self.client.request("GET", "/api/v1/info") as response:
             return cast(PrinterInfo, response.json())
 
-    async def get_status(self) -> PrinterStatus:
-        """Get the printer."""
-        async with self.client.request("GET", "/api/v1/status") as response:
+    async def get_status(self, priority: Priority = Priority.NORMAL) -> PrinterStatus:
+        """Get the printer.
+
+        Pass `Priority.CONTROL` when the status is read as part of a
+        command, so it does not queue behind polls.
+        """
+        async with self.client.request(
+            "GET", "/api/v1/status", priority=priority
+        ) as response:
             return cast(PrinterStatus, response.json())
 
     async def get_job(self) -> JobInfo | None:
@@ -89,6 +235,86 @@ class PrusaLink:
         async with self.client.request("GET", "/api/v1/storage") as response:
             return cast(list[Storage], response.json()["storage_list"])
 
+    async def get_files(self, path: str) -> FileInfo:
+        """Get a file or folder listing, e.g. `/usb/` or `/usb/models`."""
+        async with self.client.request(
+            "GET", f"/api/v1/files/{path.strip('/')}"
+        ) as response:
+            return cast(FileInfo, response.json())
+
+    async def walk_files(
+        self, path: str, max_concurrency: int = 2
+    ) -> AsyncIterator[tuple[str, FileInfo]]:
+        """Recursively list a storage folder, yielding `(path, entry)` pairs.
+
+        Up to `max_concurrency` folders are listed concurrently and entries
+        are yielded as soon as their folder listing arrives. Listings are
+        cached by folder `m_timestamp`: a folder whose timestamp in its
+        parent listing is unchanged is served from the cache, so rescanning
+        an unchanged storage costs a single request for the root folder.
+        """
+        root = "/" + path.strip("/")
+        queue: deque[tuple[str, int | None]] = deque([(root, None)])
+        pending: dict[asyncio.Task[FileInfo], str] = {}
+
+        try:
+            while queue or pending:
+                while queue and len(pending) < max_concurrency:
+                    folder, m_timestamp = queue.popleft()
+                    if (listing := self._cached_listing(folder, m_timestamp)) is None:
+                        pending[asyncio.create_task(self._list_folder(folder))] = folder
+                        continue
+
+                    for entry in self._walk_listing(folder, listing, queue):
+                        yield entry
+
+                if not pending:
+                    continue
+
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    folder = pending.pop(task)
+                    for entry in self._walk_listing(folder, task.result(), queue):
+                        yield entry
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def clear_file_cache(self) -> None:
+        """Drop all cached folder listings."""
+        self._listing_cache.clear()
+
+    async def _list_folder(self, folder: str) -> FileInfo:
+        """List a folder and store the result in the listing cache."""
+        listing = await self.get_files(folder)
+        self._listing_cache[folder] = listing
+        return listing
+
+    def _cached_listing(self, folder: str, m_timestamp: int | None) -> FileInfo | None:
+        """Return the cached listing of a folder if it is still current."""
+        if m_timestamp is None or (listing := self._listing_cache.get(folder)) is None:
+            return None
+
+        if listing.get("m_timestamp") != m_timestamp:
+            return None
+
+        return listing
+
+    def _walk_listing(
+        self,
+        folder: str,
+        listing: FileInfo,
+        queue: deque[tuple[str, int | None]],
+    ) -> Iterator[tuple[str, FileInfo]]:
+        """Yield the entries of a listing and queue its sub folders."""
+        for child in listing.get("children", []):
+            child_path = f"{folder}/{child['name']}"
+            if child["type"] == "FOLDER":
+                queue.append((child_path, child.get("m_timestamp")))
+            yield child_path, child
+
     async def get_transfer(self) -> Transfer | None:
         """Get active transfer. Returns None when no transfer is in progress."""
         async with self.client.request("GET", "/api/v1/transfer") as response:
@@ -98,38 +324,657 @@ class PrusaLink:
 
     async def cancel_transfer(self, transfer_id: int) -> None:
         """Cancel the transfer with the given id."""
-        async with self.client.request("DELETE", f"/api/v1/transfer/{transfer_id}"):
+        async with self.client.request(
+            "DELETE", f"/api/v1/transfer/{transfer_id}", priority=Priority.CONTROL
+        ):
             pass
 
+    async def get_cameras(self) -> list[Camera]:
+        """Get the cameras configured on the printer."""
+        async with self.client.request("GET", "/api/v1/cameras") as response:
+            return cast(list[Camera], response.json()["camera_list"])
+
+    async def get_snapshot(self, camera_id: str | None = None) -> CameraSnapshot | None:
+        """Get the latest image from a camera, or the default camera if None.
+
+        Returns None when the camera has no image available yet.
+        """
+        path = (
+            "/api/v1/cameras/snap"
+            if camera_id is None
+            else f"/api/v1/cameras/{camera_id}/snap"
+        )
+        image = bytearray()
+
+        async with self.client.stream_request(
+            "GET", path, priority=Priority.NORMAL
+        ) as response:
+            if response.status_code == 204:
+                return None
+
+            async for chunk in self.client.iter_bytes(response):
+                image.extend(chunk)
+
+        return {
+            "image": bytes(image),
+            "content_type": response.headers.get("content-type", "image/png"),
+            "timestamp": time.time(),
+        }
+
     # Prusa Link Web UI still uses the old endpoints and it seems that the new v1 endpoint doesn't support this yet
-    async def get_file(self, path: str) -> bytes:
-        """Get a files such as Thumbnails or Icons. Path comes from the current job['file']['refs']['thumbnail']"""
-        async with self.client.request("GET", path) as response:
-            return await response.aread()
+    async def get_file(
+        self,
+        path: str,
+        max_bytes: int = MAX_FILE_BYTES,
+        m_timestamp: int | None = None,
+    ) -> bytes:
+        """Get a files such as Thumbnails or Icons. Path comes from the current job['file']['refs']['thumbnail']
+
+        Raises `FileTooLarge` instead of reading more than `max_bytes`. With
+        a `disk_cache`, passing the `m_timestamp` of the print file the
+        resource belongs to serves it from the cache while unchanged.
+        """
+        key = None
+        if self.disk_cache is not None and m_timestamp is not None:
+            key = cache_key("file", self.client.host, path, m_timestamp)
+            if (
+                cached := await asyncio.to_thread(self.disk_cache.get, key)
+            ) is not None:
+                return cached
+
+        data = bytearray()
+        await self.get_file_into(path, data, max_bytes)
+        if key is not None and self.disk_cache is not None:
+            await asyncio.to_thread(self.disk_cache.set, key, bytes(data))
+
+        return bytes(data)
+
+    async def iter_file(
+        self, path: str, max_bytes: int | None = MAX_FILE_BYTES
+    ) -> AsyncIterator[bytes]:
+        """Stream a file, yielding chunks as they arrive.
+
+        The next chunk is only read once the caller asks for it. Raises
+        `FileTooLarge` before yielding more than `max_bytes` in total; pass
+        None to stream files of any size.
+        """
+        received = 0
+
+        async with self.client.stream_request(
+            "GET", path, priority=Priority.NORMAL
+        ) as response:
+            if max_bytes is not None:
+                _check_content_length(response, path, max_bytes)
+
+            async for chunk in self.client.iter_bytes(response):
+                received += len(chunk)
+                if max_bytes is not None and received > max_bytes:
+                    raise FileTooLarge(f"File {path} is larger than {max_bytes} bytes")
+
+                yield chunk
+
+    async def get_file_into(
+        self,
+        path: str,
+        sink: bytearray | memoryview | IO[bytes],
+        max_bytes: int | None = MAX_FILE_BYTES,
+    ) -> int:
+        """Stream a file into a caller-provided buffer or sink.
+
+        A `bytearray` is extended, a writable `memoryview` is filled from
+        the start and also bounds the size of the file, and anything else
+        has its `write` method called with each chunk. Returns the number
+        of bytes written.
+        """
+        if isinstance(sink, memoryview):
+            max_bytes = len(sink) if max_bytes is None else min(max_bytes, len(sink))
+
+        written = 0
+        async for chunk in self.iter_file(path, max_bytes):
+            if isinstance(sink, memoryview):
+                sink[written : written + len(chunk)] = chunk
+            elif isinstance(sink, bytearray):
+                sink.extend(chunk)
+            else:
+                sink.write(chunk)
+            written += len(chunk)
+
+        return written
 
     async def get_file_metadata(
         self, path: str, max_bytes: int = MAX_FILE_METADATA_BYTES
     ) -> PrintFileMetadata:
-        """Get known metadata from a print file."""
-        downloaded = bytearray()
+        """Get known metadata from a print file.
 
-        async with self.client.stream_request("GET", path) as response:
-            if content_length := response.headers.get("content-length"):
-                try:
-                    expected_size = int(content_length)
-                except ValueError:
-                    expected_size = None
-
-                if expected_size is not None and expected_size > max_bytes:
-                    raise FileTooLarge(
-                        f"File {path} is {expected_size} bytes, "
-                        f"maximum is {max_bytes} bytes"
+        With a `metadata_cache`, only the first bytes of a file whose
+        metadata is already cached are downloaded. While another caller
+        parses the same file the stream is closed, and only opened again
+        if that parse fails.
+        """
+        while True:
+            async with self.client.stream_request("GET", path) as response:
+                expected_size = _check_content_length(response, path, max_bytes)
+                chunks = self.client.iter_bytes(response)
+                if self.metadata_cache is None or expected_size is None:
+                    return await _parse_chunks(
+                        path, chunks, bytearray(), max_bytes, self.parse_executor
                     )
 
-            async for chunk in response.aiter_bytes():
-                if len(downloaded) + len(chunk) > max_bytes:
-                    raise FileTooLarge(f"File {path} is larger than {max_bytes} bytes")
+                head = bytearray()
+                while len(head) < FINGERPRINT_BYTES and (
+                    chunk := await anext(chunks, None)
+                ):
+                    head.extend(chunk)
+
+                fingerprint = metadata_fingerprint(expected_size, head)
+                if not self.metadata_cache.is_pending(fingerprint):
+                    return await self.metadata_cache.get_or_parse(
+                        fingerprint,
+                        lambda: _parse_chunks(
+                            path, chunks, head, max_bytes, self.parse_executor
+                        ),
+                    )
+
+            # Another caller is parsing the same file and may need a stream
+            # slot to do so, so it is waited for with this stream closed.
+            if (metadata := await self.metadata_cache.wait(fingerprint)) is not None:
+                return metadata
+
+    async def get_file_range(self, path: str, start: int, end: int) -> bytes:
+        """Get the bytes `start` to `end` (inclusive) of a file.
+
+        If the printer ignores the `Range` header the file is streamed from
+        the beginning and the download stops once `end` is reached.
+        """
+        data = bytearray()
+        headers = {"Range": f"bytes={start}-{end}"}
+
+        async with self.client.stream_request("GET", path, headers=headers) as response:
+            skip = 0 if response.status_code == 206 else start
+            limit = end - start + 1
+
+            async for chunk in self.client.iter_bytes(response):
+                if skip:
+                    skipped = min(skip, len(chunk))
+                    chunk = chunk[skipped:]
+                    skip -= skipped
+                data.extend(chunk)
+                if len(data) >= limit:
+                    break
+
+        return bytes(data[:limit])
+
+    async def get_file_metadata_ranged(
+        self,
+        path: str,
+        size: int,
+        head_bytes: int = FILE_METADATA_HEAD_BYTES,
+        tail_bytes: int = FILE_METADATA_TAIL_BYTES,
+        m_timestamp: int | None = None,
+    ) -> PrintFileMetadata:
+        """Get known metadata from a print file of known size using byte ranges.
+
+        BG-code keeps its metadata blocks at the start of the file, so only
+        the head is downloaded. PrusaSlicer writes the G-code metadata
+        comments at the end, so text G-code also gets a tail range. With a
+        `disk_cache`, passing the file's `m_timestamp` serves unchanged
+        files without contacting the printer.
+        """
+        if size <= 0:
+            return {}
+
+        if self.disk_cache is None or m_timestamp is None:
+            return await self._get_file_metadata_ranged(
+                path, size, head_bytes, tail_bytes
+            )
+
+        key = cache_key("metadata", self.client.host, path, m_timestamp, size)
+        if (cached := await asyncio.to_thread(self.disk_cache.get, key)) is not None:
+            return cast(PrintFileMetadata, json.loads(cached))
+
+        metadata = await self._get_file_metadata_ranged(
+            path, size, head_bytes, tail_bytes
+        )
+        await asyncio.to_thread(self.disk_cache.set, key, json.dumps(metadata).encode())
+        return metadata
+
+    async def _get_file_metadata_ranged(
+        self, path: str, size: int, head_bytes: int, tail_bytes: int
+    ) -> PrintFileMetadata:
+        """Get metadata by byte ranges, sharing it through the metadata cache."""
+        if self.metadata_cache is None:
+            return await self._parse_ranges(path, size, b"", head_bytes, tail_bytes)
+
+        prefix = await self.get_file_range(path, 0, min(FINGERPRINT_BYTES, size) - 1)
+        return await self.metadata_cache.get_or_parse(
+            metadata_fingerprint(size, prefix),
+            lambda: self._parse_ranges(path, size, prefix, head_bytes, tail_bytes),
+        )
+
+    async def _parse_ranges(
+        self, path: str, size: int, prefix: bytes, head_bytes: int, tail_bytes: int
+    ) -> PrintFileMetadata:
+        """Download the head, and tail if needed, of a file and parse them.
+
+        `prefix` holds bytes already downloaded from the start of the file.
+        """
+        head_end = min(head_bytes, size)
+        head = prefix
+        if len(prefix) < head_end:
+            head += await self.get_file_range(path, len(prefix), head_end - 1)
+
+        if head.startswith(_BGCODE_MAGIC) or len(head) >= size:
+            return await parse_file_metadata_async(head, self.parse_executor)
+
+        tail_start = max(size - tail_bytes, len(head))
+        tail = await self.get_file_range(path, tail_start, size - 1)
+        return await parse_file_metadata_async(head + b"\n" + tail, self.parse_executor)
+
+    async def download_file(
+        self,
+        path: str,
+        dest: str | os.PathLike[str],
+        *,
+        checksum: str | None = None,
+        attempts: int = 3,
+    ) -> DownloadResult:
+        """Download a file straight to disk with constant memory use.
+
+        An existing partial file at `dest` is resumed with a `Range`
+        request, and an interrupted transfer is resumed up to `attempts`
+        times. Every resume is checked against the `Content-Range` the
+        printer answers with, and the download restarts from zero if the
+        printer ignores the range, if the size of its file changed between
+        attempts, or if the partial file is larger than the printer's file.
+        A partial file is complete when the printer rejects the range and
+        reports the same size.
+        Pass a `hashlib` algorithm name as `checksum` to compute a digest
+        of the complete file while streaming.
+        """
+        hasher = hashlib.new(checksum) if checksum is not None else None
+        fp = await asyncio.to_thread(open, dest, "ab")
+
+        try:
+            resumed_from = offset = fp.tell()
+            if hasher is not None and offset:
+                await asyncio.to_thread(_hash_file, dest, hasher)
+
+            async def restart() -> None:
+                nonlocal hasher, offset, resumed_from
+                await asyncio.to_thread(fp.truncate, 0)
+                resumed_from = offset = 0
+                if checksum is not None:
+                    hasher = hashlib.new(checksum)
+
+            started = time.monotonic()
+            # Size of the printer's file, once known.
+            total: int | None = None
+            attempt = 0
+            while True:
+                headers = {"Range": f"bytes={offset}-"} if offset else None
+                try:
+                    async with self.client.stream_request(
+                        "GET", path, headers=headers
+                    ) as response:
+                        if response.status_code == 206 and offset:
+                            range_start, size = _content_range(response)
+                            if range_start != offset or total not in (None, size):
+                                # The printer's file changed, start over.
+                                total = None
+                                await restart()
+                                continue
+                            total = size
+                        elif response.status_code != 206:
+                            # The printer ignored the range, start over.
+                            if offset:
+                                await restart()
+                            length = response.headers.get("content-length", "")
+                            total = int(length) if length.isdigit() else None
+
+                        async for chunk in self.client.iter_bytes(response):
+                            await asyncio.to_thread(fp.write, chunk)
+                            if hasher is not None:
+                                hasher.update(chunk)
+                            offset += len(chunk)
+                except HTTPStatusError as err:
+                    if not offset or err.response.status_code != 416:
+                        raise
+                    if _content_range(err.response)[1] == offset:
+                        # The partial file is already complete.
+                        break
+                    # The partial file is larger than the printer's file.
+                    total = None
+                    await restart()
+                except TransportError:
+                    attempt += 1
+                    if attempt >= attempts:
+                        raise
+                else:
+                    break
+        finally:
+            await asyncio.to_thread(fp.close)
+
+        elapsed = time.monotonic() - started
+        downloaded = offset - resumed_from
+        result: DownloadResult = {
+            "size": offset,
+            "bytes_downloaded": downloaded,
+            "resumed_from": resumed_from,
+            "elapsed": elapsed,
+            "bytes_per_second": downloaded / elapsed if elapsed else 0.0,
+        }
+        if hasher is not None:
+            result["checksum"] = hasher.hexdigest()
+
+        return result
+
+    async def upload_file(
+        self,
+        source: str | os.PathLike[str],
+        path: str,
+        *,
+        overwrite: bool = False,
+        print_after_upload: bool = False,
+    ) -> UploadResult:
+        """Upload a file to `path`, e.g. `/usb/benchy.bgcode`, unless already there.
+
+        The printer's file counts as identical when its size and its first
+        and last `FINGERPRINT_BYTES` bytes match, which costs a listing and
+        two small range requests instead of the transfer. With a
+        `disk_cache` the printer's fingerprint is remembered by
+        `m_timestamp`, so dispatching an unchanged file again only costs
+        the listing. Otherwise the file is streamed from disk; a different
+        file at `path` raises `Conflict` unless `overwrite` is set. The
+        firmware cannot resume an interrupted upload, so it starts over.
+
+        Firmware without the `upload-by-put` capability receives the file
+        through the legacy multipart `POST /api/files/<storage>`, which
+        cannot replace a file, and without /api/v1 the printer's files are
+        not compared first.
+        """
+        capabilities = await self.get_capabilities()
+        size = await asyncio.to_thread(os.path.getsize, source)
+        started = time.monotonic()
+
+        if capabilities["v1"] and await self._has_identical_file(source, path, size):
+            if print_after_upload:
+                async with self.client.request(
+                    "POST",
+                    f"/api/v1/files/{path.strip('/')}",
+                    priority=Priority.CONTROL,
+                ):
+                    pass
+            return {
+                "size": size,
+                "skipped": True,
+                "bytes_uploaded": 0,
+                "elapsed": time.monotonic() - started,
+                "bytes_per_second": 0.0,
+            }
+
+        if capabilities["upload_by_put"]:
+            headers = {
+                "Content-Length": str(size),
+                "Content-Type": "application/octet-stream",
+                "Overwrite": "?1" if overwrite else "?0",
+                "Print-After-Upload": "?1" if print_after_upload else "?0",
+            }
+            async with self.client.stream_request(
+                "PUT",
+                f"/api/v1/files/{path.strip('/')}",
+                headers=headers,
+                content=_FileContent(source),
+            ):
+                pass
+        else:
+            await self._upload_file_legacy(source, path, size, print_after_upload)
+
+        elapsed = time.monotonic() - started
+        return {
+            "size": size,
+            "skipped": False,
+            "bytes_uploaded": size,
+            "elapsed": elapsed,
+            "bytes_per_second": size / elapsed if elapsed else 0.0,
+        }
+
+    async def _upload_file_legacy(
+        self,
+        source: str | os.PathLike[str],
+        path: str,
+        size: int,
+        print_after_upload: bool,
+    ) -> None:
+        """Upload a file with the legacy multipart form."""
+        storage, _, remote_path = path.strip("/").partition("/")
+        folder, _, name = remote_path.rpartition("/")
+        content = _MultipartFileContent(
+            source,
+            name,
+            {"path": folder, "print": "true" if print_after_upload else "false"},
+        )
+        headers = {
+            "Content-Length": str(content.length(size)),
+            "Content-Type": f"multipart/form-data; boundary={content.boundary}",
+        }
+        async with self.client.stream_request(
+            "POST", f"/api/files/{storage}", headers=headers, content=content
+        ):
+            pass
+
+    async def _has_identical_file(
+        self, source: str | os.PathLike[str], path: str, size: int
+    ) -> bool:
+        """Return whether the printer already has the contents of `source`."""
+        try:
+            info = await self.get_files(path)
+        except NotFound:
+            return False
+
+        if info.get("size") != size:
+            return False
+
+        local = await asyncio.to_thread(_file_fingerprint, source, size)
+        return await self._remote_fingerprint(path, info, size) == local
+
+    async def _remote_fingerprint(self, path: str, info: FileInfo, size: int) -> str:
+        """Return the content fingerprint of a file on the printer."""
+        key = None
+        if (
+            self.disk_cache is not None
+            and (m_timestamp := info.get("m_timestamp")) is not None
+        ):
+            key = cache_key("fingerprint", self.client.host, path, m_timestamp, size)
+            if (
+                cached := await asyncio.to_thread(self.disk_cache.get, key)
+            ) is not None:
+                return cached.decode()
+
+        download_path = info.get("refs", {}).get("download", path)
+        head = tail = b""
+        if size:
+            head = await self.get_file_range(
+                download_path, 0, min(FINGERPRINT_BYTES, size) - 1
+            )
+        if size > FINGERPRINT_BYTES:
+            tail = await self.get_file_range(
+                download_path,
+                max(size - FINGERPRINT_BYTES, FINGERPRINT_BYTES),
+                size - 1,
+            )
+
+        fingerprint = _content_fingerprint(size, head, tail)
+        if self.disk_cache is not None and key is not None:
+            await asyncio.to_thread(self.disk_cache.set, key, fingerprint.encode())
+        return fingerprint
+
+    async def get_layer_index(self, path: str) -> LayerIndex:
+        """Stream a print file once and build its layer index."""
+        builder = LayerIndexBuilder()
+
+        async with self.client.stream_request("GET", path) as response:
+            async for chunk in self.client.iter_bytes(response):
+                builder.feed(chunk)
+
+        return builder.build()
+
+
+def _check_content_length(response: Response, path: str, max_bytes: int) -> int | None:
+    """Return the announced size of a response, failing if it is too large."""
+    try:
+        expected_size = int(response.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+    if expected_size > max_bytes:
+        raise FileTooLarge(
+            f"File {path} is {expected_size} bytes, maximum is {max_bytes} bytes"
+        )
+
+    return expected_size
+
+
+async def _parse_chunks(
+    path: str,
+    chunks: AsyncIterator[bytes],
+    downloaded: bytearray,
+    max_bytes: int,
+    executor: Executor | None,
+) -> PrintFileMetadata:
+    """Read the rest of a print file body and parse its metadata."""
+    if len(downloaded) > max_bytes:
+        raise FileTooLarge(f"File {path} is larger than {max_bytes} bytes")
+
+    async for chunk in chunks:
+        if len(downloaded) + len(chunk) > max_bytes:
+            raise FileTooLarge(f"File {path} is larger than {max_bytes} bytes")
+
+        downloaded.extend(chunk)
+
+    return await parse_file_metadata_async(bytes(downloaded), executor)
+
+
+def _content_range(response: Response) -> tuple[int | None, int | None]:
+    """Return the first byte and the complete size from `Content-Range`."""
+    match = _CONTENT_RANGE_PATTERN.fullmatch(
+        response.headers.get("Content-Range", "").strip()
+    )
+    if match is None:
+        return None, None
+
+    first, size = match.groups()
+    return (
+        int(first) if first is not None else None,
+        int(size) if size is not None else None,
+    )
+
+
+def _hash_file(path: str | os.PathLike[str], hasher: hashlib._Hash) -> None:
+    """Feed the contents of an existing file into a hash object."""
+    with open(path, "rb") as fp:
+        while chunk := fp.read(_HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+
+
+class _FileContent:
+    """Upload body read from disk.
+
+    Each iteration reads the file from the start, so the body can be sent
+    again on retries and digest authentication challenges.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = path
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        fp = await asyncio.to_thread(open, self._path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(fp.read, _UPLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await asyncio.to_thread(fp.close)
+
+
+class _MultipartFileContent:
+    """Legacy upload body: form fields followed by the file read from disk.
+
+    Like `_FileContent` it can be iterated more than once.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], name: str, fields: dict[str, str]
+    ) -> None:
+        self.boundary = secrets.token_hex(16)
+        self._file = _FileContent(path)
+        head = "".join(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"\r\n\r\n'
+            f"{value}\r\n"
+            for field, value in fields.items()
+        )
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        )
+        self._head = head.encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    def length(self, size: int) -> int:
+        """Return the length of the body for a file of `size` bytes."""
+        return len(self._head) + size + len(self._tail)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        async for chunk in self._file:
+            yield chunk
+        yield self._tail
+
+
+def _file_fingerprint(path: str | os.PathLike[str], size: int) -> str:
+    """Return the content fingerprint of a local file of `size` bytes."""
+    with open(path, "rb") as fp:
+        head = fp.read(FINGERPRINT_BYTES)
+        tail = b""
+        if size > FINGERPRINT_BYTES:
+            fp.seek(max(size - FINGERPRINT_BYTES, FINGERPRINT_BYTES))
+            tail = fp.read(FINGERPRINT_BYTES)
+
+    return _content_fingerprint(size, head, tail)
+
+
+def _content_fingerprint(size: int, head: bytes, tail: bytes) -> str:
+    """Return a fingerprint of a file's size, first and last bytes.
+
+    Text G-code ends with the print statistics, which tell apart slices
+    that share a header.
+    """
+    digest = hashlib.blake2b(tail, digest_size=16).hexdigest()
+    return f"{metadata_fingerprint(size, head)}:{digest}"
+
+
+def _parse_capabilities(version: VersionInfo) -> PrinterCapabilities:
+    """Derive the printer capabilities from the version response."""
+    api = version["api"]
+    try:
+        api_major = int(api.split(".", 1)[0])
+    except ValueError:
+        api_major = 0
+
+    # Firmware reports the flag as "upload-by-put" despite the OpenAPI spec.
+    reported = cast(dict[str, Any], version.get("capabilities", {}))
+    upload_by_put = reported.get("upload-by-put", reported.get("upload_by_put"))
 
-                downloaded.extend(chunk)
+    capabilities: PrinterCapabilities = {
+        "api": api,
+        "v1": api_major >= 2,
+        "upload_by_put": bool(upload_by_put),
+    }
+    if (firmware := version.get("firmware")) is not None:
+        capabilities["firmware"] = firmware
+    if (printer := version.get("printer")) is not None:
+        capabilities["printer"] = printer
+    if (server := version.get("server")) is not None:
+        capabilities["server"] = server
 
-        return parse_file_metadata(bytes(downloaded))
+    return capabilities
@@ -0,0 +1,308 @@
+"""Conversion of text G-code into binary BG-code."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from collections.abc import Iterator
+import re
+import struct
+from typing import IO
+import zlib
+
+from pyprusalink import heatshrink, meatpack
+from pyprusalink.file_metadata import (
+    _BGCODE_CRC32_CHECKSUM,
+    _BGCODE_DEFLATE_COMPRESSION,
+    _BGCODE_GCODE_BLOCK_TYPE,
+    _BGCODE_GCODE_MEATPACK_COMMENTS_ENCODING,
+    _BGCODE_GCODE_NO_ENCODING,
+    _BGCODE_HEATSHRINK_12_4_COMPRESSION,
+    _BGCODE_INI_ENCODING,
+    _BGCODE_MAGIC,
+    _BGCODE_NO_COMPRESSION,
+    _BGCODE_THUMBNAIL_BLOCK_TYPE,
+)
+
+# PrusaSlicer splits G-code into blocks of this many uncompressed bytes.
+GCODE_BLOCK_BYTES = 64 * 1024
+
+_BGCODE_VERSION = 1
+_BGCODE_FILE_METADATA_BLOCK_TYPE = 0
+_BGCODE_SLICER_METADATA_BLOCK_TYPE = 2
+_BGCODE_PRINTER_METADATA_BLOCK_TYPE = 3
+_BGCODE_PRINT_METADATA_BLOCK_TYPE = 4
+_THUMBNAIL_FORMATS = {b"": 0, b"_PNG": 0, b"_JPG": 1, b"_QOI": 2}
+_THUMBNAIL_BEGIN_PATTERN = re.compile(
+    rb";\s*thumbnail(_PNG|_JPG|_QOI)?\s+begin\s+(\d+)x(\d+)"
+)
+_THUMBNAIL_END_PATTERN = re.compile(rb";\s*thumbnail(_PNG|_JPG|_QOI)?\s+end")
+_METADATA_PATTERN = re.compile(rb";\s*([^=;]*?)\s*=\s*(.*?)\s*$")
+_PRODUCER_PATTERN = re.compile(rb";\s*generated by\s+(\S+(?:\s+\S+)?)\s+on\b")
+_CONFIG_BEGIN = b"; prusaslicer_config = begin"
+_CONFIG_END = b"; prusaslicer_config = end"
+# Printer metadata is what the printer shows and checks before printing,
+# the keys PrusaSlicer copies there from the other metadata.
+_PRINTER_METADATA_KEYS = (
+    "printer_model",
+    "filament_type",
+    "filament_abrasive",
+    "nozzle_diameter",
+    "nozzle_high_flow",
+    "bed_temperature",
+    "brim_width",
+    "fill_density",
+    "layer_height",
+    "temperature",
+    "ironing",
+    "support_material",
+    "max_layer_z",
+    "extruder_colour",
+    "filament used [mm]",
+    "filament used [cm3]",
+    "filament used [g]",
+    "filament cost",
+    "total filament used [g]",
+    "total filament cost",
+    "total filament used for wipe tower [g]",
+    "estimated printing time (normal mode)",
+    "estimated printing time (silent mode)",
+    # The objects the firmware can cancel, from the G-code header.
+    "objects_info",
+)
+
+
+class _GcodeLayout:
+    """Metadata and thumbnails found while scanning text G-code."""
+
+    def __init__(self) -> None:
+        self.producer: str | None = None
+        self.thumbnails: list[tuple[int, int, int, bytes]] = []
+        self.header_metadata: dict[str, str] = {}
+        self.print_metadata: dict[str, str] = {}
+        self.slicer_metadata: dict[str, str] = {}
+        # Offset of the comment-only tail holding the print statistics.
+        self.trailer_offset = 0
+
+
+def convert_gcode_to_bgcode(
+    source: IO[bytes], target: IO[bytes], compress: bool = True
+) -> int:
+    """Convert PrusaSlicer text G-code into BG-code and return its size.
+
+    `source` must be seekable: it is read twice because the metadata that
+    BG-code stores before the G-code blocks is written at the end of text
+    G-code. Thumbnails become thumbnail blocks, the statistics after the
+    last command become print metadata, the `prusaslicer_config` block
+    becomes slicer metadata, and the keys PrusaSlicer copies from these
+    and from the header comments, such as `objects_info`, become printer
+    metadata. Metadata blocks are deflated and G-code blocks are MeatPack
+    encoded and heatshrink compressed, as PrusaSlicer does, unless
+    `compress` is False, with every block CRC32 checked. MeatPack drops
+    the spaces of `G` commands, which decoders put back. Only thumbnails,
+    metadata and one G-code block are held in memory at a time. This does
+    blocking I/O and is CPU bound, at about 1 MB of G-code per second.
+    """
+    start = source.tell()
+    layout = _scan_gcode(source)
+    source.seek(start)
+
+    metadata_compression = (
+        _BGCODE_DEFLATE_COMPRESSION if compress else _BGCODE_NO_COMPRESSION
+    )
+    gcode_compression = (
+        _BGCODE_HEATSHRINK_12_4_COMPRESSION if compress else _BGCODE_NO_COMPRESSION
+    )
+    combined = {
+        **layout.slicer_metadata,
+        **layout.header_metadata,
+        **layout.print_metadata,
+    }
+    printer_metadata = {
+        key: combined[key] for key in _PRINTER_METADATA_KEYS if key in combined
+    }
+
+    written = target.write(
+        _BGCODE_MAGIC + struct.pack("<IH", _BGCODE_VERSION, _BGCODE_CRC32_CHECKSUM)
+    )
+    if layout.producer is not None:
+        written += _write_metadata_block(
+            target,
+            _BGCODE_FILE_METADATA_BLOCK_TYPE,
+            {"Producer": layout.producer},
+            metadata_compression,
+        )
+    written += _write_metadata_block(
+        target,
+        _BGCODE_PRINTER_METADATA_BLOCK_TYPE,
+        printer_metadata,
+        metadata_compression,
+    )
+    for image_format, width, height, image in layout.thumbnails:
+        written += _write_block(
+            target,
+            _BGCODE_THUMBNAIL_BLOCK_TYPE,
+            _BGCODE_NO_COMPRESSION,
+            struct.pack("<HHH", image_format, width, height),
+            image,
+        )
+    written += _write_metadata_block(
+        target,
+        _BGCODE_PRINT_METADATA_BLOCK_TYPE,
+        layout.print_metadata,
+        metadata_compression,
+    )
+    written += _write_metadata_block(
+        target,
+        _BGCODE_SLICER_METADATA_BLOCK_TYPE,
+        layout.slicer_metadata,
+        metadata_compression,
+    )
+
+    block = bytearray()
+    for line in _gcode_lines(source, layout, start):
+        if block and len(block) + len(line) > GCODE_BLOCK_BYTES:
+            written += _write_gcode_block(target, bytes(block), gcode_compression)
+            block.clear()
+        block += line
+    if block:
+        written += _write_gcode_block(target, bytes(block), gcode_compression)
+
+    return written
+
+
+def _scan_gcode(source: IO[bytes]) -> _GcodeLayout:
+    """Collect thumbnails and metadata from text G-code."""
+    layout = _GcodeLayout()
+    offset = source.tell()
+    thumbnail: tuple[int, int, int] | None = None
+    thumbnail_data: list[bytes] = []
+    in_config = False
+
+    for line in source:
+        offset += len(line)
+        stripped = line.strip()
+
+        if thumbnail is not None:
+            if _THUMBNAIL_END_PATTERN.match(stripped):
+                try:
+                    image = base64.b64decode(b"".join(thumbnail_data))
+                except binascii.Error:
+                    image = b""
+                if image:
+                    layout.thumbnails.append((*thumbnail, image))
+                thumbnail = None
+                thumbnail_data.clear()
+            else:
+                thumbnail_data.append(stripped.lstrip(b";").strip())
+        elif match := _THUMBNAIL_BEGIN_PATTERN.match(stripped):
+            image_format = _THUMBNAIL_FORMATS[match.group(1) or b""]
+            thumbnail = (image_format, int(match.group(2)), int(match.group(3)))
+        elif in_config:
+            if stripped == _CONFIG_END:
+                in_config = False
+            elif item := _metadata_item(stripped):
+                layout.slicer_metadata[item[0]] = item[1]
+        elif stripped == _CONFIG_BEGIN:
+            in_config = True
+        elif stripped.startswith(b";"):
+            if layout.producer is None and (match := _PRODUCER_PATTERN.match(stripped)):
+                layout.producer = match.group(1).decode("utf-8", errors="replace")
+            elif item := _metadata_item(stripped):
+                layout.print_metadata[item[0]] = item[1]
+        elif stripped:
+            # Only comments after the last command are print statistics;
+            # those before the first one describe the print as a whole.
+            if not layout.trailer_offset:
+                layout.header_metadata.update(layout.print_metadata)
+            layout.print_metadata.clear()
+            layout.trailer_offset = offset
+
+    return layout
+
+
+def _gcode_lines(
+    source: IO[bytes], layout: _GcodeLayout, offset: int
+) -> Iterator[bytes]:
+    """Yield the lines of text G-code not stored in other blocks."""
+    in_thumbnail = False
+    in_config = False
+
+    for line in source:
+        line_offset = offset
+        offset += len(line)
+        stripped = line.strip()
+
+        if in_thumbnail:
+            in_thumbnail = not _THUMBNAIL_END_PATTERN.match(stripped)
+        elif _THUMBNAIL_BEGIN_PATTERN.match(stripped):
+            in_thumbnail = True
+        elif in_config:
+            in_config = stripped != _CONFIG_END
+        elif stripped == _CONFIG_BEGIN:
+            in_config = True
+        elif line_offset < layout.trailer_offset or not _metadata_item(stripped):
+            yield line
+
+
+def _metadata_item(line: bytes) -> tuple[str, str] | None:
+    """Return the key and value of a `; key = value` comment line."""
+    if (match := _METADATA_PATTERN.match(line)) is None or not match.group(1):
+        return None
+
+    return (
+        match.group(1).decode("utf-8", errors="replace"),
+        match.group(2).decode("utf-8", errors="replace"),
+    )
+
+
+def _write_metadata_block(
+    target: IO[bytes], block_type: int, metadata: dict[str, str], compression: int
+) -> int:
+    """Write an INI-encoded metadata block."""
+    data = "".join(f"{key}={value}\n" for key, value in metadata.items())
+    return _write_block(
+        target,
+        block_type,
+        compression,
+        struct.pack("<H", _BGCODE_INI_ENCODING),
+        data.encode(),
+    )
+
+
+def _write_gcode_block(target: IO[bytes], data: bytes, compression: int) -> int:
+    """Write a G-code block, MeatPack encoded unless uncompressed."""
+    encoding = _BGCODE_GCODE_NO_ENCODING
+    if compression != _BGCODE_NO_COMPRESSION:
+        encoding = _BGCODE_GCODE_MEATPACK_COMMENTS_ENCODING
+        data = meatpack.encode(data)
+
+    return _write_block(
+        target,
+        _BGCODE_GCODE_BLOCK_TYPE,
+        compression,
+        struct.pack("<H", encoding),
+        data,
+    )
+
+
+def _write_block(
+    target: IO[bytes],
+    block_type: int,
+    compression: int,
+    parameters: bytes,
+    data: bytes,
+) -> int:
+    """Write a block with its CRC32 checksum and return the bytes written."""
+    if compression == _BGCODE_NO_COMPRESSION:
+        header = struct.pack("<HHI", block_type, compression, len(data))
+        payload = data
+    else:
+        if compression == _BGCODE_DEFLATE_COMPRESSION:
+            payload = zlib.compress(data)
+        else:
+            payload = heatshrink.compress(data)
+        header = struct.pack("<HHII", block_type, compression, len(data), len(payload))
+
+    block = header + parameters + payload
+    return target.write(block) + target.write(struct.pack("<I", zlib.crc32(block)))
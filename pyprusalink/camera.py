@@ -0,0 +1,64 @@
+"""Shared, rate-limited access to printer camera snapshots."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from pyprusalink.types import CameraSnapshot
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+DEFAULT_MAX_AGE = 10.0
+
+
+class SnapshotCache:
+    """Cache the latest snapshot of each camera of a printer.
+
+    A snapshot younger than `max_age` seconds is served from the cache, and
+    viewers asking for a camera while its snapshot is being fetched wait
+    for that fetch instead of starting their own. However many viewers
+    there are, each camera is fetched at most once per `max_age`.
+    """
+
+    def __init__(self, prusalink: PrusaLink, max_age: float = DEFAULT_MAX_AGE) -> None:
+        """Initialize the cache."""
+        self.prusalink = prusalink
+        self.max_age = max_age
+        self._snapshots: dict[str | None, tuple[float, CameraSnapshot | None]] = {}
+        self._fetches: dict[str | None, asyncio.Task[CameraSnapshot | None]] = {}
+
+    async def get(self, camera_id: str | None = None) -> CameraSnapshot | None:
+        """Get a snapshot of a camera, or of the default camera if None.
+
+        Returns None when the camera has no image available. Errors are
+        raised to every viewer waiting on the failed fetch and are not
+        cached.
+        """
+        if (cached := self._snapshots.get(camera_id)) is not None:
+            fetched_at, snapshot = cached
+            if time.monotonic() - fetched_at < self.max_age:
+                return snapshot
+
+        if (task := self._fetches.get(camera_id)) is None:
+            task = asyncio.create_task(self._fetch(camera_id))
+            self._fetches[camera_id] = task
+
+        # Shielded so that a viewer going away does not cancel the fetch
+        # shared with the other viewers.
+        return await asyncio.shield(task)
+
+    def invalidate(self, camera_id: str | None = None) -> None:
+        """Drop the cached snapshot of a camera."""
+        self._snapshots.pop(camera_id, None)
+
+    async def _fetch(self, camera_id: str | None) -> CameraSnapshot | None:
+        """Fetch a snapshot and store it in the cache."""
+        try:
+            snapshot = await self.prusalink.get_snapshot(camera_id)
+            self._snapshots[camera_id] = (time.monotonic(), snapshot)
+            return snapshot
+        finally:
+            del self._fetches[camera_id]
@@ -0,0 +1,169 @@
+"""Incremental catalog of the print files stored on a printer."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import TYPE_CHECKING, cast
+
+from pyprusalink.file_metadata import (
+    FILE_METADATA_HEAD_BYTES,
+    FILE_METADATA_TAIL_BYTES,
+)
+from pyprusalink.types import CatalogEntry, FileInfo, NotFound, PrinterUnavailable
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+_PRINT_FILE_TYPE = "PRINT_FILE"
+_CATALOG_VERSION = 1
+
+
+class FileCatalog:
+    """Print file catalog with slicer metadata for a printer's storage.
+
+    `refresh` walks a storage and only downloads metadata for files that
+    are new or whose size or `m_timestamp` changed, using byte ranges
+    rather than full downloads. The catalog can be persisted with `save`
+    and restored with `load`, so refreshes stay incremental across
+    restarts.
+    """
+
+    def __init__(
+        self,
+        entries: dict[str, CatalogEntry] | None = None,
+        head_bytes: int = FILE_METADATA_HEAD_BYTES,
+        tail_bytes: int = FILE_METADATA_TAIL_BYTES,
+    ) -> None:
+        """Initialize the catalog."""
+        self.entries: dict[str, CatalogEntry] = entries or {}
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+
+    async def refresh(
+        self, prusalink: PrusaLink, storage_path: str, max_concurrency: int = 2
+    ) -> list[str]:
+        """Update the catalog for a storage such as `/usb`.
+
+        Returns the paths of entries that were added or updated. Entries
+        under `storage_path` that no longer exist are removed, including
+        files deleted while the catalog is refreshed. Files whose metadata
+        cannot be fetched because the printer became unavailable are left
+        as they were and fetched again by the next refresh.
+        """
+        prefix = "/" + storage_path.strip("/") + "/"
+        seen: set[str] = set()
+        stale: list[tuple[str, FileInfo]] = []
+
+        async for path, info in prusalink.walk_files(
+            storage_path, max_concurrency=max_concurrency
+        ):
+            if info["type"] != _PRINT_FILE_TYPE:
+                continue
+
+            seen.add(path)
+            entry = self.entries.get(path)
+            if (
+                entry is None
+                or entry.get("size") != info.get("size")
+                or entry.get("m_timestamp") != info.get("m_timestamp")
+            ):
+                stale.append((path, info))
+
+        for path in [path for path in self.entries if path.startswith(prefix)]:
+            if path not in seen:
+                del self.entries[path]
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        changed: list[str] = []
+
+        async def update(path: str, info: FileInfo) -> None:
+            async with semaphore:
+                try:
+                    entry = await self._build_entry(prusalink, path, info)
+                except NotFound:
+                    self.entries.pop(path, None)
+                    return
+                except PrinterUnavailable:
+                    return
+            self.entries[path] = entry
+            changed.append(path)
+
+        tasks = [asyncio.create_task(update(path, info)) for path, info in stale]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # After an unexpected error the other files stop updating.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return [path for path, _ in stale if path in changed]
+
+    async def _build_entry(
+        self, prusalink: PrusaLink, path: str, info: FileInfo
+    ) -> CatalogEntry:
+        """Fetch the metadata of a print file and build its catalog entry."""
+        refs = info.get("refs", {})
+        download_path = refs.get("download", path)
+
+        if (size := info.get("size")) is not None:
+            metadata = await prusalink.get_file_metadata_ranged(
+                download_path,
+                size,
+                self.head_bytes,
+                self.tail_bytes,
+                m_timestamp=info.get("m_timestamp"),
+            )
+        else:
+            metadata = await prusalink.get_file_metadata(download_path)
+
+        entry: CatalogEntry = {"name": info["name"], "metadata": metadata}
+        if (display_name := info.get("display_name")) is not None:
+            entry["display_name"] = display_name
+        if size is not None:
+            entry["size"] = size
+        if (m_timestamp := info.get("m_timestamp")) is not None:
+            entry["m_timestamp"] = m_timestamp
+        if (thumbnail := refs.get("thumbnail")) is not None:
+            entry["thumbnail"] = thumbnail
+
+        return entry
+
+    def to_json(self) -> str:
+        """Serialize the catalog to JSON."""
+        return json.dumps(
+            {
+                "version": _CATALOG_VERSION,
+                "head_bytes": self.head_bytes,
+                "tail_bytes": self.tail_bytes,
+                "entries": self.entries,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> FileCatalog:
+        """Load a catalog serialized with `to_json`."""
+        parsed = json.loads(data)
+        if parsed.get("version") != _CATALOG_VERSION:
+            raise ValueError("Unsupported catalog format")
+
+        return cls(
+            cast(dict[str, CatalogEntry], parsed["entries"]),
+            parsed.get("head_bytes", FILE_METADATA_HEAD_BYTES),
+            parsed.get("tail_bytes", FILE_METADATA_TAIL_BYTES),
+        )
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write the catalog to a file. This does blocking I/O."""
+        tmp_path = f"{os.fspath(path)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            fp.write(self.to_json())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> FileCatalog:
+        """Read a catalog from a file. This does blocking I/O."""
+        with open(path, encoding="utf-8") as fp:
+            return cls.from_json(fp.read())
@@ -1,13 +1,38 @@
 from __future__ import annotations
 
-from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, AsyncIterator, Callable
+from contextlib import AbstractContextManager, asynccontextmanager, nullcontext
 import hashlib
+import logging
+import time
 from typing import Any
 
-from httpx import AsyncClient, DigestAuth, Request, Response
+from httpx import (
+    URL,
+    AsyncClient,
+    ConnectError,
+    ConnectTimeout,
+    DigestAuth,
+    Request,
+    Response,
+    TransportError,
+)
 from httpx._auth import _DigestAuthChallenge
-from pyprusalink.types import Conflict, InvalidAuth, NotFound
+from pyprusalink.deadline import remaining_budget
+from pyprusalink.limiter import Priority, RequestLimiter, Slot
+from pyprusalink.resilience import CircuitBreaker, RetryPolicy
+from pyprusalink.resolver import HostResolver
+from pyprusalink.stats import endpoint_label
+from pyprusalink.types import (
+    Conflict,
+    DeadlineExceeded,
+    InvalidAuth,
+    NotFound,
+    RequestRecord,
+)
+
+_LOGGER = logging.getLogger(__name__)
 
 
 # TODO remove after the following issues are fixed (in all supported firmwares for the latter one):
@@ -48,13 +73,135 @@ class DigestAuthWorkaround(DigestAuth):
         return "Digest " + self._get_header_value(format_args)
 
 
+class _RequestTrace:
+    """Collect instrumentation data for one logical API request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.record: RequestRecord = {
+            "method": method,
+            "endpoint": endpoint_label(path),
+            "status_code": None,
+            "attempts": 0,
+            "auth_challenges": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "duration": 0.0,
+            "processing": 0.0,
+            "phases": {},
+            "error": None,
+        }
+        self.response: Response | None = None
+        self._started = time.perf_counter()
+        self._steps_started: dict[str, float] = {}
+
+    async def on_trace_event(self, name: str, info: dict[str, Any]) -> None:
+        """Handle an httpcore trace event."""
+        step, _, event = name.rpartition(".")
+        step = step.partition(".")[2]
+
+        if event == "started":
+            self._steps_started[step] = time.perf_counter()
+        elif (started := self._steps_started.pop(step, None)) is not None:
+            phases = self.record["phases"]
+            phases[step] = phases.get(step, 0.0) + time.perf_counter() - started
+
+    def attempt_sent(self, request: Request, response: Response | None) -> None:
+        """Record one request attempt and its response, if any."""
+        round_trips = 1
+        self.record["attempts"] += 1
+
+        if response is not None:
+            challenges = sum(1 for r in response.history if r.status_code == 401)
+            round_trips += len(response.history)
+            self.record["auth_challenges"] += challenges
+            self.record["status_code"] = response.status_code
+            self.record["duration"] = time.perf_counter() - self._started
+            self.response = response
+
+        content_length = int(request.headers.get("content-length", 0))
+        self.record["bytes_sent"] += content_length * round_trips
+
+    def finish(self, error: BaseException | None) -> RequestRecord:
+        """Complete and return the request record."""
+        elapsed = time.perf_counter() - self._started
+
+        if self.response is None:
+            self.record["duration"] = elapsed
+        else:
+            self.record["bytes_received"] = self.response.num_bytes_downloaded
+            self.record["processing"] = elapsed - self.record["duration"]
+
+        if error is not None:
+            self.record["error"] = type(error).__name__
+
+        return self.record
+
+
+def _apply_deadline(request: Request) -> float | None:
+    """Cap the timeouts of a request to the remaining deadline budget.
+
+    Returns the remaining budget, or None when no deadline is set.
+    """
+    if (budget := remaining_budget()) is None:
+        return None
+
+    if budget <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the request was sent")
+
+    timeouts = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        phase: budget if timeouts.get(phase) is None else min(timeouts[phase], budget)
+        for phase in ("connect", "read", "write", "pool")
+    }
+    return budget
+
+
+def _host_and_port(url: URL) -> tuple[str, int]:
+    """Return the host and port a URL connects to."""
+    return url.host, url.port or (443 if url.scheme == "https" else 80)
+
+
 class ApiClient:
     def __init__(
-        self, async_client: AsyncClient, host: str, username: str, password: str
+        self,
+        async_client: AsyncClient,
+        host: str,
+        username: str,
+        password: str,
+        *,
+        retry: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        limiter: RequestLimiter | None = None,
+        resolver: HostResolver | None = None,
     ) -> None:
         self._async_client = async_client
         self.host = host
         self._auth = DigestAuthWorkaround(username=username, password=password)
+        self.retry = retry or RetryPolicy(attempts=1)
+        self.circuit_breaker = circuit_breaker
+        self.limiter = limiter
+        self.resolver = resolver
+        # Incremented whenever connecting to the printer fails, so state
+        # cached about it can be invalidated once it was unreachable.
+        self.connection_generation = 0
+        self._stream_slots: dict[Response, Slot] = {}
+        self._listeners: list[Callable[[RequestRecord], None]] = []
+
+    def add_listener(
+        self, listener: Callable[[RequestRecord], None]
+    ) -> Callable[[], None]:
+        """Register a callback receiving a record of every completed request.
+
+        Listeners are called synchronously when a request finishes and must
+        not block. Exceptions they raise are logged and otherwise ignored. Request tracing is skipped entirely while no listener is
+        registered. Returns a callable that removes the listener.
+        """
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
 
     def _raise_for_response_status(self, response: Response) -> None:
         """Raise library exceptions for known PrusaLink response statuses."""
@@ -69,6 +216,148 @@ class ApiClient:
 
         response.raise_for_status()
 
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        json_data: dict[str, Any] | None,
+        headers: dict[str, str] | None,
+        stream: bool,
+        trace: _RequestTrace | None,
+        slot: Slot | None,
+        content: bytes | AsyncIterable[bytes] | None = None,
+    ) -> Response:
+        """Send a request, applying the retry policy and circuit breaker.
+
+        The limiter `slot` of the request is released while backing off
+        before a retry. A streamed `content` body must be iterable more
+        than once, since retries and digest authentication send it again.
+        """
+        url = f"{self.host}{path}"
+        extensions = {"trace": trace.on_trace_event} if trace is not None else None
+        attempt = 0
+
+        while True:
+            request = self._async_client.build_request(
+                method,
+                url,
+                content=content,
+                json=json_data,
+                headers=headers,
+                extensions=extensions,
+            )
+            budget = _apply_deadline(request)
+            delay = self.retry.delay(attempt)
+            retry = self.retry.should_retry(method, attempt) and (
+                budget is None or delay < budget
+            )
+
+            try:
+                with self._guard():
+                    await self._resolve(request)
+                    response = await self._async_client.send(
+                        request, auth=self._auth, stream=stream
+                    )
+            except TransportError as err:
+                # A slow or interrupted response says nothing about whether
+                # the printer is reachable at that address.
+                if isinstance(err, (ConnectError, ConnectTimeout)):
+                    self.connection_generation += 1
+                    if self.resolver is not None:
+                        self.resolver.address_failed(
+                            *_host_and_port(URL(url)), request.url.host
+                        )
+                if trace is not None:
+                    trace.attempt_sent(request, None)
+                if not retry:
+                    raise
+            else:
+                if trace is not None:
+                    trace.attempt_sent(request, response)
+                if not retry or response.status_code not in self.retry.retry_statuses:
+                    return response
+                await response.aclose()
+
+            if slot is None:
+                await asyncio.sleep(delay)
+            else:
+                await slot.release_for(delay)
+            attempt += 1
+
+    async def _resolve(self, request: Request) -> None:
+        """Point a request at the cached address of its host.
+
+        The `Host` header was set from the original URL when the request
+        was built, and digest authentication only signs the path, so both
+        are unaffected. TLS keeps verifying the original host name. A
+        failed lookup is raised as `ConnectError`, so it is retried and
+        counted by the circuit breaker like a failed connection.
+        """
+        if self.resolver is None:
+            return
+
+        host, port = _host_and_port(request.url)
+        try:
+            address = await self.resolver.resolve(host, port)
+        except OSError as err:
+            raise ConnectError(
+                f"Cannot resolve {host}: {err}", request=request
+            ) from err
+        if address == host:
+            return
+
+        if request.url.scheme == "https":
+            request.extensions["sni_hostname"] = host
+        request.url = request.url.copy_with(host=address)
+
+    def _guard(self) -> AbstractContextManager[None]:
+        """Return the circuit breaker guard for one request attempt."""
+        if self.circuit_breaker is None:
+            return nullcontext()
+
+        return self.circuit_breaker.guard()
+
+    @asynccontextmanager
+    async def _slot(
+        self, priority: Priority, bulk: bool, trace: _RequestTrace | None
+    ) -> AsyncGenerator[Slot | None, None]:
+        """Hold a limiter slot, recording the time spent queued."""
+        if self.limiter is None:
+            yield None
+            return
+
+        queued = time.perf_counter()
+        async with self.limiter.slot(priority, bulk) as slot:
+            if trace is not None:
+                trace.record["phases"]["queue"] = time.perf_counter() - queued
+            yield slot
+
+    @asynccontextmanager
+    async def _traced(
+        self, method: str, path: str
+    ) -> AsyncGenerator[_RequestTrace | None, None]:
+        """Trace a logical request and notify listeners when it completes."""
+        if not self._listeners:
+            yield None
+            return
+
+        trace = _RequestTrace(method, path)
+        error: BaseException | None = None
+        try:
+            yield trace
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            record = trace.finish(error)
+            for listener in list(self._listeners):
+                # A failing listener must not change the request's outcome.
+                try:
+                    listener(record)
+                except Exception:
+                    _LOGGER.exception("Error in request listener %r", listener)
+
     @asynccontextmanager
     async def request(
         self,
@@ -76,16 +365,23 @@ class ApiClient:
         path: str,
         json_data: dict[str, Any] | None = None,
         try_auth: bool = True,
+        priority: Priority = Priority.NORMAL,
     ) -> AsyncGenerator[Response, None]:
         """Make a request to the PrusaLink API."""
-        url = f"{self.host}{path}"
+        async with self._traced(method, path) as trace:
+            async with self._slot(priority, False, trace) as slot:
+                response = await self._send(
+                    method,
+                    path,
+                    json_data=json_data,
+                    headers=None,
+                    stream=False,
+                    trace=trace,
+                    slot=slot,
+                )
 
-        response = await self._async_client.request(
-            method, url, json=json_data, auth=self._auth
-        )
-
-        self._raise_for_response_status(response)
-        yield response
+            self._raise_for_response_status(response)
+            yield response
 
     @asynccontextmanager
     async def stream_request(
@@ -93,12 +389,49 @@ class ApiClient:
         method: str,
         path: str,
         json_data: dict[str, Any] | None = None,
+        priority: Priority = Priority.BACKGROUND,
+        headers: dict[str, str] | None = None,
+        content: bytes | AsyncIterable[bytes] | None = None,
     ) -> AsyncGenerator[Response, None]:
-        """Make a streaming request to the PrusaLink API."""
-        url = f"{self.host}{path}"
+        """Make a streaming request to the PrusaLink API.
 
-        async with self._async_client.stream(
-            method, url, json=json_data, auth=self._auth
-        ) as response:
-            self._raise_for_response_status(response)
-            yield response
+        Streams count as bulk transfers for the limiter, whether the large
+        body is the response or the uploaded `content`.
+        """
+        async with (
+            self._traced(method, path) as trace,
+            self._slot(priority, True, trace) as slot,
+        ):
+            response = await self._send(
+                method,
+                path,
+                json_data=json_data,
+                headers=headers,
+                stream=True,
+                trace=trace,
+                slot=slot,
+                content=content,
+            )
+
+            if slot is not None:
+                self._stream_slots[response] = slot
+            try:
+                self._raise_for_response_status(response)
+                yield response
+            finally:
+                self._stream_slots.pop(response, None)
+                await response.aclose()
+
+    async def iter_bytes(self, response: Response) -> AsyncIterator[bytes]:
+        """Iterate over the body of a response from `stream_request`.
+
+        Between chunks the stream hands its limiter slot to any waiting
+        request of a higher priority, bounding the latency of control
+        commands issued while a large download is in progress.
+        """
+        slot = self._stream_slots.get(response)
+
+        async for chunk in response.aiter_bytes():
+            yield chunk
+            if slot is not None:
+                await slot.yield_to_higher_priority()
@@ -0,0 +1,50 @@
+"""Deadlines bounding the total time of PrusaLink operations."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import httpx
+from pyprusalink.types import DeadlineExceeded
+
+_DEADLINE: ContextVar[float | None] = ContextVar("pyprusalink_deadline", default=None)
+
+
+@asynccontextmanager
+async def deadline(seconds: float) -> AsyncGenerator[None, None]:
+    """Bound the time spent by all PrusaLink calls made in the block.
+
+    Every request made within the block gets its connect, read, write and
+    pool timeouts capped to the remaining budget. Retries that would not
+    fit are skipped, and whatever is still running when the budget runs
+    out, such as a queued request or a streamed download, is cancelled.
+    Raises `DeadlineExceeded`. Nested deadlines never extend an outer one.
+    """
+    loop = asyncio.get_running_loop()
+    when = loop.time() + seconds
+    if (outer := _DEADLINE.get()) is not None:
+        when = min(when, outer)
+
+    token = _DEADLINE.set(when)
+    try:
+        async with asyncio.timeout_at(when):
+            yield
+    except DeadlineExceeded:
+        raise
+    except (TimeoutError, httpx.TimeoutException) as err:
+        if loop.time() < when:
+            raise
+        raise DeadlineExceeded(f"Operation exceeded its {seconds} s deadline") from err
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining_budget() -> float | None:
+    """Return the seconds left before the current deadline, or None if unset."""
+    if (when := _DEADLINE.get()) is None:
+        return None
+
+    return when - asyncio.get_running_loop().time()
@@ -0,0 +1,124 @@
+"""Persistent cache of printer files shared between processes."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Seconds to wait for another process holding the database lock.
+_BUSY_TIMEOUT = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+def cache_key(
+    kind: str, host: str, path: str, m_timestamp: int, size: int | None = None
+) -> str:
+    """Return the key of a cached file derived from its printer listing.
+
+    A file is identified by the printer it lives on, its path, and its
+    `m_timestamp` and size as reported by the printer, so a re-uploaded
+    file gets a new key without having to be downloaded.
+    """
+    return f"{kind}:{host}{path}:{m_timestamp}:{'' if size is None else size}"
+
+
+class DiskCache:
+    """Size-bounded cache stored in an SQLite database.
+
+    Several processes can open the same file: SQLite's write-ahead log
+    lets readers proceed while another process writes. Once the stored
+    values exceed `max_bytes`, the least recently read entries are
+    evicted. Methods do blocking I/O; `PrusaLink` calls them in a worker
+    thread.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        """Open or create the cache database."""
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, key: str) -> bytes | None:
+        """Return a cached value and mark it as recently used."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return bytes(row[0])
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value, evicting the least recently used entries if needed."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                self._evict()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries beyond `max_bytes`."""
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        evicted: list[tuple[str]] = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY accessed"
+        ):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+
+        self._db.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            return int(count)
+
+    def clear(self) -> None:
+        """Delete all entries."""
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
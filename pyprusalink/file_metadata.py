@@ -2,13 +2,23 @@
 
 from __future__ import annotations
 
-from collections.abc import Mapping
+import asyncio
+from collections.abc import Iterable, Mapping
+from concurrent.futures import Executor
 import re
 from typing import Any
 import zlib
 
+from pyprusalink import heatshrink
 from pyprusalink.types import PrintFileMetadata
 
+# BG-code keeps metadata blocks at the start of the file while PrusaSlicer
+# writes text G-code metadata comments near the end, before the config block.
+FILE_METADATA_HEAD_BYTES = 256 * 1024
+FILE_METADATA_TAIL_BYTES = 128 * 1024
+# Below this size parsing takes less time than handing it to an executor.
+INLINE_PARSE_BYTES = 64 * 1024
+
 _BGCODE_MAGIC = b"GCDE"
 _BGCODE_FILE_HEADER_SIZE = 10
 _BGCODE_BLOCK_HEADER_SIZE = 8
@@ -18,7 +28,12 @@ _BGCODE_GCODE_BLOCK_TYPE = 1
 _BGCODE_THUMBNAIL_BLOCK_TYPE = 5
 _BGCODE_NO_COMPRESSION = 0
 _BGCODE_DEFLATE_COMPRESSION = 1
+_BGCODE_HEATSHRINK_11_4_COMPRESSION = 2
+_BGCODE_HEATSHRINK_12_4_COMPRESSION = 3
 _BGCODE_INI_ENCODING = 0
+_BGCODE_GCODE_NO_ENCODING = 0
+_BGCODE_GCODE_MEATPACK_ENCODING = 1
+_BGCODE_GCODE_MEATPACK_COMMENTS_ENCODING = 2
 _BGCODE_CRC32_CHECKSUM = 1
 _BGCODE_CRC32_SIZE = 4
 _FLOAT_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
@@ -33,6 +48,35 @@ def parse_file_metadata(data: bytes) -> PrintFileMetadata:
     return parse_metadata_mapping(_gcode_metadata_to_mapping(data))
 
 
+async def parse_file_metadata_async(
+    data: bytes, executor: Executor | None = None
+) -> PrintFileMetadata:
+    """Parse print file metadata without blocking the event loop.
+
+    Parsing runs in `executor`, or the event loop's default thread pool if
+    None. A `ProcessPoolExecutor` spreads parsing over several cores.
+    """
+    if len(data) < INLINE_PARSE_BYTES:
+        return parse_file_metadata(data)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, parse_file_metadata, data)
+
+
+async def parse_file_metadata_batch(
+    files: Iterable[bytes], executor: Executor | None = None
+) -> list[PrintFileMetadata]:
+    """Parse the metadata of many print files concurrently in `executor`.
+
+    Results are returned in the order of `files`.
+    """
+    return list(
+        await asyncio.gather(
+            *(parse_file_metadata_async(data, executor) for data in files)
+        )
+    )
+
+
 def parse_metadata_mapping(metadata: Mapping[str, Any] | None) -> PrintFileMetadata:
     """Normalize known Prusa print metadata keys."""
     parsed: PrintFileMetadata = {}
@@ -153,12 +197,24 @@ def _decode_bgcode_block(data: bytes, compression: int) -> str | None:
             decoded = zlib.decompress(data)
         except zlib.error:
             return None
+    elif (decoded_heatshrink := _decode_heatshrink(data, compression)) is not None:
+        decoded = decoded_heatshrink
     else:
         return None
 
     return decoded.decode("utf-8", errors="replace")
 
 
+def _decode_heatshrink(data: bytes, compression: int) -> bytes | None:
+    """Decompress heatshrink BG-code block data, or None if not heatshrink."""
+    if compression == _BGCODE_HEATSHRINK_11_4_COMPRESSION:
+        return heatshrink.decompress(data, 11, 4)
+    if compression == _BGCODE_HEATSHRINK_12_4_COMPRESSION:
+        return heatshrink.decompress(data, 12, 4)
+
+    return None
+
+
 def _bgcode_block_parameters_size(block_type: int) -> int:
     """Return the size of the block parameters."""
     if block_type == _BGCODE_THUMBNAIL_BLOCK_TYPE:
@@ -175,11 +231,11 @@ def _bgcode_checksum_size(checksum_type: int) -> int:
     return 0
 
 
-def _read_uint16(data: bytes, offset: int) -> int:
+def _read_uint16(data: bytes | bytearray, offset: int) -> int:
     return int.from_bytes(data[offset : offset + 2], "little")
 
 
-def _read_uint32(data: bytes, offset: int) -> int:
+def _read_uint32(data: bytes | bytearray, offset: int) -> int:
     return int.from_bytes(data[offset : offset + 4], "little")
 
 
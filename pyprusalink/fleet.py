@@ -0,0 +1,163 @@
+"""Job commands sent to many printers at once."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from enum import Enum
+import time
+from typing import TYPE_CHECKING
+
+from pyprusalink.limiter import Priority
+from pyprusalink.types import (
+    BroadcastOutcome,
+    BroadcastResult,
+    Conflict,
+    NotFound,
+    PrusaLinkError,
+)
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+
+# Legacy job states in which there is a job to command.
+_LEGACY_JOB_STATES = {"Printing", "Paused"}
+
+
+class JobCommand(Enum):
+    """Command applied to the current job of a printer."""
+
+    PAUSE = "pause"
+    RESUME = "resume"
+    CANCEL = "cancel"
+    CONTINUE = "continue"
+
+
+async def broadcast_job_command(
+    printers: Mapping[str, PrusaLink],
+    command: JobCommand,
+    timeout: float,
+) -> dict[str, BroadcastResult]:
+    """Send a job command to the current job of every printer concurrently.
+
+    Each printer's job id is read from `/api/v1/status` before the command
+    is sent, all at `Priority.CONTROL` so they jump ahead of queued polls.
+    Only printers answering that with 404 are probed with
+    `PrusaLink.get_capabilities`; those without /api/v1 are sent the
+    legacy `/api/job` command instead and report no job id. `CONTINUE` has
+    no legacy equivalent and fails on them. Printers still pending after
+    `timeout` seconds are abandoned and reported as `TIMED_OUT`, so the
+    call takes as long as the slowest printer, capped by the deadline.
+    Errors are reported per printer and never raised. Returns results
+    keyed like `printers`.
+    """
+    started = time.monotonic()
+    results: dict[str, BroadcastResult] = {
+        name: {
+            "outcome": BroadcastOutcome.TIMED_OUT,
+            "job_id": None,
+            "error": None,
+            "elapsed": 0.0,
+        }
+        for name in printers
+    }
+
+    async def send(prusalink: PrusaLink, result: BroadcastResult) -> None:
+        try:
+            await _command_current_job(prusalink, command, result)
+        except Conflict:
+            result["outcome"] = BroadcastOutcome.CONFLICT
+        except NotFound:
+            result["outcome"] = BroadcastOutcome.NOT_FOUND
+        except Exception as err:
+            result["outcome"] = BroadcastOutcome.ERROR
+            result["error"] = repr(err)
+
+        result["elapsed"] = time.monotonic() - started
+
+    tasks = [
+        asyncio.create_task(send(prusalink, results[name]))
+        for name, prusalink in printers.items()
+    ]
+    if not tasks:
+        return results
+
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    elapsed = time.monotonic() - started
+    for result in results.values():
+        if result["outcome"] is BroadcastOutcome.TIMED_OUT:
+            result["elapsed"] = elapsed
+
+    return results
+
+
+async def _command_current_job(
+    prusalink: PrusaLink, command: JobCommand, result: BroadcastResult
+) -> None:
+    """Send a job command to the job reported by `/api/v1/status`.
+
+    Falls back to the legacy API if the printer has no `/api/v1`.
+    """
+    try:
+        status = await prusalink.get_status(priority=Priority.CONTROL)
+    except NotFound:
+        capabilities = await prusalink.get_capabilities(
+            refresh=True, priority=Priority.CONTROL
+        )
+        if capabilities["v1"]:
+            raise
+        await _command_current_legacy_job(prusalink, command, result)
+        return
+
+    job = status.get("job", {})
+    if (job_id := job.get("id")) is None:
+        result["outcome"] = BroadcastOutcome.NO_JOB
+        return
+
+    result["job_id"] = job_id
+    await _send_job_command(prusalink, command, job_id)
+    result["outcome"] = BroadcastOutcome.DONE
+
+
+async def _command_current_legacy_job(
+    prusalink: PrusaLink, command: JobCommand, result: BroadcastResult
+) -> None:
+    """Send a job command through the legacy API, which has no job ids."""
+    job = await prusalink.get_legacy_job(priority=Priority.CONTROL)
+    if job["state"] not in _LEGACY_JOB_STATES:
+        result["outcome"] = BroadcastOutcome.NO_JOB
+        return
+
+    await _send_legacy_job_command(prusalink, command)
+    result["outcome"] = BroadcastOutcome.DONE
+
+
+async def _send_job_command(
+    prusalink: PrusaLink, command: JobCommand, job_id: int
+) -> None:
+    """Call the `PrusaLink` method implementing a job command."""
+    if command is JobCommand.PAUSE:
+        await prusalink.pause_job(job_id)
+    elif command is JobCommand.RESUME:
+        await prusalink.resume_job(job_id)
+    elif command is JobCommand.CANCEL:
+        await prusalink.cancel_job(job_id)
+    else:
+        await prusalink.continue_job(job_id)
+
+
+async def _send_legacy_job_command(prusalink: PrusaLink, command: JobCommand) -> None:
+    """Send a job command through the legacy `/api/job` endpoint."""
+    if command is JobCommand.PAUSE:
+        await prusalink.send_legacy_job_command("pause", "pause")
+    elif command is JobCommand.RESUME:
+        await prusalink.send_legacy_job_command("pause", "resume")
+    elif command is JobCommand.CANCEL:
+        await prusalink.send_legacy_job_command("cancel")
+    else:
+        raise PrusaLinkError(f"{command.value} is not supported without /api/v1")
@@ -0,0 +1,133 @@
+"""Heatshrink LZSS compression used by BG-code G-code blocks."""
+
+from __future__ import annotations
+
+DEFAULT_WINDOW_BITS = 12
+DEFAULT_LOOKAHEAD_BITS = 4
+
+# Candidates followed per position: longer chains find slightly longer
+# matches at a large cost in speed.
+_MAX_CHAIN = 8
+# A literal is a set flag bit followed by the byte.
+_LITERAL_TOKENS = [format(0x100 | byte, "09b") for byte in range(256)]
+
+
+def compress(
+    data: bytes,
+    window_bits: int = DEFAULT_WINDOW_BITS,
+    lookahead_bits: int = DEFAULT_LOOKAHEAD_BITS,
+) -> bytes:
+    """Compress data into a heatshrink stream.
+
+    Each token is a flag bit followed by either a literal byte or a back
+    reference of `window_bits` distance and `lookahead_bits` length bits.
+    Matches are found greedily through hash chains of the positions
+    sharing their first bytes, following at most `_MAX_CHAIN` candidates;
+    references shorter than the equivalent literals are not emitted.
+    Tokens are collected as bit strings and packed once at the end.
+    """
+    window = 1 << window_bits
+    max_length = 1 << lookahead_bits
+    min_length = (1 + window_bits + lookahead_bits) // 8 + 1
+    reference_format = f"0{1 + window_bits + lookahead_bits}b"
+    tokens: list[str] = []
+    size = len(data)
+    last_key = size - min_length
+    # The latest position of each key, and for each position the previous
+    # one with the same key.
+    heads: dict[bytes, int] = {}
+    previous = [-1] * size
+    position = 0
+
+    while position < size:
+        limit = size - position if size - position < max_length else max_length
+        match_start = match_length = 0
+
+        if position <= last_key:
+            candidate = heads.get(data[position : position + min_length], -1)
+            low = position - window if position > window else 0
+            if candidate >= low:
+                # Matches are compared as integers: the highest differing
+                # bit gives the length of the common prefix. A match may
+                # overlap the bytes it reproduces, as in the decoder.
+                target = int.from_bytes(data[position : position + limit], "big")
+                depth = _MAX_CHAIN
+                while candidate >= low and depth:
+                    other = int.from_bytes(data[candidate : candidate + limit], "big")
+                    length = limit - ((target ^ other).bit_length() + 7) // 8
+                    if length > match_length:
+                        match_start, match_length = candidate, length
+                        if length == limit:
+                            break
+                    candidate = previous[candidate]
+                    depth -= 1
+
+        if match_length >= min_length:
+            reference = (position - match_start - 1) << lookahead_bits
+            tokens.append(format(reference | (match_length - 1), reference_format))
+            end = position + match_length
+        else:
+            tokens.append(_LITERAL_TOKENS[data[position]])
+            end = position + 1
+
+        for index in range(position, end if end <= last_key else last_key + 1):
+            key = data[index : index + min_length]
+            previous[index] = heads.get(key, -1)
+            heads[key] = index
+        position = end
+
+    bits = "".join(tokens)
+    if not bits:
+        return b""
+
+    padding = -len(bits) % 8
+    return int(bits + "0" * padding, 2).to_bytes((len(bits) + padding) // 8, "big")
+
+
+def decompress(
+    data: bytes,
+    window_bits: int = DEFAULT_WINDOW_BITS,
+    lookahead_bits: int = DEFAULT_LOOKAHEAD_BITS,
+) -> bytes:
+    """Decompress a heatshrink stream.
+
+    Trailing padding bits that do not form a complete token are ignored.
+    """
+    output = bytearray()
+    total_bits = len(data) * 8
+    reference_bits = window_bits + lookahead_bits
+    position = 0
+
+    while position < total_bits:
+        if _read_bits(data, position, 1):
+            if position + 9 > total_bits:
+                break
+            output.append(_read_bits(data, position + 1, 8))
+            position += 9
+            continue
+
+        if position + 1 + reference_bits > total_bits:
+            break
+        distance = _read_bits(data, position + 1, window_bits) + 1
+        length = _read_bits(data, position + 1 + window_bits, lookahead_bits) + 1
+        position += 1 + reference_bits
+
+        if distance >= length and distance <= len(output):
+            start = len(output) - distance
+            output += output[start : start + length]
+            continue
+
+        # The window starts zero-filled, and overlapping copies repeat
+        # the bytes they have just produced.
+        for _ in range(length):
+            output.append(output[-distance] if distance <= len(output) else 0)
+
+    return bytes(output)
+
+
+def _read_bits(data: bytes, position: int, bits: int) -> int:
+    """Read `bits` bits starting at a bit position, most significant first."""
+    start = position >> 3
+    end = (position + bits + 7) >> 3
+    chunk = int.from_bytes(data[start:end], "big")
+    return (chunk >> (end * 8 - position - bits)) & ((1 << bits) - 1)
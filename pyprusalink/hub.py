@@ -0,0 +1,238 @@
+"""Polling hub sharing printer state between many local consumers."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable, Mapping
+import json
+import time
+from types import TracebackType
+from typing import TYPE_CHECKING
+
+from pyprusalink.types import PrinterSnapshot
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+DEFAULT_POLL_INTERVAL = 10.0
+# Server-sent event streams send a comment this often so that proxies keep
+# them open and disconnected clients are noticed.
+_SSE_KEEPALIVE = 15.0
+
+
+class Subscription:
+    """Stream of printer snapshots delivered by a `PollingHub`.
+
+    Updates are conflated: a subscriber that falls behind receives only the
+    latest snapshot of each printer, so slow consumers never build a
+    backlog. Iterate over it, or call `get`, and `close` it when done.
+    """
+
+    def __init__(self, hub: PollingHub, names: set[str] | None) -> None:
+        """Initialize the subscription."""
+        self._hub = hub
+        self._names = names
+        self._pending: dict[str, PrinterSnapshot] = {}
+        self._event = asyncio.Event()
+
+    def _publish(self, name: str, snapshot: PrinterSnapshot) -> None:
+        if self._names is None or name in self._names:
+            self._pending[name] = snapshot
+            self._event.set()
+
+    async def get(self) -> tuple[str, PrinterSnapshot]:
+        """Wait for the next updated printer and return its snapshot."""
+        while not self._pending:
+            self._event.clear()
+            await self._event.wait()
+
+        name = next(iter(self._pending))
+        return name, self._pending.pop(name)
+
+    def close(self) -> None:
+        """Stop receiving updates."""
+        self._hub._subscriptions.discard(self)
+
+    def __aiter__(self) -> Subscription:
+        return self
+
+    async def __anext__(self) -> tuple[str, PrinterSnapshot]:
+        return await self.get()
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class PollingHub:
+    """Poll printers once and share their state with any number of consumers.
+
+    Each printer's status is polled every `interval` seconds however many
+    subscribers there are. Consumers read the latest snapshots with
+    `snapshot`, receive updates with `subscribe`, or connect over HTTP to
+    the endpoint started by `serve`.
+    """
+
+    def __init__(
+        self,
+        printers: Mapping[str, PrusaLink],
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        """Initialize the hub."""
+        self.printers = dict(printers)
+        self.interval = interval
+        self._snapshots: dict[str, PrinterSnapshot] = {}
+        self._subscriptions: set[Subscription] = set()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def start(self) -> None:
+        """Start polling every printer."""
+        if self._tasks:
+            return
+
+        self._tasks = [
+            asyncio.create_task(self._poll(name, prusalink))
+            for name, prusalink in self.printers.items()
+        ]
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> PollingHub:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    def snapshot(self, name: str) -> PrinterSnapshot | None:
+        """Return the latest snapshot of a printer, or None before its first poll."""
+        return self._snapshots.get(name)
+
+    def snapshots(self) -> dict[str, PrinterSnapshot]:
+        """Return the latest snapshot of every polled printer."""
+        return dict(self._snapshots)
+
+    def subscribe(self, names: Iterable[str] | None = None) -> Subscription:
+        """Subscribe to snapshot updates of the named printers, or all if None.
+
+        The current snapshots are delivered first.
+        """
+        subscription = Subscription(self, None if names is None else set(names))
+        for name, snapshot in self._snapshots.items():
+            subscription._publish(name, snapshot)
+
+        self._subscriptions.add(subscription)
+        return subscription
+
+    async def _poll(self, name: str, prusalink: PrusaLink) -> None:
+        """Poll a printer at a fixed rate and publish its snapshots."""
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time()
+
+        while True:
+            previous = self._snapshots.get(name)
+            snapshot: PrinterSnapshot
+            try:
+                status = await prusalink.get_status()
+            except Exception as err:
+                snapshot = {
+                    "status": previous["status"] if previous else None,
+                    "error": repr(err),
+                    "timestamp": time.time(),
+                }
+            else:
+                snapshot = {"status": status, "error": None, "timestamp": time.time()}
+
+            self._snapshots[name] = snapshot
+            for subscription in list(self._subscriptions):
+                subscription._publish(name, snapshot)
+
+            next_poll = max(next_poll + self.interval, loop.time())
+            await asyncio.sleep(next_poll - loop.time())
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """Serve snapshots over HTTP on a local address.
+
+        `GET /printers` returns all snapshots as JSON, `GET /printers/{name}`
+        a single one, and `GET /events` streams updates as server-sent
+        events named `snapshot` with `{"printer": name, ...}` data. Close the
+        returned server to stop serving.
+        """
+        return await asyncio.start_server(self._handle_http, host, port)
+
+    async def _handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer one HTTP request."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+
+            if len(request_line) < 2 or request_line[0] != "GET":
+                await _respond(writer, 405, {"error": "method not allowed"})
+            elif request_line[1] == "/events":
+                await self._stream_events(writer)
+            elif request_line[1] == "/printers":
+                await _respond(writer, 200, self.snapshots())
+            elif request_line[1].startswith("/printers/") and (
+                snapshot := self.snapshot(request_line[1].removeprefix("/printers/"))
+            ):
+                await _respond(writer, 200, snapshot)
+            else:
+                await _respond(writer, 404, {"error": "not found"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _stream_events(self, writer: asyncio.StreamWriter) -> None:
+        """Stream snapshot updates to a server-sent events client."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        with self.subscribe() as subscription:
+            while True:
+                try:
+                    name, snapshot = await asyncio.wait_for(
+                        subscription.get(), _SSE_KEEPALIVE
+                    )
+                except TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                else:
+                    data = json.dumps({"printer": name, **snapshot})
+                    writer.write(f"event: snapshot\ndata: {data}\n\n".encode())
+                await writer.drain()
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, body: object) -> None:
+    """Write a JSON HTTP response."""
+    reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}[status]
+    payload = json.dumps(body).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        "Connection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
@@ -0,0 +1,296 @@
+"""Append-only history of finished print jobs."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+import json
+import math
+import os
+import time
+from typing import Any
+
+from pyprusalink.types import (
+    JobInfo,
+    JobRecord,
+    PrinterState,
+    PrinterStatus,
+    PrintFileMetadata,
+)
+
+_END_STATES = {
+    PrinterState.FINISHED.value,
+    PrinterState.STOPPED.value,
+    PrinterState.ERROR.value,
+}
+
+
+class _ActiveJob:
+    """A job seen running on a printer that has not been recorded yet."""
+
+    __slots__ = (
+        "job_id",
+        "started",
+        "state",
+        "path",
+        "progress",
+        "time_printing",
+        "metadata",
+    )
+
+    def __init__(self, job_id: int, started: float, state: str) -> None:
+        self.job_id = job_id
+        self.started = started
+        self.state = state
+        self.path: str | None = None
+        self.progress = 0.0
+        self.time_printing: int | None = None
+        self.metadata: PrintFileMetadata = {}
+
+
+class JobHistory:
+    """Record finished jobs to an append-only log and query them.
+
+    Feed it every status poll with `observe`: a job is started when its id
+    first appears and recorded once the printer reaches a final state or
+    the job disappears. Jobs first seen already ended are not recorded.
+    Records are appended to a JSON Lines file at `path`. Printer, file and
+    end time indexes, together with the filament used per job, are kept in
+    compact arrays, so filtering and aggregating millions of records does
+    not read the log. The indexes are not persisted: opening the history
+    parses the whole log once, which takes around ten seconds per million
+    records. Methods do blocking I/O.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        """Open the log, creating it if needed, and index its records."""
+        self.path = path
+        self._active: dict[str, _ActiveJob] = {}
+        self._recorded: dict[str, int] = {}
+
+        self._offsets = array("Q")
+        self._ended = array("d")
+        self._filament_g = array("f")
+        self._printer_ids = array("I")
+        self._file_ids = array("I")
+        self._printers: dict[str, int] = {}
+        self._files: dict[str, int] = {}
+        self._by_printer: dict[int, array[int]] = {}
+        self._by_file: dict[int, array[int]] = {}
+        self._sorted = True
+
+        with open(path, "a+b") as fp:
+            fp.seek(0)
+            offset = 0
+            for line in fp:
+                record: JobRecord | None
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if record is None or not line.endswith(b"\n"):
+                    # A record cut short by a crash.
+                    break
+                self._index(record, offset)
+                # A printer still showing its last recorded job after a
+                # restart must not record it again.
+                self._recorded[record["printer"]] = record["job_id"]
+                offset += len(line)
+
+            fp.truncate(offset)
+
+    def __len__(self) -> int:
+        """Return the number of recorded jobs."""
+        return len(self._offsets)
+
+    def observe(
+        self,
+        printer: str,
+        status: PrinterStatus,
+        job: JobInfo | None = None,
+        metadata: PrintFileMetadata | None = None,
+        timestamp: float | None = None,
+    ) -> JobRecord | None:
+        """Track the job of a printer from a status poll.
+
+        Pass the matching `get_job` response, if polled, to record the
+        printed file, and its `PrintFileMetadata` for the slicer estimates.
+        Returns the record written if the job ended.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        # The state is typed as an enum but arrives as a plain string.
+        raw_state: Any = status["printer"]["state"]
+        state = raw_state.value if isinstance(raw_state, PrinterState) else raw_state
+        status_job = status.get("job", {})
+        job_id = status_job.get("id")
+
+        if self._recorded.get(printer) != job_id:
+            self._recorded.pop(printer, None)
+
+        active = self._active.get(printer)
+        record = None
+        if active is not None and job_id != active.job_id:
+            # The job disappeared or was replaced between two polls, so the
+            # current state belongs to another job or to none.
+            record = self._finish(printer, active, active.state, timestamp)
+            active = None
+
+        if job_id is None or self._recorded.get(printer) == job_id:
+            return record
+
+        if active is None:
+            if state in _END_STATES:
+                # The job ended before it was first seen, so when it
+                # started and what it printed are unknown.
+                self._recorded[printer] = job_id
+                return record
+            active = self._active[printer] = _ActiveJob(job_id, timestamp, state)
+        else:
+            active.state = state
+        if (progress := status_job.get("progress")) is not None:
+            active.progress = float(progress)
+        if (time_printing := status_job.get("time_printing")) is not None:
+            active.time_printing = time_printing
+        if job is not None and job["id"] == job_id and (file := job["file"]):
+            active.path = f"{file['path'].rstrip('/')}/{file['name']}"
+        if metadata is not None:
+            active.metadata = metadata
+
+        if state in _END_STATES:
+            record = self._finish(printer, active, state, timestamp)
+            self._recorded[printer] = job_id
+
+        return record
+
+    def _finish(
+        self, printer: str, active: _ActiveJob, state: str, timestamp: float
+    ) -> JobRecord:
+        """Append the record of an ended job."""
+        del self._active[printer]
+        record: JobRecord = {
+            "printer": printer,
+            "job_id": active.job_id,
+            "path": active.path,
+            "state": state,
+            "started": active.started,
+            "ended": timestamp,
+            "progress": active.progress,
+            "time_printing": active.time_printing,
+            "metadata": active.metadata,
+        }
+        self.append(record)
+        return record
+
+    def append(self, record: JobRecord) -> None:
+        """Append a record to the log."""
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with open(self.path, "ab") as fp:
+            offset = fp.tell()
+            fp.write(line)
+
+        self._index(record, offset)
+
+    def _index(self, record: JobRecord, offset: int) -> None:
+        """Add a record to the in-memory indexes."""
+        number = len(self._offsets)
+        printer_id = self._printers.setdefault(record["printer"], len(self._printers))
+        file_id = 0
+        if (path := record["path"]) is not None:
+            file_id = self._files.setdefault(path, len(self._files) + 1)
+
+        self._by_printer.setdefault(printer_id, array("I")).append(number)
+        if file_id:
+            self._by_file.setdefault(file_id, array("I")).append(number)
+
+        if self._ended and record["ended"] < self._ended[-1]:
+            self._sorted = False
+        self._offsets.append(offset)
+        self._ended.append(record["ended"])
+        self._printer_ids.append(printer_id)
+        self._file_ids.append(file_id)
+        self._filament_g.append(_filament_used_g(record))
+
+    def _select(
+        self,
+        printer: str | None,
+        path: str | None,
+        since: float | None,
+        until: float | None,
+    ) -> Iterator[int]:
+        """Yield the numbers of the records matching all filters.
+
+        The smallest applicable index is scanned: the printer or file
+        index, or else a binary search of the end times.
+        """
+        low = -math.inf if since is None else since
+        high = math.inf if until is None else until
+        printer_id = file_id = None
+        candidates: Sequence[int]
+
+        if printer is not None:
+            if (printer_id := self._printers.get(printer)) is None:
+                return
+            candidates = self._by_printer[printer_id]
+        elif self._sorted:
+            candidates = range(
+                bisect_left(self._ended, low), bisect_right(self._ended, high)
+            )
+        else:
+            candidates = range(len(self._ended))
+
+        if path is not None:
+            if (file_id := self._files.get(path)) is None:
+                return
+            if len(self._by_file[file_id]) < len(candidates):
+                candidates = self._by_file[file_id]
+
+        for number in candidates:
+            if (
+                low <= self._ended[number] <= high
+                and printer_id in (None, self._printer_ids[number])
+                and file_id in (None, self._file_ids[number])
+            ):
+                yield number
+
+    def query(
+        self,
+        printer: str | None = None,
+        path: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> Iterator[JobRecord]:
+        """Yield the records of jobs matching all given filters.
+
+        `since` and `until` bound the time the jobs ended, inclusively.
+        """
+        with open(self.path, "rb") as fp:
+            for number in self._select(printer, path, since, until):
+                fp.seek(self._offsets[number])
+                yield json.loads(fp.readline())
+
+    def filament_used_by_printer(
+        self, since: float | None = None, until: float | None = None
+    ) -> dict[str, float]:
+        """Return grams of filament used per printer by jobs ended in a range.
+
+        Jobs stopped early count the share of the slicer estimate matching
+        their progress. Computed from the indexes without reading the log.
+        """
+        totals = [0.0] * len(self._printers)
+        for number in self._select(None, None, since, until):
+            if not math.isnan(used := self._filament_g[number]):
+                totals[self._printer_ids[number]] += used
+
+        return dict(zip(self._printers, totals))
+
+
+def _filament_used_g(record: JobRecord) -> float:
+    """Estimate the filament used by a job, NaN if the estimate is unknown."""
+    estimate = record["metadata"].get("filament_used_g")
+    if estimate is None:
+        return math.nan
+
+    return estimate * min(record["progress"], 100.0) / 100
@@ -0,0 +1,417 @@
+"""Layer index over Prusa print files for mapping job progress to layers."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+import re
+import struct
+import sys
+import zlib
+
+from pyprusalink import meatpack
+from pyprusalink.file_metadata import (
+    _BGCODE_BLOCK_HEADER_SIZE,
+    _BGCODE_COMPRESSED_BLOCK_HEADER_SIZE,
+    _BGCODE_DEFLATE_COMPRESSION,
+    _BGCODE_FILE_HEADER_SIZE,
+    _BGCODE_GCODE_BLOCK_TYPE,
+    _BGCODE_GCODE_MEATPACK_COMMENTS_ENCODING,
+    _BGCODE_GCODE_MEATPACK_ENCODING,
+    _BGCODE_GCODE_NO_ENCODING,
+    _BGCODE_MAGIC,
+    _BGCODE_NO_COMPRESSION,
+    _bgcode_block_parameters_size,
+    _bgcode_checksum_size,
+    _decode_heatshrink,
+    _read_uint16,
+    _read_uint32,
+)
+from pyprusalink.types import LayerPosition
+
+_INDEX_MAGIC = b"PLIX"
+_INDEX_VERSION = 1
+_INDEX_HEADER = struct.Struct("<4sHQQQd")
+_LAYER_EPSILON = 1e-4
+_WORD_PATTERN = re.compile(rb"([EPZ])\s*(-?\d*\.?\d+)")
+
+
+class LayerIndex:
+    """Compact tables mapping print file byte offsets to layers.
+
+    Each layer is stored as one row across typed arrays: the byte offset
+    where the layer starts, its Z height and the cumulative extrusion (mm
+    of filament) at that point. `M73 P` progress markers are kept as a
+    101-entry table of offsets so the percentage reported by the printer
+    can be mapped back to a position in the file.
+    """
+
+    __slots__ = (
+        "file_size",
+        "total_extrusion",
+        "_offsets",
+        "_z",
+        "_extrusion",
+        "_progress_offsets",
+    )
+
+    def __init__(
+        self,
+        file_size: int,
+        total_extrusion: float,
+        offsets: array[int],
+        z: array[float],
+        extrusion: array[float],
+        progress_offsets: array[int],
+    ) -> None:
+        """Initialize the index from prebuilt tables."""
+        self.file_size = file_size
+        self.total_extrusion = total_extrusion
+        self._offsets = offsets
+        self._z = z
+        self._extrusion = extrusion
+        self._progress_offsets = progress_offsets
+
+    @property
+    def layer_count(self) -> int:
+        """Return the number of layers in the print file."""
+        return len(self._offsets)
+
+    def offset_for_progress(self, progress: float) -> int:
+        """Return the file offset matching a job progress percentage."""
+        progress = min(max(progress, 0.0), 100.0)
+
+        if len(self._progress_offsets) == 101:
+            lower = int(progress)
+            start = self._progress_offsets[lower]
+            if lower == 100:
+                return start
+            end = self._progress_offsets[lower + 1]
+            return start + int((end - start) * (progress - lower))
+
+        return int(self.file_size * progress / 100)
+
+    def position_at_offset(self, offset: int) -> LayerPosition | None:
+        """Return the layer position for a byte offset in the print file."""
+        row = bisect_right(self._offsets, offset) - 1
+        if row < 0:
+            return None
+
+        start_offset = self._offsets[row]
+        used = self._extrusion[row]
+        if row + 1 < len(self._offsets):
+            end_offset = self._offsets[row + 1]
+            end_used = self._extrusion[row + 1]
+        else:
+            end_offset = self.file_size
+            end_used = self.total_extrusion
+
+        if end_offset > start_offset:
+            fraction = min((offset - start_offset) / (end_offset - start_offset), 1.0)
+            used += (end_used - used) * fraction
+
+        return {
+            "layer": row + 1,
+            "layer_count": len(self._offsets),
+            "z": self._z[row],
+            "filament_used_mm": used,
+            "filament_remaining_mm": max(self.total_extrusion - used, 0.0),
+        }
+
+    def position_at_progress(self, progress: float) -> LayerPosition | None:
+        """Return the layer position for a job progress percentage."""
+        return self.position_at_offset(self.offset_for_progress(progress))
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index into a compact binary representation."""
+        header = _INDEX_HEADER.pack(
+            _INDEX_MAGIC,
+            _INDEX_VERSION,
+            self.file_size,
+            len(self._offsets),
+            len(self._progress_offsets),
+            self.total_extrusion,
+        )
+        tables = (self._offsets, self._z, self._extrusion, self._progress_offsets)
+        return header + b"".join(_array_to_le_bytes(table) for table in tables)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> LayerIndex:
+        """Load an index serialized with `to_bytes`."""
+        if len(data) < _INDEX_HEADER.size:
+            raise ValueError("Layer index data is truncated")
+
+        magic, version, file_size, layers, progress, total = _INDEX_HEADER.unpack_from(
+            data
+        )
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+            raise ValueError("Unsupported layer index format")
+
+        offset = _INDEX_HEADER.size
+        offsets: array[int] = array("Q")
+        z: array[float] = array("d")
+        extrusion: array[float] = array("d")
+        progress_offsets: array[int] = array("Q")
+        for table, count in (
+            (offsets, layers),
+            (z, layers),
+            (extrusion, layers),
+            (progress_offsets, progress),
+        ):
+            offset = _array_from_le_bytes(table, data, offset, count)
+
+        return cls(file_size, total, offsets, z, extrusion, progress_offsets)
+
+
+class LayerIndexBuilder:
+    """Incrementally build a `LayerIndex` from G-code or BG-code chunks.
+
+    Data is consumed in a single pass so a print file can be indexed while
+    it is streamed from the printer without keeping it in memory.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the builder."""
+        self._buffer = bytearray()
+        self._buffer_offset = 0
+        self._bgcode: bool | None = None
+        self._checksum_size = 0
+
+        self._offsets: array[int] = array("Q")
+        self._z: array[float] = array("d")
+        self._extrusion: array[float] = array("d")
+        self._progress_offsets: array[int] = array("Q")
+
+        self._z_relative = False
+        self._e_relative = False
+        self._current_z = 0.0
+        self._current_e = 0.0
+        self._pending_z: float | None = None
+        self._pending_offset = 0
+        self._extruded = 0.0
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the print file."""
+        self._buffer.extend(chunk)
+
+        if self._bgcode is None:
+            if len(self._buffer) < len(_BGCODE_MAGIC):
+                return
+            self._bgcode = self._buffer.startswith(_BGCODE_MAGIC)
+
+        if self._bgcode:
+            self._consume_bgcode_blocks()
+        else:
+            self._consume_gcode_lines()
+
+    def build(self) -> LayerIndex:
+        """Finish indexing and return the built index."""
+        if not self._bgcode and self._buffer:
+            self._process_line(bytes(self._buffer), self._buffer_offset)
+            self._buffer_offset += len(self._buffer)
+            self._buffer.clear()
+
+        file_size = self._buffer_offset + len(self._buffer)
+        progress_offsets = self._progress_offsets
+        if progress_offsets:
+            progress_offsets = progress_offsets + array(
+                "Q", [file_size] * (101 - len(progress_offsets))
+            )
+
+        return LayerIndex(
+            file_size,
+            self._extruded,
+            self._offsets,
+            self._z,
+            self._extrusion,
+            progress_offsets,
+        )
+
+    def _consume_gcode_lines(self) -> None:
+        """Process all complete lines in the buffer."""
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return
+
+        offset = self._buffer_offset
+        for line in bytes(self._buffer[: end + 1]).splitlines(keepends=True):
+            self._process_line(line, offset)
+            offset += len(line)
+
+        del self._buffer[: end + 1]
+        self._buffer_offset = offset
+
+    def _consume_bgcode_blocks(self) -> None:
+        """Process all complete BG-code blocks in the buffer."""
+        if self._buffer_offset == 0:
+            if len(self._buffer) < _BGCODE_FILE_HEADER_SIZE:
+                return
+            self._checksum_size = _bgcode_checksum_size(_read_uint16(self._buffer, 8))
+            del self._buffer[:_BGCODE_FILE_HEADER_SIZE]
+            self._buffer_offset = _BGCODE_FILE_HEADER_SIZE
+
+        while len(self._buffer) >= _BGCODE_BLOCK_HEADER_SIZE:
+            block_type = _read_uint16(self._buffer, 0)
+            compression = _read_uint16(self._buffer, 2)
+            block_data_size = _read_uint32(self._buffer, 4)
+            header_size = _BGCODE_BLOCK_HEADER_SIZE
+
+            if compression != _BGCODE_NO_COMPRESSION:
+                if len(self._buffer) < _BGCODE_COMPRESSED_BLOCK_HEADER_SIZE:
+                    return
+                block_data_size = _read_uint32(self._buffer, 8)
+                header_size = _BGCODE_COMPRESSED_BLOCK_HEADER_SIZE
+
+            parameters_size = _bgcode_block_parameters_size(block_type)
+            block_size = (
+                header_size + parameters_size + block_data_size + self._checksum_size
+            )
+            if len(self._buffer) < block_size:
+                return
+
+            if block_type == _BGCODE_GCODE_BLOCK_TYPE:
+                encoding = _read_uint16(self._buffer, header_size)
+                data_start = header_size + parameters_size
+                block_data = bytes(
+                    self._buffer[data_start : data_start + block_data_size]
+                )
+                text = _decode_gcode_block(block_data, compression, encoding)
+                position = 0
+                for line in text.splitlines(keepends=True):
+                    # Compressed lines have no offset of their own, so it
+                    # is interpolated over the block by decoded position.
+                    self._process_line(
+                        line, self._buffer_offset + position * block_size // len(text)
+                    )
+                    position += len(line)
+
+            del self._buffer[:block_size]
+            self._buffer_offset += block_size
+
+    def _process_line(self, line: bytes, offset: int) -> None:
+        """Update the layer and extrusion state from one G-code line."""
+        code = line.split(b";", 1)[0].strip()
+        if not code:
+            return
+
+        command = code.split(None, 1)[0].upper()
+
+        if command in (b"G0", b"G1"):
+            self._process_move(code, offset)
+        elif command == b"G92":
+            for axis, value in _WORD_PATTERN.findall(code.upper()):
+                if axis == b"E":
+                    self._current_e = float(value)
+                elif axis == b"Z":
+                    self._current_z = float(value)
+        elif command == b"G90":
+            self._z_relative = self._e_relative = False
+        elif command == b"G91":
+            self._z_relative = self._e_relative = True
+        elif command == b"M82":
+            self._e_relative = False
+        elif command == b"M83":
+            self._e_relative = True
+        elif command == b"M73":
+            for axis, value in _WORD_PATTERN.findall(code.upper()):
+                if axis == b"P":
+                    self._record_progress(float(value), offset)
+
+    def _process_move(self, code: bytes, offset: int) -> None:
+        """Track Z changes and extrusion of a G0/G1 move."""
+        extrusion = 0.0
+
+        for axis, raw_value in _WORD_PATTERN.findall(code.upper()):
+            value = float(raw_value)
+            if axis == b"Z":
+                self._current_z = self._current_z + value if self._z_relative else value
+                self._pending_z = self._current_z
+                self._pending_offset = offset
+            elif axis == b"E":
+                if self._e_relative:
+                    extrusion = value
+                else:
+                    extrusion = value - self._current_e
+                    self._current_e = value
+
+        if extrusion <= 0:
+            self._extruded += extrusion
+            return
+
+        if self._pending_z is not None:
+            last_z = self._z[-1] if self._z else float("-inf")
+            if self._pending_z > last_z + _LAYER_EPSILON:
+                self._offsets.append(self._pending_offset)
+                self._z.append(self._pending_z)
+                self._extrusion.append(self._extruded)
+            self._pending_z = None
+        elif not self._offsets:
+            self._offsets.append(offset)
+            self._z.append(self._current_z)
+            self._extrusion.append(self._extruded)
+
+        self._extruded += extrusion
+
+    def _record_progress(self, progress: float, offset: int) -> None:
+        """Record the first offset at which each progress percentage is reached."""
+        target = min(int(progress), 100)
+        while len(self._progress_offsets) <= target:
+            self._progress_offsets.append(offset)
+
+
+def build_layer_index(data: bytes) -> LayerIndex:
+    """Build a layer index from complete G-code or BG-code bytes."""
+    builder = LayerIndexBuilder()
+    builder.feed(data)
+    return builder.build()
+
+
+def _decode_gcode_block(data: bytes, compression: int, encoding: int) -> bytes:
+    """Decode a BG-code G-code block into text G-code.
+
+    Raises `ValueError` for a corrupt block or an unknown compression or
+    encoding, rather than leaving its layers out of the index.
+    """
+    if compression == _BGCODE_DEFLATE_COMPRESSION:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as err:
+            raise ValueError(f"Corrupt BG-code G-code block: {err}") from err
+    elif compression != _BGCODE_NO_COMPRESSION:
+        if (decompressed := _decode_heatshrink(data, compression)) is None:
+            raise ValueError(f"Unsupported BG-code compression {compression}")
+        data = decompressed
+
+    if encoding == _BGCODE_GCODE_NO_ENCODING:
+        return data
+    if encoding in (
+        _BGCODE_GCODE_MEATPACK_ENCODING,
+        _BGCODE_GCODE_MEATPACK_COMMENTS_ENCODING,
+    ):
+        return meatpack.decode(data)
+
+    raise ValueError(f"Unsupported BG-code G-code encoding {encoding}")
+
+
+def _array_from_le_bytes(
+    table: array[int] | array[float], data: bytes, offset: int, count: int
+) -> int:
+    """Fill the array from little-endian bytes and return the next offset."""
+    end = offset + table.itemsize * count
+    if end > len(data):
+        raise ValueError("Layer index data is truncated")
+
+    table.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        table.byteswap()
+
+    return end
+
+
+def _array_to_le_bytes(table: array[int] | array[float]) -> bytes:
+    """Return the array contents as little-endian bytes."""
+    if sys.byteorder == "big":
+        table = array(table.typecode, table)
+        table.byteswap()
+
+    return table.tobytes()
@@ -0,0 +1,210 @@
+"""Per-printer request concurrency limiting."""
+
+from __future__ import annotations
+
+import asyncio
+from bisect import insort
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from enum import IntEnum
+import itertools
+
+# Prusa-Firmware-Buddy serves HTTP from an embedded stack that only handles a
+# couple of simultaneous connections before it starts resetting them.
+DEFAULT_MAX_REQUESTS = 2
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request. Lower values are served first."""
+
+    CONTROL = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class _Waiter:
+    """A queued request waiting for a slot."""
+
+    __slots__ = ("priority", "sequence", "future", "bulk")
+
+    def __init__(
+        self,
+        priority: Priority,
+        sequence: int,
+        future: asyncio.Future[None],
+        bulk: bool,
+    ) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.future = future
+        self.bulk = bulk
+
+    def __lt__(self, other: _Waiter) -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class Slot:
+    """A request slot held by an in-flight request."""
+
+    __slots__ = ("_limiter", "priority", "bulk", "held")
+
+    def __init__(self, limiter: RequestLimiter, priority: Priority, bulk: bool) -> None:
+        self._limiter = limiter
+        self.priority = priority
+        self.bulk = bulk
+        self.held = False
+
+    async def yield_to_higher_priority(self) -> None:
+        """Hand the slot over if a higher priority request is waiting.
+
+        Long-running streams call this between chunks. The slot is released
+        to the waiting request and re-acquired at this slot's priority, so a
+        control command never waits for a bulk transfer to finish. The
+        stream keeps its connection open meanwhile, so until the slot is
+        re-acquired one connection more than `max_requests` may be open.
+        """
+        if not self.held or not self._limiter._has_waiter_above(self.priority):
+            return
+
+        self.held = False
+        self._limiter._release(self.bulk)
+        await self._limiter._acquire(self.priority, self.bulk)
+        self.held = True
+
+    async def release_for(self, delay: float) -> None:
+        """Release the slot for `delay` seconds, then queue for it again.
+
+        Requests back off before a retry this way, so a flaky printer does
+        not hold up the requests queued behind the retrying one.
+        """
+        if not self.held:
+            await asyncio.sleep(delay)
+            return
+
+        self.held = False
+        self._limiter._release(self.bulk)
+        await asyncio.sleep(delay)
+        await self._limiter._acquire(self.priority, self.bulk)
+        self.held = True
+
+
+class RequestLimiter:
+    """Limit the number of in-flight requests to a single printer.
+
+    Requests beyond `max_requests` wait in a queue ordered by `Priority`
+    and then by arrival, so control commands jump ahead of queued polls.
+    Bulk transfers (streamed downloads) are additionally limited to
+    `max_streams` slots, by default one less than `max_requests`, so at
+    least one slot always remains available for small status calls. With
+    HTTP/1.1 every in-flight request occupies its own connection, so this
+    also bounds the number of connections opened to the printer, except
+    while a stream has yielded its slot to a higher priority request (see
+    `Slot.yield_to_higher_priority`), when one more connection is open.
+
+    Share one instance between all clients talking to the same printer.
+    """
+
+    def __init__(
+        self, max_requests: int = DEFAULT_MAX_REQUESTS, max_streams: int | None = None
+    ) -> None:
+        """Initialize the limiter."""
+        if max_requests < 1:
+            raise ValueError("max_requests must be at least 1")
+
+        self.max_requests = max_requests
+        self.max_streams = (
+            max(1, max_requests - 1) if max_streams is None else max_streams
+        )
+        self._in_flight = 0
+        self._streams = 0
+        self._waiters: list[_Waiter] = []
+        self._sequence = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of requests currently holding a slot."""
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority = Priority.NORMAL, bulk: bool = False
+    ) -> AsyncGenerator[Slot, None]:
+        """Hold a request slot for the duration of the context."""
+        slot = Slot(self, priority, bulk)
+        await self._acquire(priority, bulk)
+        slot.held = True
+        try:
+            yield slot
+        finally:
+            if slot.held:
+                slot.held = False
+                self._release(bulk)
+
+    def _can_acquire(self, bulk: bool) -> bool:
+        """Return whether a request may start right now."""
+        if self._in_flight >= self.max_requests:
+            return False
+
+        return not bulk or self._streams < self.max_streams
+
+    def _has_waiter_above(self, priority: Priority) -> bool:
+        """Return whether a request with a higher priority is queued."""
+        return bool(self._waiters) and self._waiters[0].priority < priority
+
+    async def _acquire(self, priority: Priority, bulk: bool) -> None:
+        """Wait until a slot is available and take it."""
+        # Queued waiters are only left waiting while they cannot start, so a
+        # request that can start now does not jump ahead of an eligible one.
+        if self._can_acquire(bulk):
+            self._take(bulk)
+            return
+
+        waiter = _Waiter(
+            priority,
+            next(self._sequence),
+            asyncio.get_running_loop().create_future(),
+            bulk,
+        )
+        insort(self._waiters, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted just before the cancellation.
+                self._release(bulk)
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _take(self, bulk: bool) -> None:
+        self._in_flight += 1
+        if bulk:
+            self._streams += 1
+
+    def _release(self, bulk: bool) -> None:
+        self._in_flight -= 1
+        if bulk:
+            self._streams -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Grant free slots to queued requests in priority order.
+
+        A bulk request blocked by the stream limit does not hold up the
+        small requests queued behind it.
+        """
+        for waiter in list(self._waiters):
+            if self._in_flight >= self.max_requests:
+                return
+
+            if not self._can_acquire(waiter.bulk):
+                continue
+
+            self._waiters.remove(waiter)
+            self._take(waiter.bulk)
+            waiter.future.set_result(None)
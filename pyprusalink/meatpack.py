@@ -0,0 +1,213 @@
+"""MeatPack G-code packing used by BG-code G-code blocks."""
+
+from __future__ import annotations
+
+import re
+
+# Two signal bytes in a row are followed by a command byte.
+_SIGNAL_BYTE = 0xFF
+_COMMAND_ENABLE_PACKING = 0xFB
+_COMMAND_DISABLE_PACKING = 0xFA
+_COMMAND_RESET_ALL = 0xF9
+_COMMAND_ENABLE_NO_SPACES = 0xF7
+_COMMAND_DISABLE_NO_SPACES = 0xF6
+
+# A nibble of 0b1111 means the character follows as a full byte.
+_UNPACKED = 0xF
+_PACKED_CHARACTERS = b"0123456789. \nGX"
+# Without spaces, the space code stands for `E` instead.
+_PACKED_CHARACTERS_NO_SPACES = b"0123456789.E\nGX"
+_NEWLINE = ord("\n")
+_SPACE = ord(" ")
+_COMMENT = ord(";")
+_QUOTE = ord('"')
+# Characters continuing a command word such as `G1` or `M862.3`.
+_COMMAND_WORD_CHARACTERS = frozenset(b"0123456789.")
+# Commands whose argument is free text, which keeps its spaces as is.
+_FREE_TEXT_COMMANDS = frozenset(
+    (b"M0", b"M1", b"M23", b"M28", b"M30", b"M32", b"M117", b"M118")
+)
+# Maps every byte to its packed code without spaces, or `_UNPACKED`.
+_ENCODE_TABLE = bytes(
+    (
+        _PACKED_CHARACTERS_NO_SPACES.index(byte)
+        if byte in _PACKED_CHARACTERS_NO_SPACES
+        else _UNPACKED
+    )
+    for byte in range(256)
+)
+_G_COMMAND_PATTERN = re.compile(rb"\s*[Gg]\d")
+
+
+def encode(data: bytes) -> bytes:
+    """Pack text G-code into a MeatPack stream without spaces.
+
+    Comments are kept, as in the BG-code PrusaSlicer writes. The commands
+    of `G` lines are uppercased and their spaces dropped, which `decode`
+    restores, and every line ends with a newline.
+    """
+    output = bytearray(
+        [
+            _SIGNAL_BYTE,
+            _SIGNAL_BYTE,
+            _COMMAND_ENABLE_PACKING,
+            _SIGNAL_BYTE,
+            _SIGNAL_BYTE,
+            _COMMAND_ENABLE_NO_SPACES,
+        ]
+    )
+    lines = data.split(b"\n")
+    if not lines[-1]:
+        lines.pop()
+
+    for line in lines:
+        command, separator, comment = line.partition(b";")
+        if _G_COMMAND_PATTERN.match(command):
+            command = command.upper().translate(None, b" \t")
+        # An odd line is padded with a newline, which ends the line anyway.
+        line = command + separator + comment + b"\n"
+        if len(line) % 2:
+            line += b"\n"
+        codes = line.translate(_ENCODE_TABLE)
+
+        for index in range(0, len(line), 2):
+            first = codes[index]
+            second = codes[index + 1]
+            output.append(first | second << 4)
+            if first == _UNPACKED:
+                output.append(line[index])
+            if second == _UNPACKED:
+                output.append(line[index + 1])
+
+    return bytes(output)
+
+
+def decode(data: bytes) -> bytes:
+    """Unpack a MeatPack stream into text G-code.
+
+    Each packed byte holds two characters from a table of 15 frequent
+    ones, least significant nibble first; other characters follow as
+    full bytes. Streams packed without spaces get a space inserted again
+    before every parameter letter of a command, outside of comments and
+    quoted strings, so the result reads like the text G-code it was made
+    from. The free text argument of commands such as `M117` is left as is.
+    """
+    unpacker = _Unpacker()
+    for byte in data:
+        unpacker.feed(byte)
+
+    return bytes(unpacker.output)
+
+
+class _Unpacker:
+    """State of a MeatPack stream being decoded."""
+
+    def __init__(self) -> None:
+        self.output = bytearray()
+        self._packing = False
+        self._no_spaces = False
+        self._signals = 0
+        # Full characters still expected, and a packed one to emit after.
+        self._literals = 0
+        self._held: int | None = None
+        # The command word of the current line, until its parameters start.
+        self._word: bytearray | None = bytearray()
+        self._free_text = False
+        self._in_quotes = False
+        self._in_comment = False
+
+    def feed(self, byte: int) -> None:
+        """Decode the next byte of the stream."""
+        if byte == _SIGNAL_BYTE and self._signals < 2:
+            self._signals += 1
+            return
+
+        if self._signals == 2:
+            self._signals = 0
+            self._command(byte)
+            return
+
+        if self._signals:
+            # A single signal byte is a pair of full characters.
+            self._signals = 0
+            self._unpack(_SIGNAL_BYTE)
+        self._unpack(byte)
+
+    def _command(self, command: int) -> None:
+        if command == _COMMAND_ENABLE_PACKING:
+            self._packing = True
+        elif command == _COMMAND_DISABLE_PACKING:
+            self._packing = False
+        elif command == _COMMAND_RESET_ALL:
+            self._packing = self._no_spaces = False
+        elif command == _COMMAND_ENABLE_NO_SPACES:
+            self._no_spaces = True
+        elif command == _COMMAND_DISABLE_NO_SPACES:
+            self._no_spaces = False
+
+    def _unpack(self, byte: int) -> None:
+        if not self._packing:
+            self._emit(byte)
+            return
+
+        if self._literals:
+            self._literals -= 1
+            self._emit(byte)
+            if self._held is not None:
+                self._emit(self._held)
+                self._held = None
+            return
+
+        table = _PACKED_CHARACTERS_NO_SPACES if self._no_spaces else _PACKED_CHARACTERS
+        first = byte & 0xF
+        second = byte >> 4
+        if first == _UNPACKED:
+            self._literals = 1
+            if second == _UNPACKED:
+                self._literals = 2
+            else:
+                self._held = table[second]
+            return
+
+        self._emit(table[first])
+        # A packed newline ends the line, leaving the other nibble unused.
+        if table[first] == _NEWLINE:
+            return
+        if second == _UNPACKED:
+            self._literals = 1
+        else:
+            self._emit(table[second])
+
+    def _emit(self, character: int) -> None:
+        if character == _NEWLINE:
+            self._word = bytearray()
+            self._free_text = self._in_quotes = self._in_comment = False
+        elif self._in_comment or self._free_text:
+            pass
+        elif character == _COMMENT and not self._in_quotes:
+            self._in_comment = True
+        elif self._word is not None:
+            if character in _COMMAND_WORD_CHARACTERS or (
+                not self._word and character != _SPACE
+            ):
+                self._word.append(character)
+            elif self._word:
+                self._free_text = bytes(self._word).upper() in _FREE_TEXT_COMMANDS
+                self._word = None
+                if not self._free_text:
+                    self._parameter(character)
+        else:
+            self._parameter(character)
+        self.output.append(character)
+
+    def _parameter(self, character: int) -> None:
+        """Track a character after the command word, spacing out parameters."""
+        if character == _QUOTE:
+            self._in_quotes = not self._in_quotes
+        elif (
+            self._no_spaces
+            and not self._in_quotes
+            and ord("A") <= character <= ord("Z")
+            and self.output[-1] != _SPACE
+        ):
+            self.output.append(_SPACE)
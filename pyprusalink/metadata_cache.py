@@ -0,0 +1,109 @@
+"""Print file metadata shared between printers by content fingerprint."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+import hashlib
+
+from pyprusalink.types import PrintFileMetadata
+
+# PrusaSlicer writes a header with the slicing date, thumbnails and, for
+# BG-code, the file metadata block first, so the leading bytes tell
+# different slices apart.
+FINGERPRINT_BYTES = 16 * 1024
+DEFAULT_MAX_ENTRIES = 256
+
+
+def metadata_fingerprint(size: int, head: bytes | bytearray) -> str:
+    """Return the content fingerprint of a file of `size` bytes.
+
+    `head` holds the first `FINGERPRINT_BYTES` bytes of the file, or the
+    whole file if it is shorter.
+    """
+    digest = hashlib.blake2b(head[:FINGERPRINT_BYTES], digest_size=16).hexdigest()
+    return f"{size}:{digest}"
+
+
+class MetadataCache:
+    """Parsed print file metadata keyed by content fingerprint.
+
+    Pass the same cache to several `PrusaLink` instances so that a file
+    printed on many printers is downloaded and parsed once: the others
+    only fetch enough of it to compute the fingerprint. Concurrent lookups
+    of the same fingerprint wait for the first one instead of downloading
+    the file themselves. The least recently used entries are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Initialize the cache."""
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, PrintFileMetadata] = OrderedDict()
+        self._pending: dict[str, asyncio.Event] = {}
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def get(self, fingerprint: str) -> PrintFileMetadata | None:
+        """Return a copy of the cached metadata, if any."""
+        if (metadata := self._entries.get(fingerprint)) is None:
+            return None
+
+        self._entries.move_to_end(fingerprint)
+        return metadata.copy()
+
+    def set(self, fingerprint: str, metadata: PrintFileMetadata) -> None:
+        """Store parsed metadata, evicting the least recently used entries."""
+        self._entries[fingerprint] = metadata.copy()
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._entries.clear()
+
+    def is_pending(self, fingerprint: str) -> bool:
+        """Return whether another caller is parsing the fingerprint."""
+        return fingerprint in self._pending
+
+    async def wait(self, fingerprint: str) -> PrintFileMetadata | None:
+        """Wait for pending parses of the fingerprint and return the result.
+
+        Returns None if no parse succeeded, so the caller parses the file
+        itself.
+        """
+        while (event := self._pending.get(fingerprint)) is not None:
+            await event.wait()
+
+        return self.get(fingerprint)
+
+    async def get_or_parse(
+        self,
+        fingerprint: str,
+        parse: Callable[[], Awaitable[PrintFileMetadata]],
+    ) -> PrintFileMetadata:
+        """Return cached metadata, or call `parse` and cache its result.
+
+        If another caller is already parsing the same fingerprint, wait for
+        it. Should it fail, for example because its printer went away, the
+        next waiter parses the file itself.
+        """
+        while True:
+            if (metadata := self.get(fingerprint)) is not None:
+                return metadata
+            if (event := self._pending.get(fingerprint)) is None:
+                break
+            await event.wait()
+
+        event = self._pending[fingerprint] = asyncio.Event()
+        try:
+            metadata = await parse()
+            self.set(fingerprint, metadata)
+            return metadata
+        finally:
+            del self._pending[fingerprint]
+            event.set()
@@ -0,0 +1,248 @@
+"""Record and replay HTTP traffic with a printer for offline testing."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator
+import gzip
+import json
+import os
+import time
+from typing import Any, TypedDict, cast
+
+import httpx
+
+_RECORDING_VERSION = 1
+
+
+class ReplayMismatch(LookupError):
+    """Error raised when a replayed request was not part of the recording."""
+
+
+class Exchange(TypedDict):
+    """One recorded request and response.
+
+    `elapsed` is the time until the response headers arrived. `chunks`
+    holds `(seconds since the request was sent, size)` pairs for each body
+    chunk, and `body` the chunks concatenated. Only the part of the body
+    read by the client is recorded.
+    """
+
+    method: str
+    url: str
+    authorized: bool
+    range: str | None
+    status_code: int
+    headers: list[tuple[str, str]]
+    elapsed: float
+    chunks: list[tuple[float, int]]
+    body: bytes
+
+
+_ExchangeKey = tuple[str, str, bool, str | None]
+
+
+def _request_key(request: httpx.Request) -> _ExchangeKey:
+    """Return the key matching a request to its recorded exchanges.
+
+    Whether a request carries credentials is part of the key so that digest
+    challenges and authorized retries are replayed in the right order. The
+    host is not, so a recording can be replayed against any address.
+    """
+    return (
+        request.method,
+        request.url.raw_path.decode("ascii"),
+        "authorization" in request.headers,
+        request.headers.get("range"),
+    )
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Response body stream that records chunks as the client reads them."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        exchange: Exchange,
+        started: float,
+        exchanges: list[Exchange],
+    ) -> None:
+        self._stream = stream
+        self._exchange = exchange
+        self._started = started
+        self._exchanges = exchanges
+        self._body = bytearray()
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            offset = time.perf_counter() - self._started
+            self._exchange["chunks"].append((offset, len(chunk)))
+            self._body.extend(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        await self._stream.aclose()
+        self._exchange["body"] = bytes(self._body)
+        self._exchanges.append(self._exchange)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Transport that records the exchanges it forwards to `transport`.
+
+    Pass it to the `AsyncClient` given to `PrusaLink`, then write what was
+    captured with `save`. Credentials are never recorded.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        """Initialize the transport."""
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.exchanges: list[Exchange] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Forward a request and record its response."""
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        method, url, authorized, range_header = _request_key(request)
+        exchange: Exchange = {
+            "method": method,
+            "url": url,
+            "authorized": authorized,
+            "range": range_header,
+            "status_code": response.status_code,
+            "headers": [
+                (key.decode("latin-1"), value.decode("latin-1"))
+                for key, value in response.headers.raw
+            ],
+            "elapsed": time.perf_counter() - started,
+            "chunks": [],
+            "body": b"",
+        }
+
+        stream = cast(httpx.AsyncByteStream, response.stream)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(stream, exchange, started, self.exchanges),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write the recorded exchanges to a file. This does blocking I/O."""
+        save_exchanges(path, self.exchanges)
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """Response body stream that replays recorded chunks and their timing."""
+
+    def __init__(self, exchange: Exchange, time_scale: float) -> None:
+        self._exchange = exchange
+        self._time_scale = time_scale
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        body = self._exchange["body"]
+        position = 0
+        previous = self._exchange["elapsed"]
+
+        for offset, size in self._exchange["chunks"]:
+            if self._time_scale:
+                await asyncio.sleep(max(offset - previous, 0.0) * self._time_scale)
+            previous = offset
+            yield body[position : position + size]
+            position += size
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transport serving recorded exchanges without a printer.
+
+    Requests are matched on method, path, `Range` header and whether they
+    carry credentials; identical requests get their recorded responses in
+    order, and the last one is repeated once they run out. Response
+    headers and body chunks are delayed by their recorded timing
+    multiplied by `time_scale`, so 0 serves them as fast as possible.
+    """
+
+    def __init__(self, exchanges: list[Exchange], time_scale: float = 1.0) -> None:
+        """Initialize the transport."""
+        self.time_scale = time_scale
+        self._exchanges: defaultdict[_ExchangeKey, deque[Exchange]] = defaultdict(deque)
+        for exchange in exchanges:
+            key = (
+                exchange["method"],
+                exchange["url"],
+                exchange["authorized"],
+                exchange["range"],
+            )
+            self._exchanges[key].append(exchange)
+
+    @classmethod
+    def load(
+        cls, path: str | os.PathLike[str], time_scale: float = 1.0
+    ) -> ReplayTransport:
+        """Create a transport from a recording file. This does blocking I/O."""
+        return cls(load_exchanges(path), time_scale)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Serve the recorded response for a request."""
+        queue = self._exchanges.get(_request_key(request))
+        if not queue:
+            raise ReplayMismatch(
+                f"No recorded response for {request.method} {request.url}"
+            )
+
+        exchange = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.time_scale:
+            await asyncio.sleep(exchange["elapsed"] * self.time_scale)
+
+        return httpx.Response(
+            exchange["status_code"],
+            headers=exchange["headers"],
+            stream=_ReplayStream(exchange, self.time_scale),
+        )
+
+
+def save_exchanges(path: str | os.PathLike[str], exchanges: list[Exchange]) -> None:
+    """Write exchanges to a gzip compressed JSON file."""
+    data = {
+        "version": _RECORDING_VERSION,
+        "exchanges": [
+            {**exchange, "body": base64.b64encode(exchange["body"]).decode("ascii")}
+            for exchange in exchanges
+        ],
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as fp:
+        json.dump(data, fp, separators=(",", ":"))
+
+
+def load_exchanges(path: str | os.PathLike[str]) -> list[Exchange]:
+    """Read exchanges written by `save_exchanges`."""
+    with gzip.open(path, "rt", encoding="utf-8") as fp:
+        data: dict[str, Any] = json.load(fp)
+
+    if data.get("version") != _RECORDING_VERSION:
+        raise ValueError("Unsupported recording format")
+
+    return [
+        {
+            "method": exchange["method"],
+            "url": exchange["url"],
+            "authorized": exchange["authorized"],
+            "range": exchange["range"],
+            "status_code": exchange["status_code"],
+            "headers": [(key, value) for key, value in exchange["headers"]],
+            "elapsed": exchange["elapsed"],
+            "chunks": [(offset, size) for offset, size in exchange["chunks"]],
+            "body": base64.b64decode(exchange["body"]),
+        }
+        for exchange in data["exchanges"]
+    ]
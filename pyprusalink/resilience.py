@@ -0,0 +1,115 @@
+"""Retry and circuit breaker policies for the PrusaLink API client."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum
+import random
+import time
+
+from httpx import TransportError
+from pyprusalink.types import PrinterUnavailable
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RetryPolicy:
+    """Retry idempotent requests with jittered exponential backoff.
+
+    Only transport errors (connect failures, timeouts, resets) and the
+    configured HTTP statuses are retried. The delay before retry `n` is
+    drawn uniformly from `[0, min(max_delay, base_delay * 2**n)]` so that
+    many clients polling the same printer do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        retry_statuses: frozenset[int] = frozenset({502, 503, 504}),
+    ) -> None:
+        """Initialize the retry policy."""
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def should_retry(self, method: str, attempt: int) -> bool:
+        """Return whether a failed attempt (0-based) may be retried."""
+        return method.upper() in IDEMPOTENT_METHODS and attempt + 1 < self.attempts
+
+    def delay(self, attempt: int) -> float:
+        """Return the backoff delay in seconds after a failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class CircuitState(Enum):
+    """State of a circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fail fast while a printer is known to be unreachable.
+
+    After `failure_threshold` consecutive transport errors the circuit
+    opens and requests raise `PrinterUnavailable` without touching the
+    network. Once `reset_timeout` seconds have passed a single probe
+    request is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0) -> None:
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        """Return the current state of the circuit."""
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return CircuitState.HALF_OPEN
+
+        return CircuitState.OPEN
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Guard one request attempt, recording its outcome."""
+        state = self.state
+        if state is CircuitState.OPEN or (
+            state is CircuitState.HALF_OPEN and self._probe_in_flight
+        ):
+            raise PrinterUnavailable("Printer is unreachable, failing fast")
+
+        if probe := state is CircuitState.HALF_OPEN:
+            self._probe_in_flight = True
+
+        try:
+            yield
+        except TransportError:
+            self._record_failure()
+            raise
+        else:
+            self._failures = 0
+            self._opened_at = None
+        finally:
+            if probe:
+                self._probe_in_flight = False
+
+    def _record_failure(self) -> None:
+        """Record a transport error and open the circuit if needed."""
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,98 @@
+"""Cached host name resolution for printers on the local network."""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import socket
+import time
+
+DEFAULT_TTL = 300.0
+
+
+class HostResolver:
+    """Resolve printer host names once and reuse the addresses.
+
+    mDNS names such as `prusa-mk4.local` can take hundreds of milliseconds
+    to resolve, and may fail when the resolver is busy. All addresses of a
+    name are cached for `ttl` seconds and concurrent lookups of the same
+    name share one query. `ApiClient` calls `address_failed` when a
+    connection fails, moving on to the next address, so a printer that is
+    unreachable on one address or changed address is still found.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL) -> None:
+        """Initialize the resolver."""
+        self.ttl = ttl
+        self._addresses: dict[tuple[str, int], tuple[list[str], float]] = {}
+        self._lookups: dict[tuple[str, int], asyncio.Task[list[str]]] = {}
+
+    async def resolve(self, host: str, port: int) -> str:
+        """Return the address to connect to for a host name.
+
+        Lookup failures raise `OSError`, such as `socket.gaierror`.
+        """
+        if _is_ip_address(host):
+            return host
+
+        key = (host, port)
+        if (cached := self._addresses.get(key)) is not None:
+            addresses, expires = cached
+            if time.monotonic() < expires:
+                return addresses[0]
+
+        if (task := self._lookups.get(key)) is None:
+            task = asyncio.create_task(self._lookup(host, port))
+            self._lookups[key] = task
+
+        return (await asyncio.shield(task))[0]
+
+    def address_failed(self, host: str, port: int, address: str) -> None:
+        """Move past an address of a host name that could not be reached.
+
+        Once every cached address failed, the name is looked up again.
+        Failures of an address already moved past are ignored, so
+        concurrent requests failing together skip only one address.
+        """
+        key = (host, port)
+        if (cached := self._addresses.get(key)) is None:
+            return
+
+        addresses, expires = cached
+        if addresses[0] != address:
+            return
+
+        # The list is replaced rather than changed, since lookups still
+        # waiting for it hold a reference.
+        if len(addresses) > 1:
+            self._addresses[key] = (addresses[1:], expires)
+        else:
+            del self._addresses[key]
+
+    def invalidate(self, host: str, port: int) -> None:
+        """Forget the cached addresses of a host name."""
+        self._addresses.pop((host, port), None)
+
+    async def _lookup(self, host: str, port: int) -> list[str]:
+        """Query the system resolver and cache every address."""
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_STREAM
+            )
+            addresses = list(dict.fromkeys(str(info[4][0]) for info in infos))
+            if not addresses:
+                raise socket.gaierror(socket.EAI_NONAME, f"No address for {host}")
+            self._addresses[(host, port)] = (addresses, time.monotonic() + self.ttl)
+            return addresses
+        finally:
+            del self._lookups[(host, port)]
+
+
+def _is_ip_address(host: str) -> bool:
+    """Return whether a URL host is already an IP address."""
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+
+    return True
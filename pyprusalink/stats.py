@@ -0,0 +1,140 @@
+"""Request instrumentation for the PrusaLink API client."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import re
+
+from pyprusalink.types import EndpointStats, RequestRecord
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_COLLAPSED_PREFIXES = ("/api/v1/files/", "/api/files/", "/api/thumbnails/")
+_NUMERIC_SEGMENT_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(path: str) -> str:
+    """Return a low-cardinality label for a request path.
+
+    Numeric path segments such as job and transfer ids are replaced with
+    `{id}`, file paths are collapsed to their API prefix and downloads
+    outside of `/api/` are reported as `{file}`.
+    """
+    path = path.split("?", 1)[0]
+
+    for prefix in _COLLAPSED_PREFIXES:
+        if path.startswith(prefix):
+            return f"{prefix}{{path}}"
+
+    if not path.startswith("/api/"):
+        return "{file}"
+
+    return _NUMERIC_SEGMENT_PATTERN.sub("/{id}", path)
+
+
+class _EndpointCounters:
+    """Mutable counters for a single method and endpoint."""
+
+    __slots__ = (
+        "requests",
+        "errors",
+        "retries",
+        "auth_challenges",
+        "bytes_sent",
+        "bytes_received",
+        "latency_sum",
+        "latency_counts",
+        "phase_seconds",
+    )
+
+    def __init__(self, bucket_count: int) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.auth_challenges = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * (bucket_count + 1)
+        self.phase_seconds: dict[str, float] = {}
+
+
+class RequestStats:
+    """Aggregate request records per endpoint.
+
+    Register `record` as a listener on `ApiClient` to collect request
+    counts, a latency histogram, bytes in and out, digest challenge round
+    trips, retries and errors. Use `snapshot` to export the counters, for
+    example from a Prometheus collector or an OpenTelemetry observable.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """Initialize the stats with histogram bucket upper bounds in seconds."""
+        self.buckets = buckets
+        self._endpoints: dict[tuple[str, str], _EndpointCounters] = {}
+
+    def record(self, record: RequestRecord) -> None:
+        """Add a request record to the aggregated stats."""
+        key = (record["method"], record["endpoint"])
+        if (counters := self._endpoints.get(key)) is None:
+            counters = self._endpoints[key] = _EndpointCounters(len(self.buckets))
+
+        counters.requests += 1
+        counters.retries += record["attempts"] - 1
+        counters.auth_challenges += record["auth_challenges"]
+        counters.bytes_sent += record["bytes_sent"]
+        counters.bytes_received += record["bytes_received"]
+        counters.latency_sum += record["duration"]
+        counters.latency_counts[bisect_left(self.buckets, record["duration"])] += 1
+        if record["error"] is not None:
+            counters.errors += 1
+
+        for phase, seconds in record["phases"].items():
+            counters.phase_seconds[phase] = (
+                counters.phase_seconds.get(phase, 0.0) + seconds
+            )
+
+    def snapshot(self) -> dict[tuple[str, str], EndpointStats]:
+        """Return the stats keyed by method and endpoint label.
+
+        `latency_buckets` holds cumulative counts matching `buckets`, with a
+        final entry for the `+Inf` bucket.
+        """
+        result: dict[tuple[str, str], EndpointStats] = {}
+
+        for key, counters in self._endpoints.items():
+            cumulative: list[int] = []
+            total = 0
+            for count in counters.latency_counts:
+                total += count
+                cumulative.append(total)
+
+            result[key] = {
+                "requests": counters.requests,
+                "errors": counters.errors,
+                "retries": counters.retries,
+                "auth_challenges": counters.auth_challenges,
+                "bytes_sent": counters.bytes_sent,
+                "bytes_received": counters.bytes_received,
+                "latency_sum": counters.latency_sum,
+                "latency_buckets": cumulative,
+                "phase_seconds": dict(counters.phase_seconds),
+            }
+
+        return result
+
+    def reset(self) -> None:
+        """Clear all collected stats."""
+        self._endpoints.clear()
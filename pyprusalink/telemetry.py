@@ -0,0 +1,221 @@
+"""Fixed-memory telemetry history recorded from printer status polls."""
+
+from __future__ import annotations
+
+from array import array
+import importlib
+import math
+import time
+from typing import Any
+
+from pyprusalink.types import PrinterStatus
+
+TELEMETRY_FIELDS = (
+    "temp_nozzle",
+    "target_nozzle",
+    "temp_bed",
+    "target_bed",
+    "fan_hotend",
+    "fan_print",
+    "flow",
+    "speed",
+    "axis_x",
+    "axis_y",
+    "axis_z",
+)
+TELEMETRY_STATS = ("mean", "min", "max")
+
+# One day of 10 second polls, then 1 minute buckets for a day and
+# 10 minute buckets for a week.
+DEFAULT_CAPACITY = 8640
+DEFAULT_TIERS = ((60.0, 1440), (600.0, 1008))
+
+
+class _Tier:
+    """Ring buffers holding one resolution of the telemetry history.
+
+    Values are stored as float32 with NaN for missing readings, one array
+    per field and statistic, all sharing the same write position.
+    """
+
+    def __init__(
+        self, capacity: int, bucket_seconds: float, stats: tuple[str, ...]
+    ) -> None:
+        self.capacity = capacity
+        self.bucket_seconds = bucket_seconds
+        self.head = 0
+        self.size = 0
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = {
+            stat: {
+                field: array("f", [math.nan]) * capacity for field in TELEMETRY_FIELDS
+            }
+            for stat in stats
+        }
+
+        # Aggregation state of the bucket being filled.
+        self._bucket: float | None = None
+        self._count = [0] * len(TELEMETRY_FIELDS)
+        self._sum = [0.0] * len(TELEMETRY_FIELDS)
+        self._min = [math.inf] * len(TELEMETRY_FIELDS)
+        self._max = [-math.inf] * len(TELEMETRY_FIELDS)
+
+    def append(self, timestamp: float, stats: dict[str, list[float]]) -> None:
+        """Write one row of values for every field and statistic."""
+        self.timestamps[self.head] = timestamp
+        for stat, values in stats.items():
+            arrays = self.values[stat]
+            for field, value in zip(TELEMETRY_FIELDS, values):
+                arrays[field][self.head] = value
+
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def aggregate(self, timestamp: float, values: list[float]) -> None:
+        """Add a raw sample to the current bucket, flushing finished ones."""
+        bucket = timestamp - timestamp % self.bucket_seconds
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+
+        for i, value in enumerate(values):
+            if math.isnan(value):
+                continue
+            self._count[i] += 1
+            self._sum[i] += value
+            self._min[i] = min(self._min[i], value)
+            self._max[i] = max(self._max[i], value)
+
+    def flush(self) -> None:
+        """Write the current bucket to the ring buffers."""
+        if self._bucket is None:
+            return
+
+        fields = range(len(TELEMETRY_FIELDS))
+        self.append(
+            self._bucket,
+            {
+                "mean": [
+                    self._sum[i] / self._count[i] if self._count[i] else math.nan
+                    for i in fields
+                ],
+                "min": [self._min[i] if self._count[i] else math.nan for i in fields],
+                "max": [self._max[i] if self._count[i] else math.nan for i in fields],
+            },
+        )
+
+        self._bucket = None
+        self._count = [0] * len(TELEMETRY_FIELDS)
+        self._sum = [0.0] * len(TELEMETRY_FIELDS)
+        self._min = [math.inf] * len(TELEMETRY_FIELDS)
+        self._max = [-math.inf] * len(TELEMETRY_FIELDS)
+
+    def segments(self, data: array[float]) -> list[memoryview]:
+        """Return zero-copy views of a ring buffer in chronological order."""
+        view = memoryview(data)
+        if self.size < self.capacity:
+            return [view[: self.size]]
+
+        if self.head == 0:
+            return [view]
+
+        return [view[self.head :], view[: self.head]]
+
+
+class TelemetryRecorder:
+    """Record printer telemetry from `get_status` into fixed-size arrays.
+
+    Raw samples are kept in a ring buffer of `capacity` rows. Each entry of
+    `tiers` is a `(bucket_seconds, capacity)` pair describing a coarser
+    ring buffer that keeps the mean, minimum and maximum of every field
+    per bucket, so long histories stay cheap. Memory use is fixed when the
+    recorder is created.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        tiers: tuple[tuple[float, int], ...] = DEFAULT_TIERS,
+    ) -> None:
+        """Initialize the recorder."""
+        self._tiers = [_Tier(capacity, 0, ("mean",))] + [
+            _Tier(tier_capacity, bucket_seconds, TELEMETRY_STATS)
+            for bucket_seconds, tier_capacity in tiers
+        ]
+
+    @property
+    def tier_count(self) -> int:
+        """Return the number of tiers, including the raw tier 0."""
+        return len(self._tiers)
+
+    def record(self, status: PrinterStatus, timestamp: float | None = None) -> None:
+        """Record the telemetry of a status response."""
+        if timestamp is None:
+            timestamp = time.time()
+
+        printer: dict[str, Any] = dict(status["printer"])
+        values = [_to_float(printer.get(field)) for field in TELEMETRY_FIELDS]
+
+        self._tiers[0].append(timestamp, {"mean": values})
+        for tier in self._tiers[1:]:
+            tier.aggregate(timestamp, values)
+
+    def flush(self) -> None:
+        """Close the buckets currently being aggregated in all tiers."""
+        for tier in self._tiers[1:]:
+            tier.flush()
+
+    def __len__(self) -> int:
+        """Return the number of raw samples held."""
+        return self._tiers[0].size
+
+    def timestamps(self, tier: int = 0) -> list[memoryview]:
+        """Return zero-copy views of the sample or bucket start timestamps.
+
+        The history is returned as one or two contiguous segments in
+        chronological order, depending on whether the ring buffer wrapped.
+        """
+        selected = self._tiers[tier]
+        return selected.segments(selected.timestamps)
+
+    def values(self, field: str, tier: int = 0, stat: str = "mean") -> list[memoryview]:
+        """Return zero-copy views of a field's history, aligned with `timestamps`.
+
+        Tier 0 holds raw samples, for which every `stat` returns the same
+        values. Missing readings are NaN.
+        """
+        selected = self._tiers[tier]
+        stats = selected.values
+        return selected.segments(stats[stat if stat in stats else "mean"][field])
+
+    def to_numpy(self, field: str, tier: int = 0, stat: str = "mean") -> Any:
+        """Return a field's history as a NumPy float32 array.
+
+        The array shares memory with the recorder unless the ring buffer has
+        wrapped, in which case the two segments are concatenated. Requires
+        the optional `numpy` package.
+        """
+        return _segments_to_numpy(self.values(field, tier, stat), "float32")
+
+    def timestamps_to_numpy(self, tier: int = 0) -> Any:
+        """Return the timestamps as a NumPy float64 array."""
+        return _segments_to_numpy(self.timestamps(tier), "float64")
+
+
+def _segments_to_numpy(segments: list[memoryview], dtype: str) -> Any:
+    """Convert ring buffer segments to a NumPy array, copying only if needed."""
+    np = importlib.import_module("numpy")
+
+    arrays = [np.frombuffer(segment, dtype=dtype) for segment in segments]
+    if len(arrays) == 1:
+        return arrays[0]
+
+    return np.concatenate(arrays)
+
+
+def _to_float(value: Any) -> float:
+    """Convert a telemetry reading to float, using NaN when it is missing."""
+    if isinstance(value, int | float):
+        return float(value)
+
+    return math.nan
@@ -0,0 +1,615 @@
+"""Decoding, resizing and caching of print file thumbnails."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterable
+import importlib
+import io
+from operator import add
+import struct
+from typing import TYPE_CHECKING, Any
+import zlib
+
+from pyprusalink.bgcode import _scan_gcode
+from pyprusalink.file_metadata import (
+    _BGCODE_BLOCK_HEADER_SIZE,
+    _BGCODE_COMPRESSED_BLOCK_HEADER_SIZE,
+    _BGCODE_FILE_HEADER_SIZE,
+    _BGCODE_GCODE_BLOCK_TYPE,
+    _BGCODE_MAGIC,
+    _BGCODE_NO_COMPRESSION,
+    _BGCODE_THUMBNAIL_BLOCK_TYPE,
+    _bgcode_block_parameters_size,
+    _bgcode_checksum_size,
+    _read_uint16,
+    _read_uint32,
+)
+from pyprusalink.types import Thumbnail
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+# Text G-code thumbnails are base64 encoded comments at the start of the
+# file, so they need a larger head than the metadata.
+THUMBNAIL_HEAD_BYTES = 512 * 1024
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_IMAGES = 16
+
+_THUMBNAIL_FORMAT_NAMES = {0: "PNG", 1: "JPG", 2: "QOI"}
+_DECODABLE_FORMATS = {"PNG", "QOI"}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_QOI_MAGIC = b"qoif"
+_QOI_HEADER_SIZE = 14
+_QOI_END_MARKER_SIZE = 8
+
+
+class Image:
+    """An 8-bit RGBA image stored row by row in a `bytearray`."""
+
+    __slots__ = ("width", "height", "pixels")
+
+    def __init__(self, width: int, height: int, pixels: bytearray) -> None:
+        """Initialize the image from its pixels."""
+        if len(pixels) != width * height * 4:
+            raise ValueError("Pixel data does not match the image size")
+
+        self.width = width
+        self.height = height
+        self.pixels = pixels
+
+    def resize(self, width: int, height: int) -> Image:
+        """Return the image scaled to exactly `width` x `height`.
+
+        Each output pixel averages the source pixels it covers, weighted
+        by alpha so transparent backgrounds do not darken the edges.
+        Enlarging repeats pixels. Uses numpy when it is installed.
+        """
+        if width < 1 or height < 1:
+            raise ValueError("Image size must be positive")
+
+        if (np := _numpy()) is not None:
+            pixels = _resize_numpy(np, self, width, height)
+        else:
+            pixels = _resize_python(self, width, height)
+
+        return Image(width, height, pixels)
+
+    def fit(self, width: int, height: int) -> Image:
+        """Return the image scaled to fit `width` x `height`, keeping its aspect."""
+        scale = min(width / self.width, height / self.height)
+        return self.resize(
+            max(1, round(self.width * scale)), max(1, round(self.height * scale))
+        )
+
+    def to_png(self) -> bytes:
+        """Encode the image as PNG."""
+        stride = self.width * 4
+        raw = b"".join(
+            b"\x00" + self.pixels[row * stride : (row + 1) * stride]
+            for row in range(self.height)
+        )
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 6, 0, 0, 0)
+        return (
+            _PNG_SIGNATURE
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw))
+            + _png_chunk(b"IEND", b"")
+        )
+
+    def to_numpy(self) -> Any:
+        """Return a (height, width, 4) uint8 array sharing the pixel memory.
+
+        Requires the optional `numpy` package.
+        """
+        np = importlib.import_module("numpy")
+        return np.frombuffer(self.pixels, dtype=np.uint8).reshape(
+            self.height, self.width, 4
+        )
+
+
+class ThumbnailCache:
+    """Resized print file thumbnails memoized per file and size.
+
+    Both BG-code and text G-code keep their thumbnails at the start of the
+    file, so only the first `THUMBNAIL_HEAD_BYTES` bytes are downloaded.
+    The largest PNG or QOI thumbnail is decoded once and every requested
+    size is rendered once, then served from memory until the file's
+    `m_timestamp` changes. Concurrent requests for the same file share the
+    download and decode. Decoding and resizing run in the `PrusaLink`
+    instance's `parse_executor`. The least recently used renders beyond
+    `max_entries` and decoded images beyond `max_images` are evicted.
+    """
+
+    def __init__(
+        self,
+        prusalink: PrusaLink,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_images: int = DEFAULT_MAX_IMAGES,
+    ) -> None:
+        """Initialize the cache."""
+        self.prusalink = prusalink
+        self.max_entries = max_entries
+        self.max_images = max_images
+        self._rendered: OrderedDict[tuple[str, int, int, int], bytes] = OrderedDict()
+        self._images: OrderedDict[tuple[str, int], Image | None] = OrderedDict()
+        self._loads: dict[tuple[str, int], asyncio.Task[Image | None]] = {}
+
+    async def get(
+        self, path: str, m_timestamp: int, sizes: Iterable[tuple[int, int]]
+    ) -> dict[tuple[int, int], bytes]:
+        """Get PNG thumbnails of a print file fitted to each `(width, height)`.
+
+        Returns an empty dict if the file has no decodable thumbnail.
+        """
+        rendered: dict[tuple[int, int], bytes] = {}
+        missing: list[tuple[int, int]] = []
+        for size in dict.fromkeys(sizes):
+            key = (path, m_timestamp, *size)
+            if (png := self._rendered.get(key)) is not None:
+                self._rendered.move_to_end(key)
+                rendered[size] = png
+            else:
+                missing.append(size)
+
+        if not missing:
+            return rendered
+
+        if (image := await self._image(path, m_timestamp)) is None:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        pngs = await loop.run_in_executor(
+            self.prusalink.parse_executor, _render, image, missing
+        )
+        for size, png in zip(missing, pngs):
+            self._rendered[(path, m_timestamp, *size)] = png
+            rendered[size] = png
+        while len(self._rendered) > self.max_entries:
+            self._rendered.popitem(last=False)
+
+        return rendered
+
+    def clear(self) -> None:
+        """Drop all memoized thumbnails."""
+        self._rendered.clear()
+        self._images.clear()
+
+    async def _image(self, path: str, m_timestamp: int) -> Image | None:
+        """Return the decoded source thumbnail of a print file."""
+        key = (path, m_timestamp)
+        if key in self._images:
+            self._images.move_to_end(key)
+            return self._images[key]
+
+        if (task := self._loads.get(key)) is None:
+            task = asyncio.create_task(self._load(path, m_timestamp))
+            self._loads[key] = task
+
+        # Shielded so that a caller going away does not cancel the load
+        # shared with the other callers.
+        return await asyncio.shield(task)
+
+    async def _load(self, path: str, m_timestamp: int) -> Image | None:
+        """Download the head of a print file and decode its best thumbnail."""
+        key = (path, m_timestamp)
+        try:
+            head = await self.prusalink.get_file_range(
+                path, 0, THUMBNAIL_HEAD_BYTES - 1
+            )
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(
+                self.prusalink.parse_executor, _decode_best_thumbnail, head
+            )
+            self._images[key] = image
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+            return image
+        finally:
+            del self._loads[key]
+
+
+def print_file_thumbnails(data: bytes) -> list[Thumbnail]:
+    """Return the thumbnails embedded in BG-code or text G-code bytes.
+
+    `data` may be just the start of the file; thumbnails cut off by its
+    end are skipped.
+    """
+    if data.startswith(_BGCODE_MAGIC):
+        return _bgcode_thumbnails(data)
+
+    return [
+        {
+            "format": _THUMBNAIL_FORMAT_NAMES[image_format],
+            "width": width,
+            "height": height,
+            "data": image,
+        }
+        for image_format, width, height, image in _scan_gcode(
+            io.BytesIO(data)
+        ).thumbnails
+    ]
+
+
+def decode_image(data: bytes) -> Image:
+    """Decode a PNG or QOI image into RGBA pixels.
+
+    Raises `ValueError` for other formats and for interlaced or 16-bit
+    PNG images, which slicers do not write.
+    """
+    if data.startswith(_PNG_SIGNATURE):
+        return _decode_png(data)
+
+    if data.startswith(_QOI_MAGIC):
+        return _decode_qoi(data)
+
+    raise ValueError("Unsupported image format")
+
+
+def _decode_best_thumbnail(data: bytes) -> Image | None:
+    """Decode the largest PNG or QOI thumbnail of a print file head."""
+    thumbnails = [
+        thumbnail
+        for thumbnail in print_file_thumbnails(data)
+        if thumbnail["format"] in _DECODABLE_FORMATS
+    ]
+    if not thumbnails:
+        return None
+
+    best = max(
+        thumbnails, key=lambda thumbnail: thumbnail["width"] * thumbnail["height"]
+    )
+    return decode_image(best["data"])
+
+
+def _render(image: Image, sizes: list[tuple[int, int]]) -> list[bytes]:
+    """Encode the image fitted to each size as PNG."""
+    return [image.fit(width, height).to_png() for width, height in sizes]
+
+
+def _bgcode_thumbnails(data: bytes) -> list[Thumbnail]:
+    """Extract the thumbnail blocks that precede the BG-code G-code blocks."""
+    thumbnails: list[Thumbnail] = []
+    checksum_size = _bgcode_checksum_size(_read_uint16(data, 8))
+    offset = _BGCODE_FILE_HEADER_SIZE
+
+    while offset + _BGCODE_BLOCK_HEADER_SIZE <= len(data):
+        block_type = _read_uint16(data, offset)
+        compression = _read_uint16(data, offset + 2)
+        block_data_size = _read_uint32(data, offset + 4)
+
+        if block_type == _BGCODE_GCODE_BLOCK_TYPE:
+            break
+
+        if compression == _BGCODE_NO_COMPRESSION:
+            offset += _BGCODE_BLOCK_HEADER_SIZE
+        else:
+            block_data_size = _read_uint32(data, offset + 8)
+            offset += _BGCODE_COMPRESSED_BLOCK_HEADER_SIZE
+
+        parameters_size = _bgcode_block_parameters_size(block_type)
+        if offset + parameters_size + block_data_size + checksum_size > len(data):
+            break
+
+        if (
+            block_type == _BGCODE_THUMBNAIL_BLOCK_TYPE
+            and compression == _BGCODE_NO_COMPRESSION
+        ):
+            image_format, width, height = struct.unpack_from("<HHH", data, offset)
+            start = offset + parameters_size
+            thumbnails.append(
+                {
+                    "format": _THUMBNAIL_FORMAT_NAMES.get(image_format, "UNKNOWN"),
+                    "width": width,
+                    "height": height,
+                    "data": data[start : start + block_data_size],
+                }
+            )
+
+        offset += parameters_size + block_data_size + checksum_size
+
+    return thumbnails
+
+
+def _decode_png(data: bytes) -> Image:
+    """Decode an 8-bit, non-interlaced PNG image."""
+    header = b""
+    palette = b""
+    transparency = b""
+    compressed: list[bytes] = []
+    offset = len(_PNG_SIGNATURE)
+
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack_from(">I4s", data, offset)
+        chunk = data[offset + 8 : offset + 8 + length]
+        offset += 12 + length
+        if kind == b"IHDR":
+            header = chunk
+        elif kind == b"PLTE":
+            palette = chunk
+        elif kind == b"tRNS":
+            transparency = chunk
+        elif kind == b"IDAT":
+            compressed.append(chunk)
+        elif kind == b"IEND":
+            break
+
+    if len(header) != 13:
+        raise ValueError("PNG image has no header")
+
+    width, height, depth, color_type, _, _, interlace = struct.unpack(
+        ">IIBBBBB", header
+    )
+    if depth != 8 or interlace or color_type not in _PNG_CHANNELS:
+        raise ValueError("Only 8-bit non-interlaced PNG images are supported")
+
+    channels = _PNG_CHANNELS[color_type]
+    try:
+        raw = zlib.decompress(b"".join(compressed))
+    except zlib.error as err:
+        raise ValueError("PNG image data is corrupt") from err
+    if len(raw) < height * (width * channels + 1):
+        raise ValueError("PNG image data is truncated")
+
+    samples = _unfilter_png(raw, width * channels, height, channels)
+    return Image(width, height, _to_rgba(samples, color_type, palette, transparency))
+
+
+def _unfilter_png(raw: bytes, stride: int, height: int, bpp: int) -> bytearray:
+    """Undo the per-row PNG filters.
+
+    The common None, Sub and Up filters are applied with whole-row numpy
+    operations when numpy is installed; Average and Paeth depend on the
+    previous output byte and are applied byte by byte.
+    """
+    np = _numpy()
+    output = bytearray(stride * height)
+    previous = bytes(stride)
+
+    for row in range(height):
+        start = row * (stride + 1)
+        filter_type = raw[start]
+        line = raw[start + 1 : start + 1 + stride]
+
+        if filter_type == 0:
+            current = line
+        elif np is not None and filter_type == 1:
+            values = np.frombuffer(line, dtype=np.uint8).reshape(-1, bpp)
+            current = np.cumsum(values, axis=0, dtype=np.uint8).tobytes()
+        elif np is not None and filter_type == 2:
+            current = (
+                np.frombuffer(line, dtype=np.uint8)
+                + np.frombuffer(previous, dtype=np.uint8)
+            ).tobytes()
+        else:
+            current = _unfilter_row(filter_type, line, previous, bpp)
+
+        output[row * stride : (row + 1) * stride] = current
+        previous = current
+
+    return output
+
+
+def _unfilter_row(filter_type: int, line: bytes, previous: bytes, bpp: int) -> bytes:
+    """Undo a PNG filter on one row in pure Python."""
+    if filter_type == 2:
+        return bytes(map(_add_byte, line, previous))
+
+    current = bytearray(line)
+    for index in range(len(current)):
+        left = current[index - bpp] if index >= bpp else 0
+        if filter_type == 1:
+            predictor = left
+        elif filter_type == 3:
+            predictor = (left + previous[index]) >> 1
+        elif filter_type == 4:
+            up = previous[index]
+            upper_left = previous[index - bpp] if index >= bpp else 0
+            estimate = left + up - upper_left
+            distances = (
+                abs(estimate - left),
+                abs(estimate - up),
+                abs(estimate - upper_left),
+            )
+            if distances[0] <= distances[1] and distances[0] <= distances[2]:
+                predictor = left
+            elif distances[1] <= distances[2]:
+                predictor = up
+            else:
+                predictor = upper_left
+        else:
+            raise ValueError(f"Unknown PNG filter type {filter_type}")
+        current[index] = (current[index] + predictor) & 0xFF
+
+    return bytes(current)
+
+
+def _add_byte(value: int, predictor: int) -> int:
+    return (value + predictor) & 0xFF
+
+
+def _to_rgba(
+    samples: bytearray, color_type: int, palette: bytes, transparency: bytes
+) -> bytearray:
+    """Expand PNG samples of any color type to RGBA.
+
+    Channels are moved with extended slice assignments and palette
+    lookups with `bytes.translate`, so no Python code runs per pixel.
+    """
+    if color_type == 6:
+        return samples
+
+    pixel_count = len(samples) // _PNG_CHANNELS[color_type]
+    rgba = bytearray(b"\xff" * (pixel_count * 4))
+
+    if color_type == 2:
+        for channel in range(3):
+            rgba[channel::4] = samples[channel::3]
+    elif color_type == 0:
+        for channel in range(3):
+            rgba[channel::4] = samples
+    elif color_type == 4:
+        for channel in range(3):
+            rgba[channel::4] = samples[0::2]
+        rgba[3::4] = samples[1::2]
+    else:
+        padded = palette.ljust(768, b"\x00")
+        for channel in range(3):
+            rgba[channel::4] = samples.translate(padded[channel::3])
+        rgba[3::4] = samples.translate(transparency.ljust(256, b"\xff")[:256])
+
+    return rgba
+
+
+def _decode_qoi(data: bytes) -> Image:
+    """Decode a QOI image.
+
+    QOI chunks depend on the previous pixel and a running color index, so
+    decoding is sequential; runs of equal pixels are written at once.
+    """
+    if len(data) < _QOI_HEADER_SIZE + _QOI_END_MARKER_SIZE:
+        raise ValueError("QOI image is truncated")
+
+    width, height = struct.unpack_from(">II", data, 4)
+    total = width * height * 4
+    pixels = bytearray(total)
+    index = [(0, 0, 0, 0)] * 64
+    red = green = blue = 0
+    alpha = 255
+    position = _QOI_HEADER_SIZE
+    end = len(data) - _QOI_END_MARKER_SIZE
+    offset = 0
+    run = 1
+
+    while offset < total:
+        if position >= end:
+            raise ValueError("QOI image data is truncated")
+
+        byte = data[position]
+        position += 1
+
+        if byte == 0xFE:
+            red, green, blue = data[position : position + 3]
+            position += 3
+        elif byte == 0xFF:
+            red, green, blue, alpha = data[position : position + 4]
+            position += 4
+        elif byte < 0x40:
+            red, green, blue, alpha = index[byte]
+        elif byte < 0x80:
+            red = (red + ((byte >> 4) & 0x03) - 2) & 0xFF
+            green = (green + ((byte >> 2) & 0x03) - 2) & 0xFF
+            blue = (blue + (byte & 0x03) - 2) & 0xFF
+        elif byte < 0xC0:
+            extra = data[position]
+            position += 1
+            green_delta = (byte & 0x3F) - 32
+            red = (red + green_delta - 8 + (extra >> 4)) & 0xFF
+            green = (green + green_delta) & 0xFF
+            blue = (blue + green_delta - 8 + (extra & 0x0F)) & 0xFF
+        else:
+            run = min((byte & 0x3F) + 1, (total - offset) // 4)
+
+        pixel = (red, green, blue, alpha)
+        index[(red * 3 + green * 5 + blue * 7 + alpha * 11) & 0x3F] = pixel
+        pixels[offset : offset + 4 * run] = bytes(pixel) * run
+        offset += 4 * run
+        run = 1
+
+    return Image(width, height, pixels)
+
+
+def _box_ranges(source: int, target: int) -> list[tuple[int, int]]:
+    """Return the source span covered by each target pixel along one axis."""
+    return [
+        (
+            start := index * source // target,
+            max(start + 1, (index + 1) * source // target),
+        )
+        for index in range(target)
+    ]
+
+
+def _resize_numpy(np: Any, image: Image, width: int, height: int) -> bytearray:
+    """Resize with alpha-weighted box filtering using numpy."""
+    pixels = (
+        np.frombuffer(image.pixels, dtype=np.uint8)
+        .reshape(image.height, image.width, 4)
+        .astype(np.uint64)
+    )
+    weighted = pixels.copy()
+    weighted[..., :3] *= pixels[..., 3:]
+
+    for axis, (source, target) in enumerate(
+        ((image.height, height), (image.width, width))
+    ):
+        starts = np.array([start for start, _ in _box_ranges(source, target)])
+        if target < source:
+            weighted = np.add.reduceat(weighted, starts, axis=axis)
+        else:
+            weighted = np.take(weighted, starts, axis=axis)
+
+    rows = np.array([end - start for start, end in _box_ranges(image.height, height)])
+    columns = np.array([end - start for start, end in _box_ranges(image.width, width)])
+    counts = np.outer(rows, columns).astype(np.uint64)
+    alpha = weighted[..., 3]
+
+    output = np.empty((height, width, 4), dtype=np.uint8)
+    safe_alpha = np.maximum(alpha, 1)[..., None]
+    output[..., :3] = np.where(
+        alpha[..., None] > 0, (weighted[..., :3] + safe_alpha // 2) // safe_alpha, 0
+    )
+    output[..., 3] = (alpha + counts // 2) // counts
+    return bytearray(output.tobytes())
+
+
+def _resize_python(image: Image, width: int, height: int) -> bytearray:
+    """Resize with alpha-weighted box filtering in pure Python."""
+    values = list(image.pixels)
+    for offset in range(0, len(values), 4):
+        alpha = values[offset + 3]
+        values[offset] *= alpha
+        values[offset + 1] *= alpha
+        values[offset + 2] *= alpha
+
+    stride = image.width * 4
+    columns = _box_ranges(image.width, width)
+    output = bytearray(width * height * 4)
+    offset = 0
+
+    for top, bottom in _box_ranges(image.height, height):
+        sums = values[top * stride : (top + 1) * stride]
+        for row in range(top + 1, bottom):
+            sums = list(map(add, sums, values[row * stride : (row + 1) * stride]))
+
+        for left, right in columns:
+            count = (bottom - top) * (right - left)
+            alpha = sum(sums[left * 4 + 3 : right * 4 : 4])
+            if alpha:
+                for channel in range(3):
+                    total = sum(sums[left * 4 + channel : right * 4 : 4])
+                    output[offset + channel] = (total + alpha // 2) // alpha
+            output[offset + 3] = (alpha + count // 2) // count
+            offset += 4
+
+    return output
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """Return a PNG chunk with its length and CRC."""
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def _numpy() -> Any:
+    """Return the numpy module, or None if it is not installed."""
+    try:
+        return importlib.import_module("numpy")
+    except ImportError:
+        return None
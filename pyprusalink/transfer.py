@@ -0,0 +1,111 @@
+"""Progress tracking for file transfers running on a printer."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
+from pyprusalink.types import Transfer, TransferProgress
+
+if TYPE_CHECKING:
+    from pyprusalink import PrusaLink
+
+# Aim for this many polls over the remaining duration of a transfer.
+_POLLS_PER_ETA = 10
+
+
+class TransferWatcher:
+    """Watch the transfer running on a printer until it finishes.
+
+    `watch` polls `/api/v1/transfer` and yields a `TransferProgress` event
+    per poll until the printer reports that no transfer is in progress.
+    Throughput is an exponentially weighted moving average with weight
+    `smoothing` for the newest sample. The poll interval stays between
+    `min_interval` and `max_interval`: it shortens as the transfer nears
+    completion and backs off while the transfer is stalled or its speed is
+    still unknown.
+    """
+
+    def __init__(
+        self,
+        prusalink: PrusaLink,
+        min_interval: float = 0.5,
+        max_interval: float = 5.0,
+        smoothing: float = 0.3,
+    ) -> None:
+        """Initialize the watcher."""
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+
+        self.prusalink = prusalink
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+
+    async def watch(self) -> AsyncIterator[TransferProgress]:
+        """Yield progress events until no transfer is in progress."""
+        interval = self.min_interval
+        previous: Transfer | None = None
+        rate: float | None = None
+
+        while (transfer := await self.prusalink.get_transfer()) is not None:
+            if previous is not None and transfer.get("id") != previous.get("id"):
+                # A new transfer started between two polls.
+                previous = None
+                rate = None
+
+            stalled = (
+                previous is not None
+                and transfer["transferred"] == previous["transferred"]
+            )
+            rate = self._update_rate(rate, previous, transfer)
+            eta = _eta(transfer, rate)
+            previous = transfer
+
+            yield {"transfer": transfer, "bytes_per_second": rate or 0.0, "eta": eta}
+
+            if eta is not None and not stalled:
+                interval = eta / _POLLS_PER_ETA
+            else:
+                interval *= 2
+            interval = min(max(interval, self.min_interval), self.max_interval)
+            await asyncio.sleep(interval)
+
+    def _update_rate(
+        self, rate: float | None, previous: Transfer | None, transfer: Transfer
+    ) -> float | None:
+        """Fold the throughput since the previous poll into the average.
+
+        Rates are measured with the printer's `time_transferring` clock, so
+        polls within the same second do not produce a sample.
+        """
+        if previous is None:
+            if transfer["time_transferring"] <= 0:
+                return None
+            return transfer["transferred"] / transfer["time_transferring"]
+
+        elapsed = transfer["time_transferring"] - previous["time_transferring"]
+        if elapsed <= 0:
+            return rate
+
+        sample = (transfer["transferred"] - previous["transferred"]) / elapsed
+        if rate is None:
+            return sample
+
+        return self.smoothing * sample + (1 - self.smoothing) * rate
+
+
+def _eta(transfer: Transfer, rate: float | None) -> float | None:
+    """Estimate the seconds remaining for a transfer at the given rate."""
+    if not rate:
+        return None
+
+    if (size := transfer.get("size")) is not None:
+        total = float(size)
+    elif transfer["progress"] > 0:
+        total = transfer["transferred"] * 100 / transfer["progress"]
+    else:
+        return None
+
+    return max(total - transfer["transferred"], 0.0) / rate
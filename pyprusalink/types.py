@@ -24,6 +24,14 @@ class FileTooLarge(PrusaLinkError):
     """Error to indicate the requested file is too large to process."""
 
 
+class PrinterUnavailable(PrusaLinkError):
+    """Error to indicate the printer is unreachable and requests fail fast."""
+
+
+class DeadlineExceeded(PrusaLinkError, TimeoutError):
+    """Error to indicate an operation did not finish before its deadline."""
+
+
 class Capabilities(TypedDict):
     """API Capabilities"""
 
@@ -67,6 +75,22 @@ class VersionInfo(TypedDict):
     capabilities: NotRequired[Capabilities]
 
 
+class PrinterCapabilities(TypedDict):
+    """Capabilities derived from /api/version by `PrusaLink.get_capabilities`.
+
+    `v1` is set when the API version is 2.0 or later, which serves the
+    /api/v1 endpoints. `firmware`, `printer` and `server` are copied from
+    the version response when reported.
+    """
+
+    api: str
+    v1: bool
+    upload_by_put: bool
+    firmware: NotRequired[str]
+    printer: NotRequired[str]
+    server: NotRequired[str]
+
+
 class PrinterInfo(TypedDict):
     """Printer information from /api/v1/info.
 
@@ -182,6 +206,138 @@ class PrintFileMetadata(TypedDict, total=False):
     estimated_printing_time_silent: int
 
 
+class FileInfo(TypedDict):
+    """A file or folder returned by /api/v1/files/{storage}/{path}.
+
+    Folders list their entries in `children`. Buddy firmware reports
+    `m_timestamp` for folders as well, which is used to cache listings.
+    """
+
+    name: str
+    type: str
+    ro: NotRequired[bool]
+    display_name: NotRequired[str]
+    m_timestamp: NotRequired[int]
+    size: NotRequired[int]
+    refs: NotRequired[PrintFileRefs]
+    children: NotRequired[list["FileInfo"]]
+
+
+class LayerPosition(TypedDict):
+    """Position within a print file resolved from a layer index."""
+
+    layer: int
+    layer_count: int
+    z: float
+    filament_used_mm: float
+    filament_remaining_mm: float
+
+
+class DownloadResult(TypedDict):
+    """Outcome of a file downloaded to disk."""
+
+    size: int
+    bytes_downloaded: int
+    resumed_from: int
+    elapsed: float
+    bytes_per_second: float
+    checksum: NotRequired[str]
+
+
+class UploadResult(TypedDict):
+    """Outcome of a file uploaded to the printer.
+
+    `skipped` is set when the printer already had an identical file and
+    nothing was sent.
+    """
+
+    size: int
+    skipped: bool
+    bytes_uploaded: int
+    elapsed: float
+    bytes_per_second: float
+
+
+class RequestRecord(TypedDict):
+    """Instrumentation record of a single API request.
+
+    `duration` covers sending the request and receiving the response,
+    including retries and digest challenge round trips. `processing` is
+    the time spent by the caller handling the response, such as JSON
+    decoding or consuming a streamed body. `phases` holds seconds spent in
+    each httpcore step (`connect_tcp`, `start_tls`, `send_request_headers`,
+    `receive_response_headers`, ...) when the transport reports them.
+    """
+
+    method: str
+    endpoint: str
+    status_code: int | None
+    attempts: int
+    auth_challenges: int
+    bytes_sent: int
+    bytes_received: int
+    duration: float
+    processing: float
+    phases: dict[str, float]
+    error: str | None
+
+
+class EndpointStats(TypedDict):
+    """Aggregated request statistics for one endpoint."""
+
+    requests: int
+    errors: int
+    retries: int
+    auth_challenges: int
+    bytes_sent: int
+    bytes_received: int
+    latency_sum: float
+    latency_buckets: list[int]
+    phase_seconds: dict[str, float]
+
+
+class CatalogEntry(TypedDict):
+    """A print file recorded in a `FileCatalog`."""
+
+    name: str
+    metadata: PrintFileMetadata
+    display_name: NotRequired[str]
+    size: NotRequired[int]
+    m_timestamp: NotRequired[int]
+    thumbnail: NotRequired[str]
+
+
+class Thumbnail(TypedDict):
+    """A thumbnail image embedded in a print file.
+
+    `format` is `PNG`, `JPG` or `QOI` and `data` holds the encoded image.
+    """
+
+    format: str
+    width: int
+    height: int
+    data: bytes
+
+
+class Camera(TypedDict):
+    """A camera returned by /api/v1/cameras."""
+
+    camera_id: str
+    connected: bool
+    config: NotRequired[dict[str, Any]]
+    detected: NotRequired[bool]
+    stored: NotRequired[bool]
+    linked: NotRequired[bool]
+
+
+class CameraSnapshot(TypedDict):
+    """An image captured by a printer camera."""
+
+    image: bytes
+    content_type: str
+    timestamp: float
+
+
 class JobFilePrint(TypedDict):
     """Currently printed file informations."""
 
@@ -236,3 +392,74 @@ class Transfer(TypedDict):
     url: NotRequired[str]
     size: NotRequired[str]
     time_remaining: NotRequired[int]
+
+
+class TransferProgress(TypedDict):
+    """A progress event emitted while watching a transfer.
+
+    `bytes_per_second` is smoothed over successive polls. `eta` is the
+    estimated number of seconds remaining, or None while the throughput
+    or the transfer size is unknown.
+    """
+
+    transfer: Transfer
+    bytes_per_second: float
+    eta: float | None
+
+
+class BroadcastOutcome(Enum):
+    """Outcome of a job command broadcast to one printer."""
+
+    DONE = "DONE"
+    NO_JOB = "NO_JOB"
+    CONFLICT = "CONFLICT"
+    NOT_FOUND = "NOT_FOUND"
+    TIMED_OUT = "TIMED_OUT"
+    ERROR = "ERROR"
+
+
+class BroadcastResult(TypedDict):
+    """Result of a job command broadcast to one printer.
+
+    `job_id` is the job the command was sent to, if it was resolved, and
+    `error` describes an unexpected failure. `elapsed` is measured from
+    the start of the broadcast.
+    """
+
+    outcome: BroadcastOutcome
+    job_id: int | None
+    error: str | None
+    elapsed: float
+
+
+class PrinterSnapshot(TypedDict):
+    """Latest state of a printer kept by a `PollingHub`.
+
+    `status` is the last successful `/api/v1/status` response, or None
+    before the first one. `error` describes the failure of the most recent
+    poll, if it failed. `timestamp` is the time of the most recent poll.
+    """
+
+    status: PrinterStatus | None
+    error: str | None
+    timestamp: float
+
+
+class JobRecord(TypedDict):
+    """A finished job recorded by `JobHistory`.
+
+    `state` is the printer state the job ended in, such as `FINISHED` or
+    `STOPPED`, or the last state seen if the job disappeared. `metadata`
+    holds the slicer estimates of the printed file, for the whole job even
+    if it was stopped early. Times are Unix timestamps.
+    """
+
+    printer: str
+    job_id: int
+    path: str | None
+    state: str
+    started: float
+    ended: float
+    progress: float
+    time_printing: int | None
+    metadata: PrintFileMetadata
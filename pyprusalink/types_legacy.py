@@ -13,3 +13,12 @@ class LegacyPrinterStatus(TypedDict):
     """Legacy Printer status."""
 
     telemetry: LegacyPrinterTelemetry | None
+
+
+class LegacyJob(TypedDict):
+    """Legacy job status.
+
+    `state` is e.g. `Operational` when no job is running, or `Printing`.
+    """
+
+    state: str
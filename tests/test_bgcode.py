@@ -0,0 +1,190 @@
+"""Tests for G-code to BG-code conversion."""
+
+import base64
+import io
+import os
+import struct
+import zlib
+
+from pyprusalink import bgcode, heatshrink, meatpack
+from pyprusalink.file_metadata import parse_file_metadata
+from pyprusalink.layer_index import build_layer_index
+
+THUMBNAIL = b"\x89PNG\r\n\x1a\nthumbnail"
+
+GCODE = (
+    b"; generated by PrusaSlicer 2.6.1+linux on 2023-08-01 at 10:00:00 UTC\n"
+    b"\n"
+    b"; thumbnail begin 16x16 " + str(len(THUMBNAIL)).encode() + b"\n"
+    b"; " + base64.b64encode(THUMBNAIL) + b"\n"
+    b"; thumbnail end\n"
+    b"\n"
+    b"; external perimeters extrusion width = 0.45mm\n"
+    b"M73 P0 R10\n"
+    b"G90\n"
+    b"M83\n"
+    b"G1 Z0.2 F720\n"
+    b"G1 X10 Y10 E1.5\n"
+    b";LAYER_CHANGE\n"
+    b"G1 Z0.4\n"
+    b"G1 X40 Y30 E2\n"
+    b"M73 P100 R0\n"
+    b"\n"
+    b"; filament used [mm] = 1234.56\n"
+    b"; filament used [g] = 3.70\n"
+    b"; estimated printing time (normal mode) = 1h 2m 3s\n"
+    b"\n"
+    b"; prusaslicer_config = begin\n"
+    b"; filament_type = PETG\n"
+    b"; printer_model = MK4\n"
+    b"; prusaslicer_config = end\n"
+)
+
+
+def _blocks(data):
+    """Split BG-code into (type, compression, parameters, data) tuples."""
+    assert data[:4] == b"GCDE"
+    assert struct.unpack_from("<IH", data, 4) == (1, 1)
+    offset = 10
+    blocks = []
+    while offset < len(data):
+        block_type, compression, size = struct.unpack_from("<HHI", data, offset)
+        header_size = 8
+        if compression:
+            (size,) = struct.unpack_from("<I", data, offset + 8)
+            header_size = 12
+        parameters_size = 6 if block_type == 5 else 2
+        end = offset + header_size + parameters_size + size
+        (checksum,) = struct.unpack_from("<I", data, end)
+        assert checksum == zlib.crc32(data[offset:end])
+
+        parameters = data[offset + header_size : offset + header_size + parameters_size]
+        payload = data[offset + header_size + parameters_size : end]
+        if compression == 1:
+            payload = zlib.decompress(payload)
+        elif compression == 3:
+            payload = heatshrink.decompress(payload)
+        if block_type == 1 and parameters == b"\x02\x00":
+            payload = meatpack.decode(payload)
+        blocks.append((block_type, compression, parameters, payload))
+        offset = end + 4
+
+    return blocks
+
+
+def _convert(gcode, **kwargs):
+    target = io.BytesIO()
+    written = bgcode.convert_gcode_to_bgcode(io.BytesIO(gcode), target, **kwargs)
+    assert written == len(target.getvalue())
+    return target.getvalue()
+
+
+def test_heatshrink_format():
+    # Three literals, then a back reference of distance 3 and length 6.
+    assert heatshrink.compress(b"abcabcabc") == bytes.fromhex("b0d8ac600250")
+    assert heatshrink.decompress(bytes.fromhex("b0d8ac600250")) == b"abcabcabc"
+
+
+def test_meatpack_decode():
+    packed = bytes.fromhex(
+        # Enable packing, then packing without spaces.
+        "fffffb"
+        "fffff7"
+        # G1, Z as a full byte with the 0 after it, .2 and a newline.
+        "1d0f5a2acc"
+        # G1, X5, E1 (the space code stands for E) and a newline.
+        "1d5e1bcc"
+        # M as a full byte with the 8 after it, then 3 and a newline.
+        "8f4dc3"
+        # ; and Z as full bytes, and a newline.
+        "ff3b5acc"
+    )
+
+    assert meatpack.decode(packed) == b"G1 Z0.2\nG1 X5 E1\nM83\n;Z\n"
+    assert meatpack.decode(b"G1 X1\n") == b"G1 X1\n"
+
+
+def test_meatpack_round_trip():
+    assert meatpack.decode(meatpack.encode(GCODE)) == GCODE
+    assert (
+        meatpack.decode(meatpack.encode(b"g1  x10 y10 e.5 ; move\nM117 Hi there"))
+        == b"G1 X10 Y10 E.5; move\nM117 Hi there\n"
+    )
+    text = b'M117 Printing MK4 ABC\nM118 E1 HelloWorld\nM862.3 P "MK4S"\n'
+    assert meatpack.decode(meatpack.encode(text)) == text
+    moves = b"G1 X10.125 Y20.5 E0.01234\n" * 100
+    assert len(meatpack.encode(moves)) < 0.55 * len(moves)
+
+
+def test_heatshrink_round_trip():
+    for data in (b"", b"a", b"a" * 1000, os.urandom(5000), GCODE * 50):
+        assert heatshrink.decompress(heatshrink.compress(data)) == data
+        assert heatshrink.decompress(heatshrink.compress(data, 11, 4), 11, 4) == data
+
+
+def test_convert_gcode_to_bgcode_blocks():
+    blocks = _blocks(_convert(GCODE))
+
+    assert [block[0] for block in blocks] == [0, 3, 5, 4, 2, 1]
+    assert blocks[0][3] == b"Producer=PrusaSlicer 2.6.1+linux\n"
+    assert blocks[1][3] == (
+        b"printer_model=MK4\n"
+        b"filament_type=PETG\n"
+        b"filament used [mm]=1234.56\n"
+        b"filament used [g]=3.70\n"
+        b"estimated printing time (normal mode)=1h 2m 3s\n"
+    )
+    assert blocks[2][1:] == (0, struct.pack("<HHH", 0, 16, 16), THUMBNAIL)
+    assert b"external perimeters" not in blocks[3][3]
+    assert blocks[4][3] == b"filament_type=PETG\nprinter_model=MK4\n"
+
+    gcode = blocks[5][3]
+    assert blocks[5][1:3] == (3, b"\x02\x00")
+    assert gcode.startswith(b"; generated by PrusaSlicer")
+    assert b"; external perimeters extrusion width = 0.45mm\n" in gcode
+    assert gcode.endswith(b"M73 P100 R0\n\n\n")
+    assert b"thumbnail" not in gcode
+    assert b"filament" not in gcode
+
+
+def test_convert_keeps_printer_metadata_of_prusaslicer():
+    objects_info = (
+        b'{"objects":[{"name":"cube.stl id:0 copy 0",'
+        b'"polygon":[[10.0,10.0],[40.0,10.0],[40.0,30.0],[10.0,30.0]]}]}'
+    )
+    gcode = GCODE.replace(
+        b"; external perimeters",
+        b"; objects_info = " + objects_info + b"\n; external perimeters",
+    ).replace(
+        b"; estimated printing time (normal mode) = 1h 2m 3s\n",
+        b"; estimated printing time (normal mode) = 1h 2m 3s\n"
+        b"; estimated printing time (silent mode) = 1h 9m 0s\n",
+    )
+
+    printer_metadata = dict(
+        line.split(b"=", 1) for line in _blocks(_convert(gcode))[1][3].splitlines()
+    )
+
+    assert printer_metadata[b"objects_info"] == objects_info
+    assert printer_metadata[b"estimated printing time (silent mode)"] == b"1h 9m 0s"
+
+
+def test_converted_bgcode_keeps_metadata_and_layers():
+    converted = _convert(GCODE)
+
+    assert parse_file_metadata(converted) == parse_file_metadata(GCODE)
+    assert parse_file_metadata(converted)["filament_type"] == "PETG"
+    assert build_layer_index(converted).layer_count == 2
+
+
+def test_convert_splits_gcode_blocks_at_lines(monkeypatch):
+    monkeypatch.setattr(bgcode, "GCODE_BLOCK_BYTES", 40)
+    gcode = b"".join(b"G1 X%d Y%d E0.1\n" % (i, i) for i in range(20))
+
+    blocks = _blocks(_convert(gcode, compress=False))
+
+    assert all(block[1] == 0 for block in blocks)
+    gcode_blocks = [block[3] for block in blocks if block[0] == 1]
+    assert len(gcode_blocks) > 1
+    assert all(len(block) <= 40 and block.endswith(b"\n") for block in gcode_blocks)
+    assert b"".join(gcode_blocks) == gcode
@@ -0,0 +1,81 @@
+"""Tests for camera snapshots."""
+
+import asyncio
+
+import httpx
+from pyprusalink.camera import SnapshotCache
+from pyprusalink.types import NotFound
+import pytest
+
+HOST = "http://printer.local"
+PNG = b"\x89PNG\r\n\x1a\nimage"
+
+
+async def test_get_cameras(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/cameras").mock(
+        return_value=httpx.Response(
+            200,
+            json={"camera_list": [{"camera_id": "abc", "connected": True}]},
+        )
+    )
+
+    assert await pl.get_cameras() == [{"camera_id": "abc", "connected": True}]
+
+
+async def test_get_snapshot(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/cameras/abc/snap").mock(
+        return_value=httpx.Response(
+            200, content=PNG, headers={"Content-Type": "image/png"}
+        )
+    )
+
+    snapshot = await pl.get_snapshot("abc")
+
+    assert snapshot["image"] == PNG
+    assert snapshot["content_type"] == "image/png"
+
+
+async def test_get_snapshot_without_image(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/cameras/snap").mock(return_value=httpx.Response(204))
+
+    assert await pl.get_snapshot() is None
+
+
+async def test_snapshot_cache_coalesces_viewers(pl, respx_mock):
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, content=PNG)
+
+    route = respx_mock.get(f"{HOST}/api/v1/cameras/snap").mock(side_effect=handler)
+    cache = SnapshotCache(pl, max_age=60)
+
+    snapshots = await asyncio.gather(*(cache.get() for _ in range(5)))
+    assert await cache.get() is snapshots[0]
+
+    assert route.call_count == 1
+    assert all(snapshot["image"] == PNG for snapshot in snapshots)
+
+
+async def test_snapshot_cache_refetches_stale_frames(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/cameras/snap").mock(
+        return_value=httpx.Response(200, content=PNG)
+    )
+    cache = SnapshotCache(pl, max_age=0)
+
+    await cache.get()
+    await cache.get()
+
+    assert route.call_count == 2
+
+
+async def test_snapshot_cache_does_not_cache_errors(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/cameras/abc/snap").mock(
+        side_effect=[httpx.Response(404), httpx.Response(200, content=PNG)]
+    )
+    cache = SnapshotCache(pl)
+
+    with pytest.raises(NotFound):
+        await cache.get("abc")
+
+    assert (await cache.get("abc"))["image"] == PNG
+    assert route.call_count == 2
@@ -0,0 +1,174 @@
+"""Tests for the incremental print file catalog."""
+
+import re
+
+import httpx
+from pyprusalink.catalog import FileCatalog
+import pytest
+
+HOST = "http://printer.local"
+GCODE = (
+    b"; generated by PrusaSlicer\n"
+    + b"G1 X10 Y10 E1\n" * 100
+    + b"; filament used [g]=24.41\n; filament_type=PLA\n"
+)
+
+
+def _serve_ranges(content):
+    def handler(request):
+        start, end = map(
+            int, re.fullmatch(r"bytes=(\d+)-(\d+)", request.headers["Range"]).groups()
+        )
+        return httpx.Response(206, content=content[start : end + 1])
+
+    return handler
+
+
+def _listing(m_timestamp, size=len(GCODE)):
+    return {
+        "name": "usb",
+        "type": "FOLDER",
+        "children": [
+            {
+                "name": "A.GCO",
+                "display_name": "a.gcode",
+                "type": "PRINT_FILE",
+                "size": size,
+                "m_timestamp": m_timestamp,
+                "refs": {
+                    "download": "/usb/A.GCO",
+                    "thumbnail": "/thumb/s/usb/A.GCO",
+                },
+            },
+            {"name": "firmware.bbf", "type": "FIRMWARE", "size": 10},
+        ],
+    }
+
+
+async def test_refresh_builds_entries(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        return_value=httpx.Response(200, json=_listing(1))
+    )
+    respx_mock.get(f"{HOST}/usb/A.GCO").mock(side_effect=_serve_ranges(GCODE))
+    catalog = FileCatalog()
+
+    changed = await catalog.refresh(pl, "/usb/")
+
+    assert changed == ["/usb/A.GCO"]
+    assert catalog.entries == {
+        "/usb/A.GCO": {
+            "name": "A.GCO",
+            "display_name": "a.gcode",
+            "size": len(GCODE),
+            "m_timestamp": 1,
+            "thumbnail": "/thumb/s/usb/A.GCO",
+            "metadata": {"filament_used_g": 24.41, "filament_type": "PLA"},
+        }
+    }
+
+
+async def test_refresh_only_fetches_changed_files(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        side_effect=[
+            httpx.Response(200, json=_listing(1)),
+            httpx.Response(200, json=_listing(1)),
+            httpx.Response(200, json=_listing(2)),
+        ]
+    )
+    download = respx_mock.get(f"{HOST}/usb/A.GCO").mock(
+        side_effect=_serve_ranges(GCODE)
+    )
+    catalog = FileCatalog()
+
+    await catalog.refresh(pl, "/usb")
+    calls = download.call_count
+    assert await catalog.refresh(pl, "/usb") == []
+    assert download.call_count == calls
+    assert await catalog.refresh(pl, "/usb") == ["/usb/A.GCO"]
+    assert download.call_count == 2 * calls
+
+
+async def test_refresh_uses_head_and_tail_ranges(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        return_value=httpx.Response(200, json=_listing(1))
+    )
+    download = respx_mock.get(f"{HOST}/usb/A.GCO").mock(
+        side_effect=_serve_ranges(GCODE)
+    )
+    catalog = FileCatalog(head_bytes=64, tail_bytes=64)
+
+    await catalog.refresh(pl, "/usb")
+
+    assert [call.request.headers["Range"] for call in download.calls] == [
+        "bytes=0-63",
+        f"bytes={len(GCODE) - 64}-{len(GCODE) - 1}",
+    ]
+    assert catalog.entries["/usb/A.GCO"]["metadata"]["filament_type"] == "PLA"
+
+
+async def test_refresh_removes_deleted_files(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        return_value=httpx.Response(
+            200, json={"name": "usb", "type": "FOLDER", "children": []}
+        )
+    )
+    catalog = FileCatalog(
+        {
+            "/usb/OLD.GCO": {"name": "OLD.GCO", "metadata": {}},
+            "/local/X": {"name": "X", "metadata": {}},
+        }
+    )
+
+    await catalog.refresh(pl, "/usb")
+
+    assert list(catalog.entries) == ["/local/X"]
+
+
+async def test_refresh_skips_file_deleted_during_refresh(pl, respx_mock):
+    listing = _listing(1)
+    listing["children"].append(
+        {
+            "name": "B.GCO",
+            "type": "PRINT_FILE",
+            "size": len(GCODE),
+            "m_timestamp": 1,
+            "refs": {"download": "/usb/B.GCO"},
+        }
+    )
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        return_value=httpx.Response(200, json=listing)
+    )
+    respx_mock.get(f"{HOST}/usb/A.GCO").mock(side_effect=_serve_ranges(GCODE))
+    respx_mock.get(f"{HOST}/usb/B.GCO").mock(return_value=httpx.Response(404))
+    catalog = FileCatalog({"/usb/B.GCO": {"name": "B.GCO", "metadata": {}}})
+
+    changed = await catalog.refresh(pl, "/usb")
+
+    assert changed == ["/usb/A.GCO"]
+    assert list(catalog.entries) == ["/usb/A.GCO"]
+
+
+def test_catalog_persistence(tmp_path):
+    catalog = FileCatalog(
+        {
+            "/usb/A.GCO": {
+                "name": "A.GCO",
+                "size": 3,
+                "metadata": {"filament_used_g": 1.5},
+            }
+        },
+        head_bytes=64,
+        tail_bytes=32,
+    )
+    path = tmp_path / "catalog.json"
+
+    catalog.save(path)
+    loaded = FileCatalog.load(path)
+
+    assert loaded.entries == catalog.entries
+    assert (loaded.head_bytes, loaded.tail_bytes) == (64, 32)
+
+
+def test_catalog_rejects_unknown_version():
+    with pytest.raises(ValueError):
+        FileCatalog.from_json('{"version": 99, "entries": {}}')
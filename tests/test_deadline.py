@@ -0,0 +1,73 @@
+"""Tests for per-call deadlines."""
+
+import asyncio
+import time
+
+import httpx
+from pyprusalink.deadline import deadline, remaining_budget
+from pyprusalink.resilience import RetryPolicy
+from pyprusalink.types import DeadlineExceeded
+import pytest
+
+HOST = "http://printer.local"
+
+
+async def test_deadline_bounds_slow_operation(pl, respx_mock):
+    async def slow(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"printer": {"state": "IDLE"}})
+
+    respx_mock.get(f"{HOST}/api/v1/status").mock(side_effect=slow)
+    started = time.monotonic()
+
+    with pytest.raises(DeadlineExceeded):
+        async with deadline(0.05):
+            await pl.get_status()
+
+    assert time.monotonic() - started < 1
+
+
+async def test_deadline_caps_request_timeouts(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(200, json={"printer": {"state": "IDLE"}})
+    )
+
+    async with deadline(2):
+        await pl.get_status()
+
+    timeouts = route.calls.last.request.extensions["timeout"]
+    assert all(0 < timeouts[phase] <= 2 for phase in timeouts)
+
+
+async def test_deadline_skips_retries_that_do_not_fit(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(503)
+    )
+    pl.client.retry = RetryPolicy(attempts=3)
+    pl.client.retry.delay = lambda attempt: 60
+
+    with pytest.raises(httpx.HTTPStatusError):
+        async with deadline(1):
+            await pl.get_status()
+
+    assert route.call_count == 1
+
+
+async def test_expired_deadline_is_a_timeout_error(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status")
+
+    with pytest.raises(TimeoutError):
+        async with deadline(10), deadline(0):
+            await pl.get_status()
+
+    assert not route.called
+
+
+async def test_nested_deadline_does_not_extend_outer():
+    assert remaining_budget() is None
+
+    async with deadline(1):
+        async with deadline(10):
+            assert remaining_budget() <= 1
+
+    assert remaining_budget() is None
@@ -0,0 +1,66 @@
+"""Tests for the persistent disk cache."""
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.disk_cache import DiskCache, cache_key
+
+HOST = "http://printer.local"
+GCODE = b"; generated by PrusaSlicer\n; filament_type=PLA\n"
+
+
+def test_cache_round_trip_between_instances(tmp_path):
+    path = tmp_path / "cache.db"
+    first = DiskCache(path)
+    first.set("a", b"value")
+
+    second = DiskCache(path)
+    try:
+        assert second.get("a") == b"value"
+        assert second.get("missing") is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "cache.db", max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.get("a")
+    cache.set("c", b"1234")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    cache.close()
+
+
+def test_cache_key_changes_with_file():
+    key = cache_key("metadata", HOST, "/usb/A.GCO", 1, 10)
+    assert key != cache_key("metadata", HOST, "/usb/A.GCO", 2, 10)
+    assert key != cache_key("metadata", HOST, "/usb/A.GCO", 1, 11)
+    assert key != cache_key("metadata", "http://other.local", "/usb/A.GCO", 1, 10)
+
+
+async def test_restart_serves_metadata_and_thumbnails_from_disk(tmp_path, respx_mock):
+    download = respx_mock.get(f"{HOST}/usb/A.GCO").mock(
+        return_value=httpx.Response(200, content=GCODE)
+    )
+    thumbnail = respx_mock.get(f"{HOST}/thumb/l/usb/A.GCO").mock(
+        return_value=httpx.Response(200, content=b"png")
+    )
+
+    for _ in range(2):
+        cache = DiskCache(tmp_path / "cache.db")
+        async with httpx.AsyncClient() as client:
+            pl = PrusaLink(client, HOST, "maker", "password", disk_cache=cache)
+            metadata = await pl.get_file_metadata_ranged(
+                "/usb/A.GCO", len(GCODE), m_timestamp=5
+            )
+            image = await pl.get_file("/thumb/l/usb/A.GCO", m_timestamp=5)
+        cache.close()
+
+    assert metadata == {"filament_type": "PLA"}
+    assert image == b"png"
+    assert download.call_count == 1
+    assert thumbnail.call_count == 1
@@ -1,9 +1,17 @@
 """Tests for Prusa print file metadata parsing."""
 
+from concurrent.futures import ThreadPoolExecutor
 import struct
+import threading
 import zlib
 
-from pyprusalink.file_metadata import parse_file_metadata, parse_metadata_mapping
+from pyprusalink.file_metadata import (
+    INLINE_PARSE_BYTES,
+    parse_file_metadata,
+    parse_file_metadata_async,
+    parse_file_metadata_batch,
+    parse_metadata_mapping,
+)
 
 
 def _bgcode_block(
@@ -119,3 +127,37 @@ def test_parse_metadata_mapping_normalizes_values():
         "filament_type": "PLA",
         "estimated_printing_time_normal": 31,
     }
+
+
+async def test_parse_file_metadata_async_uses_executor():
+    data = b"G1 X1\n" * INLINE_PARSE_BYTES + b"; filament_type=PLA\n"
+    threads = []
+    executor = ThreadPoolExecutor(
+        max_workers=1,
+        initializer=lambda: threads.append(threading.current_thread()),
+    )
+
+    with executor:
+        assert await parse_file_metadata_async(data, executor) == {
+            "filament_type": "PLA"
+        }
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+
+
+async def test_parse_file_metadata_batch_keeps_order():
+    files = [
+        b"G1 X1\n" * INLINE_PARSE_BYTES + f"; filament_type={name}\n".encode()
+        for name in ("PLA", "PETG", "ASA")
+    ] + [b"; filament_type=TPU\n"]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = await parse_file_metadata_batch(files, executor)
+
+    assert [result["filament_type"] for result in results] == [
+        "PLA",
+        "PETG",
+        "ASA",
+        "TPU",
+    ]
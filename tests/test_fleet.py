@@ -0,0 +1,178 @@
+"""Tests for fleet-wide job commands."""
+
+import asyncio
+import json
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.fleet import JobCommand, broadcast_job_command
+from pyprusalink.limiter import Priority, RequestLimiter
+from pyprusalink.types import BroadcastOutcome
+
+HOSTS = {name: f"http://{name}.local" for name in ("a", "b", "c", "d", "e")}
+
+
+def _version(respx_mock, host, api="2.0.0"):
+    return respx_mock.get(f"{host}/api/version").mock(
+        return_value=httpx.Response(200, json={"api": api})
+    )
+
+
+def _status(job_id=None):
+    status = {"printer": {"state": "PRINTING" if job_id else "IDLE"}}
+    if job_id is not None:
+        status["job"] = {"id": job_id, "progress": 10}
+    return httpx.Response(200, json=status)
+
+
+async def test_broadcast_reports_per_printer_outcomes(respx_mock):
+    async def slow_pause(request):
+        await asyncio.sleep(1)
+        return httpx.Response(204)
+
+    respx_mock.get(f"{HOSTS['a']}/api/v1/status").mock(return_value=_status(1))
+    respx_mock.put(f"{HOSTS['a']}/api/v1/job/1/pause").mock(
+        return_value=httpx.Response(204)
+    )
+    respx_mock.get(f"{HOSTS['b']}/api/v1/status").mock(return_value=_status())
+    respx_mock.get(f"{HOSTS['c']}/api/v1/status").mock(return_value=_status(3))
+    respx_mock.put(f"{HOSTS['c']}/api/v1/job/3/pause").mock(
+        return_value=httpx.Response(409)
+    )
+    respx_mock.get(f"{HOSTS['d']}/api/v1/status").mock(return_value=_status(4))
+    respx_mock.put(f"{HOSTS['d']}/api/v1/job/4/pause").mock(side_effect=slow_pause)
+    respx_mock.get(f"{HOSTS['e']}/api/v1/status").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+
+    async with httpx.AsyncClient() as client:
+        printers = {
+            name: PrusaLink(client, host, "maker", "password")
+            for name, host in HOSTS.items()
+        }
+        results = await broadcast_job_command(printers, JobCommand.PAUSE, timeout=0.1)
+
+    assert {name: result["outcome"] for name, result in results.items()} == {
+        "a": BroadcastOutcome.DONE,
+        "b": BroadcastOutcome.NO_JOB,
+        "c": BroadcastOutcome.CONFLICT,
+        "d": BroadcastOutcome.TIMED_OUT,
+        "e": BroadcastOutcome.ERROR,
+    }
+    assert results["d"]["job_id"] == 4
+    assert "unreachable" in results["e"]["error"]
+    assert 0.05 < results["d"]["elapsed"] < 1
+
+
+async def test_broadcast_runs_concurrently(respx_mock):
+    def delayed(response):
+        async def handler(request):
+            await asyncio.sleep(0.05)
+            return response
+
+        return handler
+
+    for job_id, host in enumerate(HOSTS.values(), start=1):
+        respx_mock.get(f"{host}/api/v1/status").mock(
+            side_effect=delayed(_status(job_id))
+        )
+        respx_mock.delete(f"{host}/api/v1/job/{job_id}").mock(
+            side_effect=delayed(httpx.Response(204))
+        )
+
+    async with httpx.AsyncClient() as client:
+        printers = {
+            name: PrusaLink(client, host, "maker", "password")
+            for name, host in HOSTS.items()
+        }
+        results = await broadcast_job_command(printers, JobCommand.CANCEL, timeout=5)
+
+    assert all(r["outcome"] is BroadcastOutcome.DONE for r in results.values())
+    assert max(r["elapsed"] for r in results.values()) < 0.05 * 2 * len(HOSTS)
+
+
+async def test_broadcast_to_no_printers():
+    assert await broadcast_job_command({}, JobCommand.RESUME, timeout=1) == {}
+
+
+async def test_broadcast_jumps_ahead_of_queued_polls(respx_mock):
+    host = HOSTS["a"]
+    order = []
+
+    def record(name, response):
+        def handler(request):
+            order.append(name)
+            return response
+
+        return handler
+
+    respx_mock.get(f"{host}/api/v1/status").mock(
+        side_effect=record("status", _status(1))
+    )
+    respx_mock.get(f"{host}/api/v1/job").mock(
+        side_effect=record("poll", httpx.Response(204))
+    )
+    respx_mock.put(f"{host}/api/v1/job/1/pause").mock(
+        side_effect=record("pause", httpx.Response(204))
+    )
+    limiter = RequestLimiter(max_requests=1)
+
+    async with httpx.AsyncClient() as client:
+        prusalink = PrusaLink(client, host, "maker", "password", limiter=limiter)
+        async with limiter.slot(Priority.NORMAL):
+            poll = asyncio.create_task(prusalink.get_job())
+            await asyncio.sleep(0)
+            broadcast = asyncio.create_task(
+                broadcast_job_command({"a": prusalink}, JobCommand.PAUSE, timeout=1)
+            )
+            while limiter.queued < 2:
+                await asyncio.sleep(0)
+        await asyncio.gather(poll, broadcast)
+
+    assert order[0] == "status"
+    assert broadcast.result()["a"]["outcome"] == BroadcastOutcome.DONE
+
+
+async def test_broadcast_uses_legacy_api_without_v1(respx_mock):
+    for host in (HOSTS["a"], HOSTS["b"], HOSTS["c"]):
+        _version(respx_mock, host, api="0.9.0")
+        respx_mock.get(f"{host}/api/v1/status").mock(return_value=httpx.Response(404))
+    respx_mock.get(f"{HOSTS['a']}/api/job").mock(
+        return_value=httpx.Response(200, json={"state": "Printing"})
+    )
+    command = respx_mock.post(f"{HOSTS['a']}/api/job").mock(
+        return_value=httpx.Response(204)
+    )
+    respx_mock.get(f"{HOSTS['b']}/api/job").mock(
+        return_value=httpx.Response(200, json={"state": "Operational"})
+    )
+    version = _version(respx_mock, HOSTS["d"])
+    respx_mock.get(f"{HOSTS['d']}/api/v1/status").mock(return_value=_status(4))
+    respx_mock.put(f"{HOSTS['d']}/api/v1/job/4/pause").mock(
+        return_value=httpx.Response(204)
+    )
+
+    async with httpx.AsyncClient() as client:
+        printers = {
+            name: PrusaLink(client, HOSTS[name], "maker", "password")
+            for name in ("a", "b", "d")
+        }
+        results = await broadcast_job_command(printers, JobCommand.PAUSE, timeout=1)
+        printers = {"c": PrusaLink(client, HOSTS["c"], "maker", "password")}
+        unsupported = await broadcast_job_command(
+            printers, JobCommand.CONTINUE, timeout=1
+        )
+
+    assert {name: result["outcome"] for name, result in results.items()} == {
+        "a": BroadcastOutcome.DONE,
+        "b": BroadcastOutcome.NO_JOB,
+        "d": BroadcastOutcome.DONE,
+    }
+    assert results["a"]["job_id"] is None
+    assert results["d"]["job_id"] == 4
+    assert json.loads(command.calls.last.request.content) == {
+        "command": "pause",
+        "action": "pause",
+    }
+    assert unsupported["c"]["outcome"] is BroadcastOutcome.ERROR
+    assert not version.called
@@ -0,0 +1,89 @@
+"""Tests for the polling hub."""
+
+import asyncio
+import json
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.hub import PollingHub
+
+HOST = "http://printer.local"
+STATUS = {"printer": {"state": "IDLE"}}
+
+
+async def test_hub_polls_once_for_all_subscribers(respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(200, json=STATUS)
+    )
+
+    async with httpx.AsyncClient() as client:
+        hub = PollingHub({"mk4": PrusaLink(client, HOST, "maker", "password")}, 60)
+        subscriptions = [hub.subscribe() for _ in range(10)]
+
+        async with hub:
+            updates = [await subscription.get() for subscription in subscriptions]
+
+    assert route.call_count == 1
+    assert all(name == "mk4" for name, _ in updates)
+    assert all(snapshot["status"] == STATUS for _, snapshot in updates)
+    assert hub.snapshot("mk4")["error"] is None
+
+
+async def test_hub_keeps_last_status_on_error(respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=[httpx.Response(200, json=STATUS), httpx.ConnectError("down")]
+    )
+
+    async with httpx.AsyncClient() as client:
+        hub = PollingHub({"mk4": PrusaLink(client, HOST, "maker", "password")}, 0)
+        with hub.subscribe(["mk4"]) as subscription:
+            async with hub:
+                await subscription.get()
+                _, snapshot = await subscription.get()
+
+    assert snapshot["status"] == STATUS
+    assert "down" in snapshot["error"]
+
+
+async def test_hub_serves_http_and_events(respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(200, json=STATUS)
+    )
+
+    async with httpx.AsyncClient() as client:
+        hub = PollingHub({"mk4": PrusaLink(client, HOST, "maker", "password")}, 60)
+        async with hub:
+            with hub.subscribe() as subscription:
+                await subscription.get()
+
+            server = await hub.serve()
+            port = server.sockets[0].getsockname()[1]
+
+            async def get(path):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: hub\r\n\r\n".encode())
+                await writer.drain()
+                return reader, writer
+
+            reader, writer = await get("/printers")
+            response = await reader.read()
+            writer.close()
+            assert response.startswith(b"HTTP/1.1 200 OK")
+            assert json.loads(response.split(b"\r\n\r\n", 1)[1])["mk4"]["status"] == (
+                STATUS
+            )
+
+            reader, writer = await get("/printers/unknown")
+            assert (await reader.read()).startswith(b"HTTP/1.1 404")
+            writer.close()
+
+            reader, writer = await get("/events")
+            headers = await reader.readuntil(b"\r\n\r\n")
+            event = await reader.readuntil(b"\n\n")
+            writer.close()
+            assert b"text/event-stream" in headers
+            assert event.startswith(b"event: snapshot\ndata: ")
+            assert json.loads(event.split(b"data: ", 1)[1])["printer"] == "mk4"
+
+            server.close()
+            await server.wait_closed()
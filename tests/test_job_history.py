@@ -0,0 +1,141 @@
+"""Tests for the job history log."""
+
+from pyprusalink.job_history import JobHistory
+
+
+def _status(state, job_id=None, progress=0):
+    status = {"printer": {"state": state}}
+    if job_id is not None:
+        status["job"] = {"id": job_id, "progress": progress, "time_printing": 60}
+    return status
+
+
+def _job(job_id, name="A.BGC"):
+    return {
+        "id": job_id,
+        "state": "PRINTING",
+        "progress": 0,
+        "time_remaining": None,
+        "time_printing": 0,
+        "inaccurate_estimates": None,
+        "serial_print": None,
+        "file": {"name": name, "path": "/usb/", "m_timestamp": 1},
+    }
+
+
+def _record(printer, ended, path="/usb/A.BGC", filament=10.0, progress=100.0):
+    return {
+        "printer": printer,
+        "job_id": 1,
+        "path": path,
+        "state": "FINISHED",
+        "started": ended - 10,
+        "ended": ended,
+        "progress": progress,
+        "time_printing": 10,
+        "metadata": {"filament_used_g": filament},
+    }
+
+
+def test_observe_records_finished_job(tmp_path):
+    history = JobHistory(tmp_path / "jobs.jsonl")
+    metadata = {"filament_used_g": 20.0}
+
+    assert history.observe("mk4", _status("IDLE"), timestamp=0) is None
+    assert (
+        history.observe(
+            "mk4", _status("PRINTING", 5, 10), _job(5), metadata, timestamp=1
+        )
+        is None
+    )
+    record = history.observe("mk4", _status("FINISHED", 5, 100), timestamp=9)
+    # The finished job stays on the printer until it is cleared.
+    assert history.observe("mk4", _status("FINISHED", 5, 100), timestamp=10) is None
+
+    assert record == {
+        "printer": "mk4",
+        "job_id": 5,
+        "path": "/usb/A.BGC",
+        "state": "FINISHED",
+        "started": 1,
+        "ended": 9,
+        "progress": 100.0,
+        "time_printing": 60,
+        "metadata": metadata,
+    }
+    assert list(history.query()) == [record]
+
+
+def test_observe_records_vanished_job(tmp_path):
+    history = JobHistory(tmp_path / "jobs.jsonl")
+
+    history.observe("mk4", _status("PRINTING", 5, 40), timestamp=1)
+    history.observe("mk4", _status("PAUSED", 5, 40), timestamp=2)
+    record = history.observe("mk4", _status("IDLE"), timestamp=3)
+
+    assert record["state"] == "PAUSED"
+    assert record["progress"] == 40.0
+
+
+def test_observe_skips_job_first_seen_ended(tmp_path):
+    history = JobHistory(tmp_path / "jobs.jsonl")
+
+    assert history.observe("mk4", _status("FINISHED", 5, 100), timestamp=1) is None
+    assert history.observe("mk4", _status("IDLE"), timestamp=2) is None
+    assert len(history) == 0
+
+
+def test_reopened_history_does_not_record_job_again(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    history = JobHistory(path)
+    history.observe("mk4", _status("PRINTING", 5, 10), timestamp=1)
+    history.observe("mk4", _status("FINISHED", 5, 100), timestamp=9)
+
+    reopened = JobHistory(path)
+    reopened.observe("mk4", _status("FINISHED", 5, 100), timestamp=20)
+    reopened.observe("mk4", _status("PRINTING", 6, 10), timestamp=21)
+    reopened.observe("mk4", _status("FINISHED", 6, 100), timestamp=29)
+
+    assert [(r["job_id"], r["ended"]) for r in reopened.query()] == [(5, 9), (6, 29)]
+
+
+def test_query_filters_use_indexes(tmp_path):
+    history = JobHistory(tmp_path / "jobs.jsonl")
+    for ended in range(10):
+        history.append(_record("mk4" if ended % 2 else "xl", float(ended)))
+    history.append(_record("mk4", 10.0, path="/usb/B.BGC"))
+
+    assert [r["ended"] for r in history.query(printer="xl", since=3, until=6)] == [
+        4.0,
+        6.0,
+    ]
+    assert [r["ended"] for r in history.query(path="/usb/B.BGC")] == [10.0]
+    assert list(history.query(printer="mk4", path="/usb/B.BGC", until=9)) == []
+    assert list(history.query(printer="mini")) == []
+
+
+def test_filament_used_by_printer(tmp_path):
+    history = JobHistory(tmp_path / "jobs.jsonl")
+    history.append(_record("mk4", 1.0))
+    history.append(_record("mk4", 2.0, progress=50.0))
+    history.append(_record("xl", 3.0, filament=5.0))
+    history.append(_record("xl", 100.0))
+
+    assert history.filament_used_by_printer(since=0, until=50) == {
+        "mk4": 15.0,
+        "xl": 5.0,
+    }
+
+
+def test_history_reloads_and_drops_torn_record(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    history = JobHistory(path)
+    history.append(_record("mk4", 1.0))
+    with open(path, "ab") as fp:
+        fp.write(b'{"printer": "mk4", "job')
+
+    reloaded = JobHistory(path)
+    reloaded.append(_record("xl", 2.0))
+
+    assert len(reloaded) == 2
+    assert [r["printer"] for r in reloaded.query()] == ["mk4", "xl"]
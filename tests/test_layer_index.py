@@ -0,0 +1,147 @@
+"""Tests for the print file layer index."""
+
+import struct
+import zlib
+
+import httpx
+from pyprusalink.layer_index import LayerIndex, LayerIndexBuilder, build_layer_index
+import pytest
+
+HOST = "http://printer.local"
+
+GCODE = b"""; generated by PrusaSlicer
+M73 P0 R10
+G90
+M83
+G1 Z0.2 F720
+G1 X10 Y10 E1.5
+G1 X20 Y10 E1.5
+;LAYER_CHANGE
+;Z:0.4
+G1 E-0.8 F2100
+G1 Z0.6
+G1 X30 Y30
+G1 Z0.4
+G1 E0.8
+M73 P50 R5
+G1 X40 Y30 E2
+;LAYER_CHANGE
+;Z:0.6
+G1 Z0.6
+G1 X50 Y30 E1
+M73 P100 R0
+"""
+
+
+def _bgcode(gcode: bytes, encoding: int = 0) -> bytes:
+    payload = zlib.compress(gcode)
+    header = struct.pack("<HHIIH", 1, 1, len(gcode), len(payload), encoding)
+    return b"GCDE" + struct.pack("<IH", 1, 0) + header + payload
+
+
+def test_build_layer_index_from_gcode():
+    index = build_layer_index(GCODE)
+
+    assert index.layer_count == 3
+    assert index.file_size == len(GCODE)
+    assert index.total_extrusion == pytest.approx(6.0)
+
+    first = index.position_at_offset(GCODE.index(b"G1 X20"))
+    assert first["layer"] == 1
+    assert first["z"] == pytest.approx(0.2)
+
+    last = index.position_at_offset(len(GCODE))
+    assert last == {
+        "layer": 3,
+        "layer_count": 3,
+        "z": pytest.approx(0.6),
+        "filament_used_mm": pytest.approx(6.0),
+        "filament_remaining_mm": pytest.approx(0.0),
+    }
+
+
+def test_z_hop_does_not_create_layer():
+    index = build_layer_index(GCODE)
+
+    second = index.position_at_offset(GCODE.index(b"G1 X40"))
+    assert second["layer"] == 2
+    assert second["z"] == pytest.approx(0.4)
+
+
+def test_position_at_progress_uses_m73_markers():
+    index = build_layer_index(GCODE)
+
+    assert index.offset_for_progress(50) == GCODE.index(b"M73 P50")
+    assert index.position_at_progress(50)["layer"] == 2
+    assert index.position_at_progress(100)["layer"] == 3
+
+
+def test_position_before_first_layer():
+    assert build_layer_index(GCODE).position_at_offset(0) is None
+
+
+def test_builder_accepts_arbitrary_chunks():
+    builder = LayerIndexBuilder()
+    for start in range(0, len(GCODE), 7):
+        builder.feed(GCODE[start : start + 7])
+
+    assert builder.build().to_bytes() == build_layer_index(GCODE).to_bytes()
+
+
+def test_build_layer_index_from_bgcode():
+    index = build_layer_index(_bgcode(GCODE))
+
+    assert index.layer_count == 3
+    assert index.total_extrusion == pytest.approx(6.0)
+
+
+def test_bgcode_layer_offsets_are_interpolated_within_blocks():
+    index = build_layer_index(_bgcode(GCODE))
+
+    offsets = [index.offset_for_progress(progress) for progress in (0, 50, 100)]
+
+    assert offsets == sorted(set(offsets))
+    assert offsets[-1] < index.file_size
+
+
+def test_build_layer_index_from_meatpacked_bgcode():
+    # G1 Z0.2 / G1 X5 E1, packed without spaces.
+    packed = bytes.fromhex("fffffbfffff7 1d0f5a2acc 1d5e1bcc")
+
+    index = build_layer_index(_bgcode(packed, encoding=2))
+
+    assert index.layer_count == 1
+    assert index.position_at_offset(index.file_size)["z"] == pytest.approx(0.2)
+    assert index.total_extrusion == pytest.approx(1.0)
+
+
+def test_build_layer_index_rejects_unknown_encoding():
+    with pytest.raises(ValueError):
+        build_layer_index(_bgcode(GCODE, encoding=7))
+
+
+def test_layer_index_serialization_round_trip():
+    index = build_layer_index(GCODE)
+
+    loaded = LayerIndex.from_bytes(index.to_bytes())
+
+    assert loaded.to_bytes() == index.to_bytes()
+    assert loaded.position_at_progress(75) == index.position_at_progress(75)
+
+
+def test_layer_index_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        LayerIndex.from_bytes(b"nope")
+
+    with pytest.raises(ValueError):
+        LayerIndex.from_bytes(build_layer_index(GCODE).to_bytes()[:-1])
+
+
+async def test_get_layer_index(pl, respx_mock):
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(200, content=GCODE)
+    )
+
+    index = await pl.get_layer_index("/usb/test.gcode")
+
+    assert index.layer_count == 3
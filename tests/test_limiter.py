@@ -0,0 +1,196 @@
+"""Tests for per-printer request concurrency limiting."""
+
+import asyncio
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.limiter import Priority, RequestLimiter
+from pyprusalink.resilience import RetryPolicy
+import pytest
+
+HOST = "http://printer.local"
+
+
+async def test_limiter_queues_requests_beyond_limit():
+    limiter = RequestLimiter(max_requests=1)
+    order = []
+
+    async def task(name):
+        async with limiter.slot():
+            order.append(f"{name} start")
+            await asyncio.sleep(0)
+            order.append(f"{name} end")
+
+    await asyncio.gather(task("a"), task("b"))
+
+    assert order == ["a start", "a end", "b start", "b end"]
+    assert limiter.in_flight == 0
+
+
+async def test_streams_do_not_starve_small_requests():
+    limiter = RequestLimiter(max_requests=2)
+
+    async with limiter.slot(bulk=True):
+        second_stream = asyncio.create_task(
+            limiter._acquire(Priority.BACKGROUND, bulk=True)
+        )
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        # The remaining slot is still available to a small request.
+        async with limiter.slot():
+            assert limiter.in_flight == 2
+
+        assert not second_stream.done()
+
+    await second_stream
+    assert limiter.in_flight == 1
+
+
+async def test_cancelled_waiter_leaves_queue():
+    limiter = RequestLimiter(max_requests=1)
+
+    async with limiter.slot():
+        waiter = asyncio.create_task(limiter._acquire(Priority.NORMAL, bulk=False))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    assert limiter.queued == 0
+    assert limiter.in_flight == 0
+
+
+async def test_control_requests_jump_the_queue():
+    limiter = RequestLimiter(max_requests=1)
+    order = []
+
+    async def task(name, priority):
+        async with limiter.slot(priority):
+            order.append(name)
+
+    async with limiter.slot():
+        tasks = [
+            asyncio.create_task(task("poll", Priority.NORMAL)),
+            asyncio.create_task(task("background", Priority.BACKGROUND)),
+            asyncio.create_task(task("cancel", Priority.CONTROL)),
+        ]
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*tasks)
+
+    assert order == ["cancel", "poll", "background"]
+
+
+async def test_stream_yields_slot_to_control_request():
+    limiter = RequestLimiter(max_requests=1, max_streams=1)
+    order = []
+
+    async def control():
+        async with limiter.slot(Priority.CONTROL):
+            order.append("control")
+
+    async with limiter.slot(Priority.BACKGROUND, bulk=True) as slot:
+        task = asyncio.create_task(control())
+        await asyncio.sleep(0)
+        assert order == []
+
+        await slot.yield_to_higher_priority()
+        order.append("stream resumed")
+        assert slot.held
+
+    await task
+    assert order == ["control", "stream resumed"]
+    assert limiter.in_flight == 0
+
+
+def test_limiter_rejects_invalid_limit():
+    with pytest.raises(ValueError):
+        RequestLimiter(max_requests=0)
+
+
+async def test_client_enforces_limit(respx_mock):
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"printer": {"state": "IDLE"}})
+
+    respx_mock.get(f"{HOST}/api/v1/status").mock(side_effect=handler)
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client, HOST, "maker", "password", limiter=RequestLimiter(max_requests=2)
+        )
+        records = []
+        pl.client.add_listener(records.append)
+        await asyncio.gather(*(pl.get_status() for _ in range(5)))
+
+    assert peak == 2
+    assert all("queue" in record["phases"] for record in records)
+
+
+async def test_cancel_pre_empts_stream(respx_mock):
+    async def body():
+        for _ in range(3):
+            yield b"; filament_type=PLA\n"
+
+    respx_mock.get(f"{HOST}/usb/large.gcode").mock(
+        side_effect=lambda request: httpx.Response(200, content=body())
+    )
+    respx_mock.delete(f"{HOST}/api/v1/job/1").mock(return_value=httpx.Response(204))
+    limiter = RequestLimiter(max_requests=1, max_streams=1)
+    order = []
+
+    async def cancel():
+        await pl.cancel_job(1)
+        order.append("cancel")
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(client, HOST, "maker", "password", limiter=limiter)
+
+        async with pl.client.stream_request("GET", "/usb/large.gcode") as response:
+            task = asyncio.create_task(cancel())
+            await asyncio.sleep(0)
+
+            async for _chunk in pl.client.iter_bytes(response):
+                order.append("chunk")
+
+        await task
+
+    assert order == ["chunk", "cancel", "chunk", "chunk"]
+
+
+async def test_retry_backoff_releases_slot(respx_mock, monkeypatch):
+    order = []
+    failed = asyncio.Event()
+
+    def status(request):
+        order.append("status")
+        if not failed.is_set():
+            failed.set()
+            return httpx.Response(503)
+        return httpx.Response(200, json={"printer": {"state": "IDLE"}})
+
+    respx_mock.get(f"{HOST}/api/v1/status").mock(side_effect=status)
+    respx_mock.delete(f"{HOST}/api/v1/job/1").mock(
+        side_effect=lambda request: order.append("cancel") or httpx.Response(204)
+    )
+    retry = RetryPolicy(attempts=2)
+    monkeypatch.setattr(retry, "delay", lambda attempt: 0.05)
+    limiter = RequestLimiter(max_requests=1)
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(client, HOST, "maker", "password", retry=retry, limiter=limiter)
+        task = asyncio.create_task(pl.get_status())
+        await failed.wait()
+        await pl.cancel_job(1)
+        await task
+
+    assert order == ["status", "cancel", "status"]
+    assert limiter.in_flight == 0
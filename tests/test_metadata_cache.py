@@ -0,0 +1,155 @@
+"""Tests for metadata sharing between printers."""
+
+import asyncio
+
+import httpx
+from pyprusalink import PrusaLink, file_metadata
+from pyprusalink.limiter import RequestLimiter
+from pyprusalink.metadata_cache import (
+    FINGERPRINT_BYTES,
+    MetadataCache,
+    metadata_fingerprint,
+)
+import pytest
+
+HOSTS = [f"http://printer-{i}.local" for i in range(3)]
+GCODE = (
+    b"; generated by PrusaSlicer\n"
+    + b"G1 X10 Y10 E1\n" * 4000
+    + b"; filament used [g]=24.41\n; filament_type=PLA\n"
+)
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    """Count the print files parsed."""
+    calls = []
+    parse = file_metadata.parse_file_metadata
+
+    def counting_parse(data):
+        calls.append(len(data))
+        return parse(data)
+
+    monkeypatch.setattr(file_metadata, "parse_file_metadata", counting_parse)
+    return calls
+
+
+async def test_metadata_is_shared_between_printers(respx_mock, parse_calls):
+    for host in HOSTS:
+        respx_mock.get(f"{host}/usb/A.GCO").mock(
+            return_value=httpx.Response(200, content=GCODE)
+        )
+    cache = MetadataCache()
+
+    async with httpx.AsyncClient() as client:
+        printers = [
+            PrusaLink(client, host, "maker", "password", metadata_cache=cache)
+            for host in HOSTS
+        ]
+        results = await asyncio.gather(
+            *(printer.get_file_metadata("/usb/A.GCO") for printer in printers)
+        )
+        results.append(await printers[0].get_file_metadata("/usb/A.GCO"))
+
+    assert parse_calls == [len(GCODE)]
+    assert all(
+        result == {"filament_used_g": 24.41, "filament_type": "PLA"}
+        for result in results
+    )
+
+
+async def test_ranged_metadata_only_fetches_fingerprint_when_cached(
+    respx_mock, parse_calls
+):
+    route = respx_mock.get(f"{HOSTS[0]}/usb/A.GCO").mock(
+        return_value=httpx.Response(206, content=GCODE[:FINGERPRINT_BYTES])
+    )
+    cache = MetadataCache()
+    cache.set(metadata_fingerprint(len(GCODE), GCODE), {"filament_type": "PLA"})
+
+    async with httpx.AsyncClient() as client:
+        printer = PrusaLink(client, HOSTS[0], "maker", "password", metadata_cache=cache)
+        result = await printer.get_file_metadata_ranged("/usb/A.GCO", len(GCODE))
+
+    assert result == {"filament_type": "PLA"}
+    assert parse_calls == []
+    assert [call.request.headers["Range"] for call in route.calls] == [
+        f"bytes=0-{FINGERPRINT_BYTES - 1}"
+    ]
+
+
+async def test_full_and_ranged_metadata_share_one_stream_slot(respx_mock, parse_calls):
+    limiter = RequestLimiter(2, max_streams=1)
+
+    async def serve(request):
+        if (header := request.headers.get("Range")) is None:
+            return httpx.Response(200, content=GCODE)
+        if header == f"bytes=0-{FINGERPRINT_BYTES - 1}":
+            # Hand the stream slot to the full download next.
+            while not limiter.queued:
+                await asyncio.sleep(0)
+        start, _, end = header.removeprefix("bytes=").partition("-")
+        return httpx.Response(206, content=GCODE[int(start) : int(end) + 1])
+
+    respx_mock.get(f"{HOSTS[0]}/usb/A.GCO").mock(side_effect=serve)
+
+    async with httpx.AsyncClient() as client:
+        printer = PrusaLink(
+            client,
+            HOSTS[0],
+            "maker",
+            "password",
+            limiter=limiter,
+            metadata_cache=MetadataCache(),
+        )
+        ranged, full = await asyncio.wait_for(
+            asyncio.gather(
+                printer.get_file_metadata_ranged("/usb/A.GCO", len(GCODE)),
+                printer.get_file_metadata("/usb/A.GCO"),
+            ),
+            timeout=5,
+        )
+
+    assert ranged == full == {"filament_used_g": 24.41, "filament_type": "PLA"}
+    assert len(parse_calls) == 1
+
+
+def test_fingerprint_depends_on_size_and_head():
+    assert metadata_fingerprint(10, b"a" * FINGERPRINT_BYTES + b"b") == (
+        metadata_fingerprint(10, b"a" * FINGERPRINT_BYTES + b"c")
+    )
+    assert metadata_fingerprint(10, b"a") != metadata_fingerprint(11, b"a")
+    assert metadata_fingerprint(10, b"a") != metadata_fingerprint(10, b"b")
+
+
+async def test_waiter_parses_when_first_caller_fails():
+    cache = MetadataCache()
+    started = asyncio.Event()
+
+    async def failing_parse():
+        started.set()
+        await asyncio.sleep(0)
+        raise httpx.ConnectError("printer went away")
+
+    async def parse():
+        return {"filament_type": "PETG"}
+
+    first = asyncio.create_task(cache.get_or_parse("key", failing_parse))
+    await started.wait()
+    second = asyncio.create_task(cache.get_or_parse("key", parse))
+
+    with pytest.raises(httpx.ConnectError):
+        await first
+    assert await second == {"filament_type": "PETG"}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = MetadataCache(max_entries=2)
+    cache.set("a", {"filament_type": "PLA"})
+    cache.set("b", {"filament_type": "PETG"})
+    cache.get("a")
+    cache.set("c", {"filament_type": "ASA"})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"filament_type": "PLA"}
@@ -1,7 +1,12 @@
 """Happy-path tests for PrusaLink public API methods."""
 
+import asyncio
+import hashlib
+import io
+
 import httpx
-from pyprusalink.types import FileTooLarge
+from pyprusalink.disk_cache import DiskCache
+from pyprusalink.types import Conflict, FileTooLarge
 import pytest
 
 HOST = "http://printer.local"
@@ -311,6 +316,48 @@ async def test_get_file(pl, respx_mock):
     assert result == thumbnail_bytes
 
 
+async def test_get_file_too_large(pl, respx_mock):
+    respx_mock.get(f"{HOST}/usb/print.gcode").mock(
+        return_value=httpx.Response(200, content=b"G1 X1\n" * 100)
+    )
+
+    with pytest.raises(FileTooLarge):
+        await pl.get_file("/usb/print.gcode", max_bytes=100)
+
+
+async def test_iter_file_enforces_limit_without_content_length(pl, respx_mock):
+    async def body():
+        for _ in range(3):
+            yield b"x" * 40
+
+    respx_mock.get(f"{HOST}/usb/print.gcode").mock(
+        return_value=httpx.Response(200, content=body())
+    )
+    chunks = []
+
+    with pytest.raises(FileTooLarge):
+        async for chunk in pl.iter_file("/usb/print.gcode", max_bytes=100):
+            chunks.append(chunk)
+
+    assert sum(map(len, chunks)) <= 100
+
+
+async def test_get_file_into_sinks(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/thumbnails/test.png").mock(
+        return_value=httpx.Response(200, content=b"image")
+    )
+    buffer = bytearray(16)
+    stream = io.BytesIO()
+
+    assert await pl.get_file_into("/api/thumbnails/test.png", memoryview(buffer)) == 5
+    assert await pl.get_file_into("/api/thumbnails/test.png", stream) == 5
+    with pytest.raises(FileTooLarge):
+        await pl.get_file_into("/api/thumbnails/test.png", memoryview(bytearray(4)))
+
+    assert buffer[:5] == b"image"
+    assert stream.getvalue() == b"image"
+
+
 async def test_get_file_metadata(pl, respx_mock):
     print_file = b"""
 ; filament_type=PLA
@@ -342,3 +389,476 @@ async def test_get_file_metadata_rejects_large_files(pl, respx_mock):
 
     with pytest.raises(FileTooLarge):
         await pl.get_file_metadata("/usb/large.bgcode", max_bytes=17)
+
+
+async def test_download_file(pl, respx_mock, tmp_path):
+    content = b"G1 X10 Y10\n" * 100
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(200, content=content)
+    )
+    dest = tmp_path / "test.gcode"
+
+    result = await pl.download_file("/usb/test.gcode", dest, checksum="sha256")
+
+    assert dest.read_bytes() == content
+    assert result["size"] == len(content)
+    assert result["bytes_downloaded"] == len(content)
+    assert result["resumed_from"] == 0
+    assert result["checksum"] == hashlib.sha256(content).hexdigest()
+
+
+async def test_download_file_resumes_partial_file(pl, respx_mock, tmp_path):
+    content = b"G1 X10 Y10\n" * 100
+    route = respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(
+            206,
+            content=content[500:],
+            headers={"Content-Range": f"bytes 500-{len(content) - 1}/{len(content)}"},
+        )
+    )
+    dest = tmp_path / "test.gcode"
+    dest.write_bytes(content[:500])
+
+    result = await pl.download_file("/usb/test.gcode", dest, checksum="md5")
+
+    assert route.calls.last.request.headers["Range"] == "bytes=500-"
+    assert dest.read_bytes() == content
+    assert result["resumed_from"] == 500
+    assert result["bytes_downloaded"] == len(content) - 500
+    assert result["checksum"] == hashlib.md5(content).hexdigest()
+
+
+async def test_download_file_restarts_when_range_is_ignored(pl, respx_mock, tmp_path):
+    content = b"G1 X10 Y10\n" * 100
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(200, content=content)
+    )
+    dest = tmp_path / "test.gcode"
+    dest.write_bytes(b"stale")
+
+    result = await pl.download_file("/usb/test.gcode", dest)
+
+    assert dest.read_bytes() == content
+    assert result["resumed_from"] == 0
+
+
+async def test_download_file_already_complete(pl, respx_mock, tmp_path):
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(416, headers={"Content-Range": "bytes */8"})
+    )
+    dest = tmp_path / "test.gcode"
+    dest.write_bytes(b"complete")
+
+    result = await pl.download_file("/usb/test.gcode", dest)
+
+    assert result["size"] == 8
+    assert result["bytes_downloaded"] == 0
+
+
+async def test_download_file_restarts_when_partial_file_is_larger(
+    pl, respx_mock, tmp_path
+):
+    route = respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        side_effect=[
+            httpx.Response(416, headers={"Content-Range": "bytes */5"}),
+            httpx.Response(200, content=b"short"),
+        ]
+    )
+    dest = tmp_path / "test.gcode"
+    dest.write_bytes(b"a much longer stale file")
+
+    result = await pl.download_file("/usb/test.gcode", dest)
+
+    assert dest.read_bytes() == b"short"
+    assert "Range" not in route.calls.last.request.headers
+    assert result["resumed_from"] == 0
+
+
+async def test_download_file_restarts_when_file_changed(pl, respx_mock, tmp_path):
+    async def interrupted_body():
+        yield b"first half, "
+        raise httpx.ReadError("connection reset")
+
+    route = respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        side_effect=[
+            httpx.Response(
+                200, content=interrupted_body(), headers={"content-length": "23"}
+            ),
+            httpx.Response(
+                206,
+                content=b"changed",
+                headers={"Content-Range": "bytes 12-18/19"},
+            ),
+            httpx.Response(200, content=b"a new, changed file"),
+        ]
+    )
+    dest = tmp_path / "test.gcode"
+
+    result = await pl.download_file("/usb/test.gcode", dest)
+
+    assert dest.read_bytes() == b"a new, changed file"
+    assert "Range" not in route.calls.last.request.headers
+    assert result["bytes_downloaded"] == 19
+
+
+async def test_download_file_resumes_interrupted_transfer(pl, respx_mock, tmp_path):
+    async def interrupted_body():
+        yield b"first half, "
+        raise httpx.ReadError("connection reset")
+
+    route = respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        side_effect=[
+            httpx.Response(200, content=interrupted_body()),
+            httpx.Response(
+                206,
+                content=b"second half",
+                headers={"Content-Range": "bytes 12-22/23"},
+            ),
+        ]
+    )
+    dest = tmp_path / "test.gcode"
+
+    result = await pl.download_file("/usb/test.gcode", dest)
+
+    assert dest.read_bytes() == b"first half, second half"
+    assert route.calls.last.request.headers["Range"] == "bytes=12-"
+    assert result["bytes_downloaded"] == 23
+
+
+def _ranged_file(content):
+    """Serve byte ranges of a file like the printer does."""
+
+    def handler(request):
+        start, end = request.headers["Range"].removeprefix("bytes=").split("-")
+        return httpx.Response(206, content=content[int(start) : int(end) + 1])
+
+    return handler
+
+
+def _version(respx_mock, api="2.0.0", upload_by_put=True):
+    return respx_mock.get(f"{HOST}/api/version").mock(
+        return_value=httpx.Response(
+            200, json={"api": api, "capabilities": {"upload-by-put": upload_by_put}}
+        )
+    )
+
+
+async def test_upload_file(pl, respx_mock, tmp_path):
+    source = tmp_path / "benchy.bgcode"
+    source.write_bytes(b"GCDE" + b"\x00" * 100)
+    _version(respx_mock)
+    respx_mock.get(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        return_value=httpx.Response(404)
+    )
+    upload = respx_mock.put(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        return_value=httpx.Response(201)
+    )
+
+    result = await pl.upload_file(source, "/usb/benchy.bgcode", print_after_upload=True)
+
+    request = upload.calls.last.request
+    assert request.content == source.read_bytes()
+    assert request.headers["Content-Length"] == "104"
+    assert request.headers["Overwrite"] == "?0"
+    assert request.headers["Print-After-Upload"] == "?1"
+    assert result["skipped"] is False
+    assert result["bytes_uploaded"] == 104
+
+
+async def test_upload_file_skips_identical_file(pl, respx_mock, tmp_path):
+    content = bytes(range(256)) * 200
+    source = tmp_path / "benchy.bgcode"
+    source.write_bytes(content)
+    _version(respx_mock)
+    respx_mock.get(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "name": "benchy.bgcode",
+                "type": "PRINT_FILE",
+                "size": len(content),
+                "m_timestamp": 1700000000,
+                "refs": {"download": "/usb/benchy.bgcode"},
+            },
+        )
+    )
+    ranges = respx_mock.get(f"{HOST}/usb/benchy.bgcode").mock(
+        side_effect=_ranged_file(content)
+    )
+    start = respx_mock.post(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        return_value=httpx.Response(204)
+    )
+    upload = respx_mock.put(f"{HOST}/api/v1/files/usb/benchy.bgcode")
+
+    result = await pl.upload_file(source, "/usb/benchy.bgcode", print_after_upload=True)
+
+    assert result["skipped"] is True
+    assert result["bytes_uploaded"] == 0
+    assert ranges.call_count == 2
+    assert start.called
+    assert not upload.called
+
+    pl.disk_cache = DiskCache(tmp_path / "cache.db")
+    await pl.upload_file(source, "/usb/benchy.bgcode")
+    await pl.upload_file(source, "/usb/benchy.bgcode")
+
+    assert ranges.call_count == 4
+    assert not upload.called
+
+
+async def test_upload_file_replaces_different_file(pl, respx_mock, tmp_path):
+    content = b"G1 X10 Y10\n" * 3000
+    source = tmp_path / "benchy.gcode"
+    source.write_bytes(content)
+    _version(respx_mock)
+    # Same size and header, different print statistics at the end.
+    remote = content[:-11] + b"G1 X20 Y20\n"
+    respx_mock.get(f"{HOST}/api/v1/files/usb/benchy.gcode").mock(
+        return_value=httpx.Response(
+            200,
+            json={"name": "benchy.gcode", "type": "PRINT_FILE", "size": len(remote)},
+        )
+    )
+    respx_mock.get(f"{HOST}/usb/benchy.gcode").mock(side_effect=_ranged_file(remote))
+    upload = respx_mock.put(f"{HOST}/api/v1/files/usb/benchy.gcode").mock(
+        side_effect=[httpx.Response(409), httpx.Response(201)]
+    )
+
+    with pytest.raises(Conflict):
+        await pl.upload_file(source, "/usb/benchy.gcode")
+    result = await pl.upload_file(source, "/usb/benchy.gcode", overwrite=True)
+
+    assert result["skipped"] is False
+    assert upload.calls.last.request.headers["Overwrite"] == "?1"
+
+
+async def test_upload_file_resends_body_on_digest_challenge(pl, respx_mock, tmp_path):
+    source = tmp_path / "benchy.bgcode"
+    source.write_bytes(b"GCDE" + bytes(range(256)) * 10)
+    _version(respx_mock)
+    respx_mock.get(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        return_value=httpx.Response(404)
+    )
+    upload = respx_mock.put(f"{HOST}/api/v1/files/usb/benchy.bgcode").mock(
+        side_effect=[
+            httpx.Response(
+                401,
+                headers={"WWW-Authenticate": 'Digest realm="Printer", nonce="abc"'},
+            ),
+            httpx.Response(201),
+        ]
+    )
+
+    await pl.upload_file(source, "/usb/benchy.bgcode")
+
+    assert upload.call_count == 2
+    assert upload.calls.last.request.content == source.read_bytes()
+    assert "authorization" in upload.calls.last.request.headers
+
+
+async def test_upload_file_uses_legacy_form_without_put(pl, respx_mock, tmp_path):
+    source = tmp_path / "benchy.gcode"
+    source.write_bytes(b"G1 X10 Y10\n" * 10)
+    _version(respx_mock, api="0.9.0", upload_by_put=False)
+    upload = respx_mock.post(f"{HOST}/api/files/local").mock(
+        return_value=httpx.Response(201)
+    )
+
+    result = await pl.upload_file(
+        source, "/local/models/benchy.gcode", print_after_upload=True
+    )
+
+    request = upload.calls.last.request
+    assert int(request.headers["Content-Length"]) == len(request.content)
+    boundary = request.headers["Content-Type"].split("boundary=")[1]
+    parts = request.content.split(f"--{boundary}".encode())
+    assert (
+        parts[1] == b'\r\nContent-Disposition: form-data; name="path"\r\n\r\nmodels\r\n'
+    )
+    assert parts[2].endswith(b'name="print"\r\n\r\ntrue\r\n')
+    assert b'filename="benchy.gcode"' in parts[3]
+    assert parts[3].endswith(b"\r\n\r\n" + source.read_bytes() + b"\r\n")
+    assert parts[4] == b"--\r\n"
+    assert result["bytes_uploaded"] == 110
+
+
+def _folder(name, m_timestamp, children):
+    return {
+        "name": name,
+        "type": "FOLDER",
+        "m_timestamp": m_timestamp,
+        "children": children,
+    }
+
+
+async def test_get_files(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb/models").mock(
+        return_value=httpx.Response(200, json=_folder("models", 10, []))
+    )
+
+    result = await pl.get_files("/usb/models/")
+
+    assert result["type"] == "FOLDER"
+
+
+async def test_walk_files_uses_listing_cache(pl, respx_mock):
+    print_file = {"name": "A.BGC", "type": "PRINT_FILE", "size": 10, "m_timestamp": 5}
+    root = respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        return_value=httpx.Response(
+            200,
+            json=_folder(
+                "usb",
+                1,
+                [
+                    print_file,
+                    {"name": "sub", "type": "FOLDER", "m_timestamp": 2},
+                    {"name": "other", "type": "FOLDER", "m_timestamp": 3},
+                ],
+            ),
+        )
+    )
+    sub = respx_mock.get(f"{HOST}/api/v1/files/usb/sub").mock(
+        return_value=httpx.Response(
+            200,
+            json=_folder(
+                "sub", 2, [{"name": "deep", "type": "FOLDER", "m_timestamp": 4}]
+            ),
+        )
+    )
+    other = respx_mock.get(f"{HOST}/api/v1/files/usb/other").mock(
+        return_value=httpx.Response(200, json=_folder("other", 3, []))
+    )
+    deep = respx_mock.get(f"{HOST}/api/v1/files/usb/sub/deep").mock(
+        return_value=httpx.Response(
+            200, json=_folder("deep", 4, [{"name": "B.GCO", "type": "PRINT_FILE"}])
+        )
+    )
+
+    first = [path async for path, _ in pl.walk_files("/usb/")]
+    second = [path async for path, _ in pl.walk_files("/usb/")]
+
+    assert sorted(first) == [
+        "/usb/A.BGC",
+        "/usb/other",
+        "/usb/sub",
+        "/usb/sub/deep",
+        "/usb/sub/deep/B.GCO",
+    ]
+    assert sorted(second) == sorted(first)
+    assert root.call_count == 2
+    assert (sub.call_count, other.call_count, deep.call_count) == (1, 1, 1)
+
+
+async def test_walk_files_refetches_changed_folder(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/files/usb").mock(
+        side_effect=[
+            httpx.Response(200, json=_folder("usb", 1, [_folder("sub", 2, [])])),
+            httpx.Response(200, json=_folder("usb", 1, [_folder("sub", 3, [])])),
+        ]
+    )
+    sub = respx_mock.get(f"{HOST}/api/v1/files/usb/sub").mock(
+        return_value=httpx.Response(200, json=_folder("sub", 2, []))
+    )
+
+    [entry async for entry in pl.walk_files("/usb")]
+    [entry async for entry in pl.walk_files("/usb")]
+
+    assert sub.call_count == 2
+
+
+async def test_get_file_range(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(206, content=b"3456")
+    )
+
+    assert await pl.get_file_range("/usb/test.gcode", 3, 6) == b"3456"
+    assert route.calls.last.request.headers["Range"] == "bytes=3-6"
+
+
+async def test_get_file_range_when_range_is_ignored(pl, respx_mock):
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(200, content=b"0123456789")
+    )
+
+    assert await pl.get_file_range("/usb/test.gcode", 3, 6) == b"3456"
+
+
+async def test_get_capabilities_is_cached(pl, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/version").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "api": "2.0.0",
+                "server": "2.1.2",
+                "firmware": "6.5.3+12780",
+                "capabilities": {"upload-by-put": True},
+            },
+        )
+    )
+
+    first, second = await asyncio.gather(pl.get_capabilities(), pl.get_capabilities())
+
+    assert (
+        first
+        == second
+        == {
+            "api": "2.0.0",
+            "v1": True,
+            "upload_by_put": True,
+            "firmware": "6.5.3+12780",
+            "server": "2.1.2",
+        }
+    )
+    assert route.call_count == 1
+
+    await pl.get_capabilities(refresh=True)
+    assert route.call_count == 2
+
+    pl.invalidate_capabilities()
+    await pl.get_capabilities()
+    assert route.call_count == 3
+
+
+async def test_get_capabilities_reprobes_after_connection_loss(pl, respx_mock):
+    version = respx_mock.get(f"{HOST}/api/version").mock(
+        side_effect=[
+            httpx.Response(200, json={"api": "0.9.0"}),
+            httpx.Response(200, json={"api": "2.0.0", "firmware": "6.5.3"}),
+        ]
+    )
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+
+    assert (await pl.get_capabilities())["v1"] is False
+    with pytest.raises(httpx.ConnectError):
+        await pl.get_status()
+
+    capabilities = await pl.get_capabilities()
+
+    assert capabilities["v1"] is True
+    assert capabilities["upload_by_put"] is False
+    assert version.call_count == 2
+
+
+async def test_get_version_refreshes_capabilities(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/version").mock(
+        side_effect=[
+            httpx.Response(200, json={"api": "2.0.0", "firmware": "6.4.0"}),
+            httpx.Response(
+                200,
+                json={
+                    "api": "2.0.0",
+                    "firmware": "6.5.3",
+                    "capabilities": {"upload-by-put": True},
+                },
+            ),
+        ]
+    )
+
+    assert (await pl.get_capabilities())["upload_by_put"] is False
+    await pl.get_version()
+    capabilities = await pl.get_capabilities()
+
+    assert capabilities["firmware"] == "6.5.3"
+    assert capabilities["upload_by_put"] is True
@@ -0,0 +1,86 @@
+"""Tests for the record and replay transports."""
+
+import asyncio
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.recording import (
+    RecordingTransport,
+    ReplayMismatch,
+    ReplayTransport,
+    load_exchanges,
+)
+import pytest
+
+HOST = "http://printer.local"
+STATUS = {"printer": {"state": "IDLE"}}
+GCODE = b"; filament_type=PLA\n" * 10
+
+
+async def _printer(request):
+    if "authorization" not in request.headers:
+        return httpx.Response(
+            401,
+            headers={"WWW-Authenticate": 'Digest realm="Printer API", nonce="abc"'},
+        )
+
+    if request.url.path == "/api/v1/status":
+        return httpx.Response(200, json=STATUS)
+
+    async def body():
+        for start in range(0, len(GCODE), 50):
+            await asyncio.sleep(0)
+            yield GCODE[start : start + 50]
+
+    return httpx.Response(200, content=body())
+
+
+async def _record(path):
+    transport = RecordingTransport(httpx.MockTransport(_printer))
+    async with httpx.AsyncClient(transport=transport) as client:
+        pl = PrusaLink(client, HOST, "maker", "password")
+        await pl.get_status()
+        await pl.get_file_metadata("/usb/A.GCO")
+    transport.save(path)
+
+
+async def test_record_and_replay(tmp_path):
+    path = tmp_path / "printer.json.gz"
+    await _record(path)
+
+    exchanges = load_exchanges(path)
+    assert [exchange["status_code"] for exchange in exchanges] == [401, 200, 200]
+    assert exchanges[2]["body"] == GCODE
+    assert len(exchanges[2]["chunks"]) == 4
+
+    transport = ReplayTransport.load(path, time_scale=0)
+    async with httpx.AsyncClient(transport=transport) as client:
+        pl = PrusaLink(client, "http://10.0.0.5", "maker", "password")
+        assert await pl.get_status() == STATUS
+        assert await pl.get_status() == STATUS
+        assert await pl.get_file_metadata("/usb/A.GCO") == {"filament_type": "PLA"}
+
+
+async def test_replay_is_time_scaled(tmp_path, monkeypatch):
+    path = tmp_path / "printer.json.gz"
+    await _record(path)
+    exchange = load_exchanges(path)[1]
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    transport = ReplayTransport([exchange], time_scale=2)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.get(f"{HOST}/api/v1/status", headers={"Authorization": "x"})
+
+    assert delays[0] == pytest.approx(exchange["elapsed"] * 2)
+
+
+async def test_replay_rejects_unrecorded_requests():
+    transport = ReplayTransport([], time_scale=0)
+    async with httpx.AsyncClient(transport=transport) as client:
+        pl = PrusaLink(client, HOST, "maker", "password")
+        with pytest.raises(ReplayMismatch):
+            await pl.get_status()
@@ -0,0 +1,128 @@
+"""Tests for retry and circuit breaker handling in ApiClient."""
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.resilience import CircuitBreaker, CircuitState, RetryPolicy
+from pyprusalink.types import PrinterUnavailable
+import pytest
+
+HOST = "http://printer.local"
+
+
+@pytest.fixture
+async def client(respx_mock):
+    async with httpx.AsyncClient() as client:
+        yield client
+
+
+def test_retry_policy_delay_is_bounded():
+    policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+
+    for attempt in range(6):
+        assert 0 <= policy.delay(attempt) <= min(3.0, 2**attempt)
+
+
+def test_retry_policy_only_retries_idempotent_methods():
+    policy = RetryPolicy(attempts=2)
+
+    assert policy.should_retry("GET", 0)
+    assert not policy.should_retry("GET", 1)
+    assert not policy.should_retry("DELETE", 0)
+
+
+async def test_get_is_retried_after_transport_error(client, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=[
+            httpx.ConnectError("unreachable"),
+            httpx.Response(503),
+            httpx.Response(200, json={"printer": {"state": "IDLE"}}),
+        ]
+    )
+    pl = PrusaLink(client, HOST, "maker", "password", retry=RetryPolicy(base_delay=0))
+
+    result = await pl.get_status()
+
+    assert result["printer"]["state"] == "IDLE"
+    assert route.call_count == 3
+
+
+async def test_retry_gives_up_after_attempts(client, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+    pl = PrusaLink(
+        client, HOST, "maker", "password", retry=RetryPolicy(attempts=2, base_delay=0)
+    )
+
+    with pytest.raises(httpx.ConnectError):
+        await pl.get_status()
+
+    assert route.call_count == 2
+
+
+async def test_commands_are_not_retried(client, respx_mock):
+    route = respx_mock.delete(f"{HOST}/api/v1/job/1").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+    pl = PrusaLink(client, HOST, "maker", "password", retry=RetryPolicy(base_delay=0))
+
+    with pytest.raises(httpx.ConnectError):
+        await pl.cancel_job(1)
+
+    assert route.call_count == 1
+
+
+async def test_circuit_breaker_fails_fast_when_open(client, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    pl = PrusaLink(client, HOST, "maker", "password", circuit_breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            await pl.get_status()
+
+    assert breaker.state is CircuitState.OPEN
+
+    with pytest.raises(PrinterUnavailable):
+        await pl.get_status()
+
+    assert route.call_count == 2
+
+
+async def test_circuit_breaker_half_open_probe(client, respx_mock):
+    route = respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=[
+            httpx.ConnectError("unreachable"),
+            httpx.ConnectError("unreachable"),
+            httpx.Response(200, json={"printer": {"state": "IDLE"}}),
+        ]
+    )
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    pl = PrusaLink(client, HOST, "maker", "password", circuit_breaker=breaker)
+
+    with pytest.raises(httpx.ConnectError):
+        await pl.get_status()
+    assert breaker.state is CircuitState.HALF_OPEN
+
+    # A failed probe re-opens the circuit.
+    with pytest.raises(httpx.ConnectError):
+        await pl.get_status()
+
+    await pl.get_status()
+
+    assert breaker.state is CircuitState.CLOSED
+    assert route.call_count == 3
+
+
+def test_circuit_breaker_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(httpx.ConnectError), breaker.guard():
+        raise httpx.ConnectError("unreachable")
+
+    with breaker.guard():
+        with pytest.raises(PrinterUnavailable), breaker.guard():
+            pass
+
+    assert breaker.state is CircuitState.CLOSED
@@ -0,0 +1,244 @@
+"""Tests for cached host name resolution."""
+
+import asyncio
+import socket
+
+import httpx
+from pyprusalink import PrusaLink
+from pyprusalink.resilience import CircuitBreaker, CircuitState, RetryPolicy
+from pyprusalink.resolver import HostResolver
+import pytest
+
+HOST = "http://printer.local"
+ADDRESS = "192.0.2.10"
+OTHER_ADDRESS = "192.0.2.11"
+
+
+@pytest.fixture
+async def lookups(monkeypatch):
+    """Answer host name lookups with a fixed address and count them."""
+    calls = []
+
+    async def getaddrinfo(host, port, **kwargs):
+        calls.append((host, port))
+        await asyncio.sleep(0)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ADDRESS, port))]
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    return calls
+
+
+async def test_resolver_caches_and_coalesces(lookups):
+    resolver = HostResolver()
+
+    addresses = await asyncio.gather(
+        *(resolver.resolve("printer.local", 80) for _ in range(3))
+    )
+    addresses.append(await resolver.resolve("printer.local", 80))
+
+    assert addresses == [ADDRESS] * 4
+    assert lookups == [("printer.local", 80)]
+
+
+async def test_resolver_expires_and_invalidates(lookups):
+    resolver = HostResolver(ttl=0)
+    await resolver.resolve("printer.local", 80)
+    await resolver.resolve("printer.local", 80)
+
+    resolver = HostResolver()
+    await resolver.resolve("printer.local", 80)
+    resolver.invalidate("printer.local", 80)
+    await resolver.resolve("printer.local", 80)
+
+    assert len(lookups) == 4
+
+
+async def test_resolver_skips_ip_addresses(lookups):
+    assert await HostResolver().resolve("10.0.0.5", 80) == "10.0.0.5"
+    assert lookups == []
+
+
+async def test_client_keeps_host_header_and_digest_uri(respx_mock, lookups):
+    def handler(request):
+        if "authorization" not in request.headers:
+            return httpx.Response(
+                401,
+                headers={"WWW-Authenticate": 'Digest realm="Printer", nonce="abc"'},
+            )
+        return httpx.Response(200, json={"printer": {"state": "IDLE"}})
+
+    route = respx_mock.get(f"http://{ADDRESS}/api/v1/status").mock(side_effect=handler)
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(client, HOST, "maker", "password", resolver=HostResolver())
+        await pl.get_status()
+        await pl.get_status()
+
+    assert lookups == [("printer.local", 80)]
+    request = route.calls.last.request
+    assert request.headers["host"] == "printer.local"
+    assert 'uri="/api/v1/status"' in request.headers["authorization"]
+
+
+async def test_client_re_resolves_after_connection_failure(respx_mock, lookups):
+    respx_mock.get(f"http://{ADDRESS}/api/v1/status").mock(
+        side_effect=[
+            httpx.ConnectError("unreachable"),
+            httpx.Response(200, json={"printer": {"state": "IDLE"}}),
+        ]
+    )
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client,
+            HOST,
+            "maker",
+            "password",
+            retry=RetryPolicy(attempts=2, base_delay=0),
+            resolver=HostResolver(),
+        )
+        await pl.get_status()
+
+    assert len(lookups) == 2
+
+
+async def test_client_keeps_address_after_read_timeout(respx_mock, lookups):
+    respx_mock.get(f"http://{ADDRESS}/api/v1/status").mock(
+        side_effect=[
+            httpx.ReadTimeout("slow"),
+            httpx.Response(200, json={"printer": {"state": "IDLE"}}),
+        ]
+    )
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client,
+            HOST,
+            "maker",
+            "password",
+            retry=RetryPolicy(attempts=2, base_delay=0),
+            resolver=HostResolver(),
+        )
+        await pl.get_status()
+
+    assert len(lookups) == 1
+    assert pl.client.connection_generation == 0
+
+
+async def test_address_failed_does_not_affect_waiting_lookups(lookups):
+    resolver = HostResolver()
+
+    async def resolve_and_fail():
+        address = await resolver.resolve("printer.local", 80)
+        resolver.address_failed("printer.local", 80, address)
+        return address
+
+    addresses = await asyncio.gather(
+        resolve_and_fail(), resolver.resolve("printer.local", 80)
+    )
+
+    assert addresses == [ADDRESS, ADDRESS]
+
+
+async def test_resolver_moves_to_next_address(monkeypatch):
+    calls = []
+
+    async def getaddrinfo(host, port, **kwargs):
+        calls.append((host, port))
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (ADDRESS, port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (ADDRESS, port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (OTHER_ADDRESS, port)),
+        ]
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    resolver = HostResolver()
+
+    assert await resolver.resolve("printer.local", 80) == ADDRESS
+    resolver.address_failed("printer.local", 80, ADDRESS)
+    resolver.address_failed("printer.local", 80, ADDRESS)
+    assert await resolver.resolve("printer.local", 80) == OTHER_ADDRESS
+    resolver.address_failed("printer.local", 80, OTHER_ADDRESS)
+    assert await resolver.resolve("printer.local", 80) == ADDRESS
+    assert len(calls) == 2
+
+
+async def test_client_falls_back_to_next_address(respx_mock, monkeypatch):
+    async def getaddrinfo(host, port, **kwargs):
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (ADDRESS, port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", (OTHER_ADDRESS, port)),
+        ]
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    respx_mock.get(f"http://{ADDRESS}/api/v1/status").mock(
+        side_effect=httpx.ConnectError("unreachable")
+    )
+    route = respx_mock.get(f"http://{OTHER_ADDRESS}/api/v1/status").mock(
+        return_value=httpx.Response(200, json={"printer": {"state": "IDLE"}})
+    )
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client,
+            HOST,
+            "maker",
+            "password",
+            retry=RetryPolicy(attempts=2, base_delay=0),
+            resolver=HostResolver(),
+        )
+        await pl.get_status()
+        await pl.get_status()
+
+    assert route.call_count == 2
+
+
+async def test_client_retries_failed_lookup(respx_mock, monkeypatch):
+    calls = []
+
+    async def getaddrinfo(host, port, **kwargs):
+        calls.append((host, port))
+        if len(calls) == 1:
+            raise socket.gaierror(socket.EAI_AGAIN, "Temporary failure")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ADDRESS, port))]
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    respx_mock.get(f"http://{ADDRESS}/api/v1/status").mock(
+        return_value=httpx.Response(200, json={"printer": {"state": "IDLE"}})
+    )
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client,
+            HOST,
+            "maker",
+            "password",
+            retry=RetryPolicy(attempts=2, base_delay=0),
+            resolver=HostResolver(),
+        )
+        await pl.get_status()
+
+    assert len(calls) == 2
+    assert pl.client.connection_generation == 1
+
+
+async def test_failed_lookup_counts_towards_circuit_breaker(monkeypatch):
+    async def getaddrinfo(host, port, **kwargs):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async with httpx.AsyncClient() as client:
+        pl = PrusaLink(
+            client,
+            HOST,
+            "maker",
+            "password",
+            circuit_breaker=breaker,
+            resolver=HostResolver(),
+        )
+        with pytest.raises(httpx.ConnectError):
+            await pl.get_status()
+
+    assert breaker.state is CircuitState.OPEN
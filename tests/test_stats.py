@@ -0,0 +1,125 @@
+"""Tests for request instrumentation."""
+
+import httpx
+from pyprusalink.stats import RequestStats, endpoint_label
+from pyprusalink.types import Conflict
+import pytest
+
+HOST = "http://printer.local"
+DIGEST_CHALLENGE = {
+    "WWW-Authenticate": 'Digest realm="Printer API", nonce="abc123", qop="auth"'
+}
+
+
+@pytest.mark.parametrize(
+    ("path", "label"),
+    [
+        ("/api/v1/status", "/api/v1/status"),
+        ("/api/v1/job/42/pause", "/api/v1/job/{id}/pause"),
+        ("/api/v1/transfer/7", "/api/v1/transfer/{id}"),
+        ("/api/v1/files/usb/model.bgcode", "/api/v1/files/{path}"),
+        ("/api/thumbnails/test.png?size=l", "/api/thumbnails/{path}"),
+        ("/usb/model.bgcode", "{file}"),
+    ],
+)
+def test_endpoint_label(path, label):
+    assert endpoint_label(path) == label
+
+
+async def test_listener_receives_request_record(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        side_effect=[
+            httpx.Response(401, headers=DIGEST_CHALLENGE),
+            httpx.Response(200, json={"printer": {"state": "IDLE"}}),
+        ]
+    )
+    records = []
+    pl.client.add_listener(records.append)
+
+    await pl.get_status()
+
+    assert len(records) == 1
+    record = records[0]
+    assert record["method"] == "GET"
+    assert record["endpoint"] == "/api/v1/status"
+    assert record["status_code"] == 200
+    assert record["attempts"] == 1
+    assert record["auth_challenges"] == 1
+    assert record["bytes_received"] == len(b'{"printer":{"state":"IDLE"}}')
+    assert record["error"] is None
+    assert record["duration"] >= 0
+    assert record["processing"] >= 0
+
+
+async def test_listener_records_errors_and_can_be_removed(pl, respx_mock):
+    respx_mock.delete(f"{HOST}/api/v1/job/1").mock(return_value=httpx.Response(409))
+    records = []
+    remove = pl.client.add_listener(records.append)
+
+    with pytest.raises(Conflict):
+        await pl.cancel_job(1)
+
+    remove()
+    with pytest.raises(Conflict):
+        await pl.cancel_job(1)
+
+    assert [record["error"] for record in records] == ["Conflict"]
+    assert records[0]["endpoint"] == "/api/v1/job/{id}"
+
+
+async def test_failing_listener_does_not_affect_request(pl, respx_mock, caplog):
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(200, json={"printer": {"state": "IDLE"}})
+    )
+    respx_mock.delete(f"{HOST}/api/v1/job/1").mock(return_value=httpx.Response(409))
+    records = []
+
+    def failing_listener(record):
+        raise RuntimeError("listener failed")
+
+    pl.client.add_listener(failing_listener)
+    pl.client.add_listener(records.append)
+
+    assert (await pl.get_status())["printer"]["state"] == "IDLE"
+    with pytest.raises(Conflict):
+        await pl.cancel_job(1)
+
+    assert len(records) == 2
+    assert [r.exc_info[1].args for r in caplog.records] == [("listener failed",)] * 2
+
+
+async def test_stream_request_records_downloaded_bytes(pl, respx_mock):
+    respx_mock.get(f"{HOST}/usb/test.gcode").mock(
+        return_value=httpx.Response(200, content=b"; filament_type=PLA\n")
+    )
+    records = []
+    pl.client.add_listener(records.append)
+
+    await pl.get_file_metadata("/usb/test.gcode")
+
+    assert records[0]["bytes_received"] == 20
+
+
+async def test_request_stats_aggregates_records(pl, respx_mock):
+    respx_mock.get(f"{HOST}/api/v1/status").mock(
+        return_value=httpx.Response(200, json={"printer": {"state": "IDLE"}})
+    )
+    respx_mock.delete(f"{HOST}/api/v1/job/1").mock(return_value=httpx.Response(409))
+    stats = RequestStats(buckets=(0.5, 5.0))
+    pl.client.add_listener(stats.record)
+
+    await pl.get_status()
+    await pl.get_status()
+    with pytest.raises(Conflict):
+        await pl.cancel_job(1)
+
+    snapshot = stats.snapshot()
+    status = snapshot[("GET", "/api/v1/status")]
+    assert status["requests"] == 2
+    assert status["errors"] == 0
+    assert status["latency_buckets"] == [2, 2, 2]
+    assert status["bytes_received"] == 2 * len(b'{"printer":{"state":"IDLE"}}')
+    assert snapshot[("DELETE", "/api/v1/job/{id}")]["errors"] == 1
+
+    stats.reset()
+    assert stats.snapshot() == {}
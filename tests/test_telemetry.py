@@ -0,0 +1,85 @@
+"""Tests for the telemetry recorder."""
+
+import math
+
+from pyprusalink.telemetry import TelemetryRecorder
+import pytest
+
+
+def _status(temp_nozzle, temp_bed=None):
+    return {
+        "printer": {
+            "state": "PRINTING",
+            "temp_nozzle": temp_nozzle,
+            "temp_bed": temp_bed,
+            "speed": 100,
+        }
+    }
+
+
+def _values(segments):
+    return [value for segment in segments for value in segment.tolist()]
+
+
+def test_record_raw_samples():
+    recorder = TelemetryRecorder(capacity=4, tiers=())
+
+    recorder.record(_status(200.5, 60.0), timestamp=1)
+    recorder.record(_status(210.0), timestamp=2)
+
+    assert len(recorder) == 2
+    assert _values(recorder.timestamps()) == [1, 2]
+    assert _values(recorder.values("temp_nozzle")) == [200.5, 210.0]
+    bed = _values(recorder.values("temp_bed"))
+    assert bed[0] == 60.0
+    assert math.isnan(bed[1])
+    assert math.isnan(_values(recorder.values("fan_print"))[0])
+
+
+def test_ring_buffer_wraps_in_chronological_order():
+    recorder = TelemetryRecorder(capacity=3, tiers=())
+
+    for timestamp in range(5):
+        recorder.record(_status(float(timestamp)), timestamp=timestamp)
+
+    segments = recorder.values("temp_nozzle")
+    assert len(segments) == 2
+    assert _values(segments) == [2.0, 3.0, 4.0]
+    assert _values(recorder.timestamps()) == [2, 3, 4]
+
+
+def test_downsampling_tier_keeps_min_max_mean():
+    recorder = TelemetryRecorder(capacity=10, tiers=((10.0, 5),))
+
+    for timestamp, temp in ((0, 200.0), (5, 210.0), (10, 220.0), (15, None)):
+        recorder.record(_status(temp), timestamp=timestamp)
+    recorder.flush()
+
+    assert recorder.tier_count == 2
+    assert _values(recorder.timestamps(tier=1)) == [0, 10]
+    assert _values(recorder.values("temp_nozzle", tier=1, stat="mean")) == [
+        205.0,
+        220.0,
+    ]
+    assert _values(recorder.values("temp_nozzle", tier=1, stat="min")) == [
+        200.0,
+        220.0,
+    ]
+    assert _values(recorder.values("temp_nozzle", tier=1, stat="max")) == [
+        210.0,
+        220.0,
+    ]
+    assert _values(recorder.values("speed", tier=1)) == [100.0, 100.0]
+
+
+def test_to_numpy_shares_memory():
+    np = pytest.importorskip("numpy")
+    recorder = TelemetryRecorder(capacity=4, tiers=())
+    recorder.record(_status(200.0), timestamp=1)
+
+    exported = recorder.to_numpy("temp_nozzle")
+    recorder.record(_status(201.0), timestamp=2)
+
+    assert exported.dtype == np.float32
+    assert not exported.flags.owndata
+    assert recorder.timestamps_to_numpy().tolist() == [1.0, 2.0]
@@ -0,0 +1,181 @@
+"""Tests for thumbnail decoding, resizing and caching."""
+
+import base64
+import io
+import os
+import struct
+import zlib
+
+import httpx
+from pyprusalink import thumbnail
+from pyprusalink.bgcode import convert_gcode_to_bgcode
+from pyprusalink.thumbnail import (
+    Image,
+    ThumbnailCache,
+    decode_image,
+    print_file_thumbnails,
+)
+import pytest
+
+HOST = "http://printer.local"
+
+# A 3x2 QOI image using every chunk type: RGB, DIFF, LUMA, RGBA, INDEX, RUN.
+QOI = (
+    b"qoif"
+    + struct.pack(">IIBB", 3, 2, 4, 0)
+    + bytes([0xFE, 10, 20, 30, 0x76, 0xA5, 0x86, 0xFF, 1, 2, 3, 4, 0x09, 0xC0])
+    + bytes(7)
+    + b"\x01"
+)
+QOI_PIXELS = [10, 20, 30, 255, 11, 19, 30, 255, 16, 24, 33, 255]
+QOI_PIXELS += [1, 2, 3, 4, 10, 20, 30, 255, 10, 20, 30, 255]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def vectorized(request, monkeypatch):
+    """Run with numpy, and with the pure Python fallback."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(thumbnail, "_numpy", lambda: None)
+    return request.param
+
+
+def _filtered_png(pixels, width, height, filter_types):
+    """Encode RGB rows with the given PNG filter types."""
+    stride = width * 3
+    raw = bytearray()
+    previous = bytes(stride)
+    for row, filter_type in enumerate(filter_types):
+        line = pixels[row * stride : (row + 1) * stride]
+        raw.append(filter_type)
+        for index, value in enumerate(line):
+            left = line[index - 3] if index >= 3 else 0
+            up = previous[index]
+            upper_left = previous[index - 3] if index >= 3 else 0
+            estimate = left + up - upper_left
+            paeth = min((left, up, upper_left), key=lambda value: abs(estimate - value))
+            predictor = [0, left, up, (left + up) // 2, paeth][filter_type]
+            raw.append((value - predictor) & 0xFF)
+        previous = line
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + thumbnail._png_chunk(b"IHDR", header)
+        + thumbnail._png_chunk(b"IDAT", zlib.compress(bytes(raw)))
+        + thumbnail._png_chunk(b"IEND", b"")
+    )
+
+
+def test_decode_qoi():
+    image = decode_image(QOI)
+
+    assert (image.width, image.height) == (3, 2)
+    assert list(image.pixels) == QOI_PIXELS
+
+
+def test_png_round_trip(vectorized):
+    pixels = bytearray(os.urandom(7 * 5 * 4))
+
+    image = decode_image(Image(7, 5, pixels).to_png())
+
+    assert (image.width, image.height) == (7, 5)
+    assert image.pixels == pixels
+
+
+def test_decode_png_filters(vectorized):
+    pixels = os.urandom(4 * 5 * 3)
+
+    image = decode_image(_filtered_png(pixels, 4, 5, [0, 1, 2, 3, 4]))
+
+    assert image.pixels[3::4] == b"\xff" * 20
+    for channel in range(3):
+        assert image.pixels[channel::4] == pixels[channel::3]
+
+
+def test_decode_image_rejects_other_formats():
+    with pytest.raises(ValueError):
+        decode_image(b"\xff\xd8\xff\xe0 JPEG")
+
+
+def test_resize_weights_by_alpha(vectorized):
+    # An opaque red pixel next to a transparent black one.
+    image = Image(2, 1, bytearray([255, 0, 0, 255, 0, 0, 0, 0]))
+
+    assert list(image.resize(1, 1).pixels) == [255, 0, 0, 128]
+    assert list(image.resize(4, 1).pixels) == [255, 0, 0, 255] * 2 + [0] * 8
+
+
+def test_resize_matches_between_implementations(monkeypatch):
+    pytest.importorskip("numpy")
+    image = Image(37, 23, bytearray(os.urandom(37 * 23 * 4)))
+    sizes = [(10, 7), (37, 23), (80, 50), (1, 1)]
+    with_numpy = [image.resize(*size).pixels for size in sizes]
+
+    monkeypatch.setattr(thumbnail, "_numpy", lambda: None)
+
+    assert [image.resize(*size).pixels for size in sizes] == with_numpy
+
+
+def test_fit_keeps_aspect_ratio():
+    image = Image(40, 20, bytearray(40 * 20 * 4))
+
+    fitted = image.fit(16, 16)
+
+    assert (fitted.width, fitted.height) == (16, 8)
+
+
+def test_print_file_thumbnails():
+    png = Image(4, 2, bytearray(32)).to_png()
+    gcode = (
+        b"; thumbnail begin 4x2 " + str(len(png)).encode() + b"\n"
+        b"; " + base64.b64encode(png) + b"\n"
+        b"; thumbnail end\n"
+        b"; thumbnail_QOI begin 3x2 " + str(len(QOI)).encode() + b"\n"
+        b"; " + base64.b64encode(QOI) + b"\n"
+        b"; thumbnail_QOI end\n"
+        b"G1 X10\n"
+    )
+    bgcode = io.BytesIO()
+    convert_gcode_to_bgcode(io.BytesIO(gcode), bgcode)
+
+    expected = [
+        {"format": "PNG", "width": 4, "height": 2, "data": png},
+        {"format": "QOI", "width": 3, "height": 2, "data": QOI},
+    ]
+    assert print_file_thumbnails(gcode) == expected
+    assert print_file_thumbnails(bgcode.getvalue()) == expected
+
+
+async def test_thumbnail_cache(pl, respx_mock):
+    source = Image(32, 16, bytearray(os.urandom(32 * 16 * 4)))
+    png = source.to_png()
+    gcode = (
+        b"; thumbnail begin 32x16 " + str(len(png)).encode() + b"\n"
+        b"; " + base64.b64encode(png) + b"\n"
+        b"; thumbnail end\n"
+        b"G1 X10\n"
+    )
+    route = respx_mock.get(f"{HOST}/usb/benchy.gcode").mock(
+        return_value=httpx.Response(206, content=gcode)
+    )
+    cache = ThumbnailCache(pl)
+
+    first = await cache.get("/usb/benchy.gcode", 1, [(16, 16), (64, 64)])
+    second = await cache.get("/usb/benchy.gcode", 1, [(16, 16), (8, 8)])
+    await cache.get("/usb/benchy.gcode", 2, [(16, 16)])
+
+    assert route.call_count == 2
+    assert second[(16, 16)] is first[(16, 16)]
+    assert decode_image(first[(16, 16)]).pixels == source.fit(16, 16).pixels
+    assert decode_image(first[(64, 64)]).width == 64
+    assert decode_image(second[(8, 8)]).height == 4
+
+
+async def test_thumbnail_cache_without_thumbnail(pl, respx_mock):
+    respx_mock.get(f"{HOST}/usb/benchy.gcode").mock(
+        return_value=httpx.Response(206, content=b"G1 X10\n")
+    )
+
+    assert await ThumbnailCache(pl).get("/usb/benchy.gcode", 1, [(16, 16)]) == {}
@@ -0,0 +1,97 @@
+"""Tests for the transfer progress watcher."""
+
+import asyncio
+
+import httpx
+from pyprusalink.transfer import TransferWatcher
+import pytest
+
+HOST = "http://printer.local"
+
+
+def _transfer(transferred, time_transferring, transfer_id=7, size="10000"):
+    return httpx.Response(
+        200,
+        json={
+            "id": transfer_id,
+            "type": "FROM_WEB",
+            "display_name": "model.gcode",
+            "path": "/usb",
+            "size": size,
+            "progress": transferred / 100,
+            "transferred": transferred,
+            "time_transferring": time_transferring,
+            "to_print": False,
+        },
+    )
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the poll intervals instead of sleeping."""
+    intervals = []
+
+    async def fake_sleep(delay):
+        intervals.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return intervals
+
+
+async def test_watch_until_transfer_finishes(pl, respx_mock, sleeps):
+    respx_mock.get(f"{HOST}/api/v1/transfer").mock(
+        side_effect=[
+            _transfer(1000, 1),
+            _transfer(3000, 2),
+            _transfer(5000, 3),
+            httpx.Response(204),
+        ]
+    )
+    watcher = TransferWatcher(pl, smoothing=0.5)
+
+    events = [event async for event in watcher.watch()]
+
+    assert [event["bytes_per_second"] for event in events] == [1000, 1500, 1750]
+    assert events[0]["eta"] == 9
+    assert events[2]["eta"] == 5000 / 1750
+    assert len(sleeps) == 3
+
+
+async def test_interval_adapts_to_eta(pl, respx_mock, sleeps):
+    respx_mock.get(f"{HOST}/api/v1/transfer").mock(
+        side_effect=[
+            _transfer(0, 0, size="1000000"),
+            _transfer(0, 1, size="1000000"),
+            _transfer(100000, 2, size="1000000"),
+            _transfer(990000, 3, size="1000000"),
+            httpx.Response(204),
+        ]
+    )
+    watcher = TransferWatcher(pl, min_interval=0.5, max_interval=5.0)
+
+    events = [event async for event in watcher.watch()]
+
+    # Unknown speed and a stalled transfer back off, the fast tail polls
+    # at the minimum interval.
+    assert events[0]["eta"] is None
+    assert sleeps == [1.0, 2.0, 3.0, 0.5]
+
+
+async def test_new_transfer_resets_estimate(pl, respx_mock, sleeps):
+    respx_mock.get(f"{HOST}/api/v1/transfer").mock(
+        side_effect=[
+            _transfer(8000, 2),
+            _transfer(100, 1, transfer_id=8),
+            httpx.Response(204),
+        ]
+    )
+    watcher = TransferWatcher(pl)
+
+    events = [event async for event in watcher.watch()]
+
+    assert [event["bytes_per_second"] for event in events] == [4000, 100]
+
+
+def test_watcher_rejects_invalid_smoothing(pl):
+    with pytest.raises(ValueError):
+        TransferWatcher(pl, smoothing=0)